@@ -0,0 +1,421 @@
+"""
+Measures the send and webhook hot paths end to end: EmailService.send_email against a local stub of the Mailjet
+send API, EmailService.handle_event_webhook(s) and EmailEventWebhookView.post with the celery task run eagerly.
+Reports the operations per second, the p50 and p99 latencies, the memory allocated at peak and the queries made
+per operation of every scenario.
+
+Scenarios::
+
+    send_single             send_email to a single recipient
+    send_many_recipients    send_email to --recipients to, cc and bcc recipients
+    send_template_data      send_email with a provider template and --payload-items items of template data
+    webhook_event           handle_event_webhook with an open event of a different email every time
+    webhook_storm           handle_event_webhook with an open event of the same email every time
+    webhook_grouped_storm   handle_event_webhooks with --storm-size events of the same email at once
+    webhook_view            EmailEventWebhookView.post with an open event of a different email every time
+
+Usage::
+
+    python benchmarks/bench_hot_paths.py [--iterations 200] [--scenario webhook_storm] [--save baseline.json]
+    python benchmarks/bench_hot_paths.py --compare baseline.json [--max-regression 0.2]
+
+Needs a local Postgres, connected to with the usual PGHOST, PGPORT, PGUSER and PGPASSWORD environment variables
+(localhost and postgres by default), on which a throwaway database is created and dropped. Saving the results of a
+commit and comparing another one against them exits with status 1 if the p50 latency of any scenario regressed by
+more than --max-regression, or if it makes more queries.
+"""
+import argparse
+import collections
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+from django.conf import settings
+
+SCENARIOS = [
+    "send_single",
+    "send_many_recipients",
+    "send_template_data",
+    "webhook_event",
+    "webhook_storm",
+    "webhook_grouped_storm",
+    "webhook_view",
+]
+
+
+class StubMailjetHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request as the Mailjet send API does when all the messages are sent, with a new message id for
+    every recipient.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Otherwise the response body waits for the acknowledgement of its headers
+    disable_nagle_algorithm = True
+    # Unique across the runs which keep the database
+    message_ids = itertools.count(time.time_ns() // 1000)
+    latency = 0
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        messages = [
+            {
+                "Status": "success",
+                **{
+                    recipient: [
+                        {"Email": contact["Email"], "MessageUUID": "", "MessageID": next(self.message_ids)}
+                        for contact in message.get(recipient, [])
+                    ]
+                    for recipient in ("To", "Cc", "Bcc")
+                },
+            }
+            for message in data["Messages"]
+        ]
+        body = json.dumps({"Messages": messages}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency):
+    StubMailjetHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMailjetHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def get_open_event(message_id, index):
+    # Events of the same email are told apart by their time, as the provider does not send an id for opens
+    return {
+        "event": "open",
+        "time": 1700000000 + index,
+        "MessageID": int(message_id),
+        "Message_GUID": "1ab23cd4-e567-8901-2345-6789f0gh1i2j",
+        "email": "recipient@example.com",
+        "mj_campaign_id": 7173,
+        "mj_contact_id": 320,
+        "customcampaign": "",
+        "CustomID": "",
+        "Payload": "",
+        "ip": "127.0.0.1",
+        "geo": "US",
+        "agent": "Mozilla/5.0 (Windows NT 5.1; rv:11.0) Gecko Firefox/11.0",
+    }
+
+
+def get_scenarios(args):
+    """
+    Returns the operation of every scenario by name, called with the index of the operation, along with the
+    function preparing the given number of operations beforehand, if any.
+    """
+    from django.test import RequestFactory
+
+    from django_email.models import EmailActivityTracker
+    from django_email.services import EmailService
+    from django_email.views import EmailEventWebhookView
+
+    def send(index, **kwargs):
+        kwargs.setdefault("to_emails", [f"user{index}@example.com"])
+        EmailService.send_email(subject=f"Order {index} shipped", body="<p>Your order has shipped.</p>", **kwargs)
+
+    def send_many_recipients(index):
+        recipients = [f"user{index}.{recipient_index}@example.com" for recipient_index in range(args.recipients)]
+        bcc_count = cc_count = args.recipients // 5
+        send(
+            index,
+            to_emails=recipients[cc_count + bcc_count:],
+            cc_emails=recipients[:cc_count],
+            bcc_emails=recipients[cc_count:cc_count + bcc_count],
+        )
+
+    def send_template_data(index):
+        send(
+            index,
+            template_id="1234567",
+            template_dynamic_data={
+                "name": f"User {index}",
+                "order_id": index,
+                "items": [
+                    {"name": f"Item {item_index}", "quantity": item_index, "price": "9.99"}
+                    for item_index in range(args.payload_items)
+                ],
+            },
+        )
+
+    message_ids = collections.deque()
+
+    def send_to_readers(count):
+        # Emails opened once each are sent beforehand, 100 recipients at a time, so that sending them is not timed
+        for batch_index in range(math.ceil(count / 100)):
+            send(batch_index, to_emails=[f"reader{len(message_ids) + offset}@example.com" for offset in range(100)])
+            message_ids.extend(
+                EmailActivityTracker.objects.order_by("-id").values_list("message_id", flat=True)[:100][::-1]
+            )
+
+    storm_message_ids = []
+
+    def send_to_storm(count):
+        if not storm_message_ids:
+            send(0, to_emails=["storm@example.com"])
+            storm_message_ids.append(
+                EmailActivityTracker.objects.order_by("-id").values_list("message_id", flat=True)[0]
+            )
+
+    storm_indexes = itertools.count()
+    view = EmailEventWebhookView.as_view()
+    request_factory = RequestFactory()
+
+    def post_to_view(index):
+        request = request_factory.post(
+            "/event/", data=json.dumps(get_open_event(message_ids.popleft(), index)), content_type="application/json"
+        )
+        response = view(request, email_provider="mailjet")
+        assert response.status_code == 200, response.status_code
+
+    return {
+        "send_single": (send, None),
+        "send_many_recipients": (send_many_recipients, None),
+        "send_template_data": (send_template_data, None),
+        "webhook_event": (
+            lambda index: EmailService.handle_event_webhook(
+                "mailjet", get_open_event(message_ids.popleft(), index)
+            ),
+            send_to_readers,
+        ),
+        "webhook_storm": (
+            lambda index: EmailService.handle_event_webhook(
+                "mailjet", get_open_event(storm_message_ids[0], next(storm_indexes))
+            ),
+            send_to_storm,
+        ),
+        "webhook_grouped_storm": (
+            lambda index: EmailService.handle_event_webhooks(
+                "mailjet",
+                [get_open_event(storm_message_ids[0], next(storm_indexes)) for _ in range(args.storm_size)],
+            ),
+            send_to_storm,
+        ),
+        "webhook_view": (post_to_view, send_to_readers),
+    }
+
+
+def get_percentile(sorted_values, percentile):
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(percentile * len(sorted_values)) - 1))]
+
+
+def run_scenario(operation, prepare, indexes, iterations, warmup):
+    """
+    Times `iterations` operations after `warmup` ones, then runs a tenth as many again to measure the memory
+    allocated at peak and the queries made per operation, which slows them down too much to be timed at once.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    measured_count = max(1, iterations // 10)
+    if prepare is not None:
+        prepare(warmup + iterations + measured_count)
+
+    for _ in range(warmup):
+        operation(next(indexes))
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation_start = time.perf_counter()
+        operation(next(indexes))
+        latencies.append(time.perf_counter() - operation_start)
+    total_seconds = time.perf_counter() - start
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(measured_count):
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                operation(next(indexes))
+                peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    peaks.sort()
+    return {
+        "ops_per_second": iterations / total_seconds,
+        "p50_ms": get_percentile(latencies, 0.5) * 1000,
+        "p99_ms": get_percentile(latencies, 0.99) * 1000,
+        "allocated_kib_per_op": get_percentile(peaks, 0.5) / 1024,
+        "queries_per_op": len(queries) / measured_count,
+    }
+
+
+def get_environment():
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "postgres": connection.pg_version,
+        "machine": platform.machine(),
+    }
+
+
+def print_results(results, baseline, max_regression):
+    """
+    Prints the results along with the change from the baseline, and returns the scenarios which regressed.
+    """
+    regressed = []
+    print(f"{'scenario':<24}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'alloc KiB/op':>14}{'queries/op':>12}")
+
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['ops_per_second']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['allocated_kib_per_op']:>14.1f}{result['queries_per_op']:>12.1f}"
+        )
+
+        baseline_result = baseline.get(name)
+        if baseline_result is None:
+            continue
+
+        changes = {
+            key: result[key] / baseline_result[key] - 1 if baseline_result[key] else 0.0
+            for key in ("ops_per_second", "p50_ms", "p99_ms", "allocated_kib_per_op", "queries_per_op")
+        }
+        print(
+            f"{'  vs baseline':<24}{changes['ops_per_second']:>+10.1%}{changes['p50_ms']:>+10.1%}"
+            f"{changes['p99_ms']:>+10.1%}{changes['allocated_kib_per_op']:>+14.1%}{changes['queries_per_op']:>+12.1%}"
+        )
+        if changes["p50_ms"] > max_regression or result["queries_per_op"] > baseline_result["queries_per_op"]:
+            regressed.append(name)
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Defaults to all the scenarios")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--recipients", type=int, default=50)
+    parser.add_argument("--payload-items", type=int, default=200)
+    parser.add_argument("--storm-size", type=int, default=100)
+    parser.add_argument("--provider-latency", type=float, default=0, help="Seconds the stub provider waits")
+    parser.add_argument("--save", metavar="PATH", help="Saves the results as a baseline to compare with")
+    parser.add_argument("--compare", metavar="PATH", help="Compares the results with a saved baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--keepdb", action="store_true", help="Keeps the database between runs")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.provider_latency)
+
+    if not settings.configured:
+        settings.configure(
+            SECRET_KEY="benchmark",
+            USE_TZ=True,
+            INSTALLED_APPS=[
+                "django.contrib.auth",
+                "django.contrib.contenttypes",
+                "django.contrib.postgres",
+                "rest_framework",
+                "django_email",
+            ],
+            DATABASES={
+                "default": {
+                    "ENGINE": "django.db.backends.postgresql",
+                    "NAME": os.environ.get("PGDATABASE", "postgres"),
+                    "USER": os.environ.get("PGUSER", "postgres"),
+                    "PASSWORD": os.environ.get("PGPASSWORD", ""),
+                    "HOST": os.environ.get("PGHOST", "localhost"),
+                    "PORT": os.environ.get("PGPORT", "5432"),
+                    "TEST": {"NAME": "django_email_benchmark"},
+                }
+            },
+            DEFAULT_AUTO_FIELD="django.db.models.AutoField",
+            MAILJET_API_KEY="benchmark",
+            MAILJET_SECRET_KEY="benchmark",
+            DEFAULT_FROM_EMAIL="from@example.com",
+            DEFAULT_FROM_NAME="Benchmark",
+        )
+    django.setup()
+
+    from django.db import connection
+    from mailjet_rest import Client
+
+    from django_email.providers.mailjet import MailjetEmailProvider
+    from django_email.tasks import handle_webhook
+
+    MailjetEmailProvider._sdk_client = Client(
+        auth=(settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY),
+        version="v3.1",
+        api_url=f"http://127.0.0.1:{server.server_port}/",
+    )
+    # Webhook events are handled within the request, as a worker would right after
+    handle_webhook.app.conf.task_always_eager = True
+
+    old_database_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        scenarios = get_scenarios(args)
+        indexes = itertools.count()
+        results = {}
+        for name in args.scenario or SCENARIOS:
+            operation, prepare = scenarios[name]
+            results[name] = run_scenario(operation, prepare, indexes, args.iterations, args.warmup)
+
+        environment = get_environment()
+    finally:
+        connection.creation.destroy_test_db(old_database_name, verbosity=0, keepdb=args.keepdb)
+        server.shutdown()
+
+    print(", ".join(f"{key} {value}" for key, value in environment.items()))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline_data = json.load(baseline_file)
+        print(f"Compared with commit {baseline_data['environment']['commit']}")
+        baseline = baseline_data["results"]
+
+    regressed = print_results(results, baseline, args.max_regression)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump({"environment": environment, "arguments": vars(args), "results": results}, baseline_file,
+                      indent=2)
+
+    if regressed:
+        print(f"Regressed: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
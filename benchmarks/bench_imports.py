@@ -0,0 +1,57 @@
+"""
+Measures the time taken by a fresh interpreter to set up Django and import the modules of django_email which are
+used by web processes, compared to setting up Django alone.
+
+Usage::
+
+    DJANGO_SETTINGS_MODULE=myproject.settings python benchmarks/bench_imports.py [--runs 20] [--max-ms 50]
+
+Exits with a non zero status if the median overhead of django_email is more than --max-ms milliseconds.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SETUP_SCRIPT = "import django; django.setup()"
+IMPORT_SCRIPT = (
+    "import django; django.setup(); "
+    "import django_email.admin, django_email.services, django_email.tasks, django_email.views"
+)
+TIMED_SCRIPT = "import time; start = time.perf_counter(); {script}; print(time.perf_counter() - start)"
+
+
+def time_script(script, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", TIMED_SCRIPT.format(script=script)],
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        timings.append(float(output.decode("utf-8").splitlines()[-1]) * 1000)
+
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    setup_ms = time_script(SETUP_SCRIPT, args.runs)
+    import_ms = time_script(IMPORT_SCRIPT, args.runs)
+    overhead_ms = import_ms - setup_ms
+
+    print(f"django.setup():            {setup_ms:8.2f} ms")
+    print(f"django.setup() + imports:  {import_ms:8.2f} ms")
+    print(f"django_email overhead:     {overhead_ms:8.2f} ms")
+
+    if args.max_ms is not None and overhead_ms > args.max_ms:
+        print(f"Import overhead is above the allowed {args.max_ms:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures the time taken to check a recipient against the in memory filter of suppressed email addresses, and the
+memory the filter takes, for a suppression list of the given size. Only the email addresses the filter may contain
+are looked up in the database, which is not measured here.
+
+Usage::
+
+    python benchmarks/bench_suppression.py [--suppressed 1000000] [--lookups 100000]
+
+Needs no database or project settings.
+"""
+import argparse
+import time
+
+import django
+from django.conf import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suppressed", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    if not settings.configured:
+        settings.configure(INSTALLED_APPS=["django.contrib.contenttypes", "django_email"])
+    django.setup()
+
+    from django_email.suppression import BloomFilter
+
+    start = time.perf_counter()
+    bloom_filter = BloomFilter(capacity=2 * args.suppressed)
+    for index in range(args.suppressed):
+        bloom_filter.add(f"suppressed_{index}@example.com")
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    false_positive_count = sum(f"recipient_{index}@example.com" in bloom_filter for index in range(args.lookups))
+    lookup_seconds = time.perf_counter() - start
+
+    print(f"Built for {args.suppressed} addresses in {build_seconds:.1f}s, {len(bloom_filter._bits) / 2 ** 20:.1f} MiB")
+    print(f"Check per recipient:     {lookup_seconds / args.lookups * 1e6:10.2f} us")
+    print(f"Looked up in database:   {false_positive_count / args.lookups:10.2%} of recipients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the throughput of rendering a local email template for many recipients, with the compiled template
+cached as EmailLog.render_bodies does, compared to compiling the template for every recipient.
+
+Usage::
+
+    python benchmarks/bench_templates.py [--recipients 10000]
+
+Needs no database or project settings.
+"""
+import argparse
+import time
+
+import django
+from django.conf import settings
+
+TEMPLATE_SOURCE = """
+<html>
+  <body>
+    <p>Hi {{ name }},</p>
+    <p>Your order {{ order_id }} of {{ items|length }} items has shipped.</p>
+    <ul>
+      {% for item in items %}<li>{{ item.name }} x {{ item.quantity }}</li>{% endfor %}
+    </ul>
+    {% if coupon %}<p>Use {{ coupon }} for 10% off your next order.</p>{% endif %}
+  </body>
+</html>
+"""
+
+
+def get_template_dynamic_data(index):
+    return {
+        "name": f"User {index}",
+        "order_id": index,
+        "items": [{"name": f"Item {item_index}", "quantity": item_index} for item_index in range(5)],
+        "coupon": "SAVE10" if index % 2 else None,
+    }
+
+
+def time_renders(render, recipients):
+    start = time.perf_counter()
+    for index in range(recipients):
+        render(get_template_dynamic_data(index))
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=10000)
+    args = parser.parse_args()
+
+    if not settings.configured:
+        settings.configure()
+    django.setup()
+
+    from django.template import Context
+
+    from django_email.rendering import get_compiled_template_cache, get_engine, render_template
+
+    uncached_seconds = time_renders(
+        lambda template_dynamic_data: get_engine().from_string(TEMPLATE_SOURCE).render(
+            Context(template_dynamic_data)
+        ),
+        args.recipients,
+    )
+    cached_seconds = time_renders(
+        lambda template_dynamic_data: render_template(("order_shipped", 1), TEMPLATE_SOURCE, template_dynamic_data),
+        args.recipients,
+    )
+
+    print(f"Compiled per recipient:  {args.recipients / uncached_seconds:10.0f} renders/s")
+    print(f"Compiled once, cached:   {args.recipients / cached_seconds:10.0f} renders/s")
+    print(f"Cache:                   {get_compiled_template_cache().get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,26 @@
+from datetime import timedelta
+from urllib.parse import urlencode
+
 from django.contrib import admin
-from nested_admin.nested import NestedTabularInline, NestedModelAdmin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.cache import cache
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .constants import EVENT_AT_CLOCK_SKEW_MARGIN
+from .models import (
+    EmailLog,
+    EmailActivityTracker,
+    EmailRecipient,
+    EmailTemplate,
+    EventLog,
+    SuppressedEmailAddress,
+)
+from .pagination import EstimatedCountPaginator
 
-from .models import EmailLog, EmailActivityTracker, EventLog
+CURSOR_VAR = "before_id"
 
 
 class NonEditableAdminMixin(object):
@@ -15,17 +34,163 @@ class NonEditableAdminMixin(object):
         return False
 
 
-class EventLogAdmin(NonEditableAdminMixin, NestedTabularInline):
-    model = EventLog
-    ordering = ("-event_at",)
+class KeysetChangeList(ChangeList):
+    """
+    Change list which pages through the objects by their id instead of by offset, so that the 1000th page is as
+    fast as the first one. Used as long as the objects are listed in the default order, i.e. latest first. Sorting
+    by a column falls back to the usual numbered pages.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+
+        return lookup_params
+
+    def get_results(self, request):
+        self.keyset = ORDER_VAR not in self.params
+        if not self.keyset:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+
+        try:
+            cursor = int(self.params[CURSOR_VAR])
+        except (KeyError, ValueError):
+            # A missing or mangled cursor shows the latest page
+            cursor = None
+
+        queryset = self.queryset.order_by("-pk")
+        if cursor is not None:
+            queryset = queryset.filter(pk__lt=cursor)
+
+        # One more object than is shown is fetched to know whether there is a next page
+        result_list = list(queryset[:self.list_per_page + 1])
+        has_next_page = len(result_list) > self.list_per_page
+        result_list = result_list[:self.list_per_page]
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_next_page or cursor is not None
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = result_list[-1].pk if has_next_page else None
+        self.latest_page_query_string = self.get_query_string(remove=[CURSOR_VAR])
+        self.next_page_query_string = self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+
+class ScalableAdminMixin(object):
+    """
+    Keeps the change list fast on tables with hundreds of millions of rows: pages are fetched by keyset, and the
+    number of objects shown is the planner's estimate rather than a COUNT(*) when there are many of them.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/django_email/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class CachedChoicesListFilter(admin.SimpleListFilter):
+    """
+    Filter on a field with too many distinct values to list them all. Instead of a DISTINCT over the whole
+    table, the choices are the `choices_limit` most frequent values of the objects created in the last
+    `lookback`, cached for `cache_timeout` seconds.
+    """
+
+    field_name = None
+    choices_limit = 50
+    lookback = timedelta(days=7)
+    cache_timeout = 600
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = self.field_name
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        cache_key = f"django_email:admin_filter_choices:{model_admin.model._meta.label_lower}:{self.field_name}"
+        choices = cache.get(cache_key)
+
+        if choices is None:
+            choices = list(
+                model_admin.model.objects.filter(created_at__gte=timezone.now() - self.lookback)
+                .exclude(**{f"{self.field_name}__isnull": True})
+                .values_list(self.field_name, flat=True)
+                .annotate(count=Count("id"))
+                .order_by("-count")[:self.choices_limit]
+            )
+            cache.set(cache_key, choices, self.cache_timeout)
+
+        return [(choice, choice) for choice in sorted(choices)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+
+        return queryset.filter(**{self.field_name: self.value()})
+
+
+class FromEmailListFilter(CachedChoicesListFilter):
+    title = "from email"
+    field_name = "from_email"
 
 
-class EmailActivityTrackerAdmin(NonEditableAdminMixin, NestedTabularInline):
+class TemplateIdListFilter(CachedChoicesListFilter):
+    title = "template id"
+    field_name = "template_id"
+
+
+class SubjectListFilter(CachedChoicesListFilter):
+    title = "subject"
+    field_name = "subject"
+
+
+class EventLogAdmin(ScalableAdminMixin, NonEditableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "email_activity_tracker", "event_type", "event_at", "created_at")
+    list_filter = ("event_at", "event_type")
+    list_select_related = ("email_activity_tracker",)
+    raw_id_fields = ("email_activity_tracker",)
+
+
+class EmailActivityTrackerAdmin(NonEditableAdminMixin, admin.TabularInline):
+    """
+    The events of a tracker are not shown inline, since an email opened or clicked many times would load all
+    of its events with the email log. They are linked to instead, and paged through in the event log admin.
+    """
+
     model = EmailActivityTracker
-    inlines = [EventLogAdmin]
+    fields = (
+        "recipient_type",
+        "email_address",
+        "message_id",
+        "email_status",
+        "open_count",
+        "click_count",
+        "events",
+    )
+    readonly_fields = ("events",)
+
+    def events(self, obj):
+        # Bounded by the time of sending like EmailActivityTracker.get_event_logs, to skip older partitions
+        return format_html(
+            '<a href="{}?{}">Events</a>',
+            reverse("admin:django_email_eventlog_changelist"),
+            urlencode(
+                {
+                    "email_activity_tracker__id__exact": obj.id,
+                    "event_at__gte": (obj.created_at - EVENT_AT_CLOCK_SKEW_MARGIN).isoformat(),
+                }
+            ),
+        )
 
 
-class EmailLogAdmin(NonEditableAdminMixin, NestedModelAdmin):
+class EmailLogAdmin(ScalableAdminMixin, NonEditableAdminMixin, admin.ModelAdmin):
     inlines = [EmailActivityTrackerAdmin]
     list_display = (
         "id",
@@ -41,11 +206,67 @@ class EmailLogAdmin(NonEditableAdminMixin, NestedModelAdmin):
         "created_at",
         "dispatch_status",
         "email_provider",
-        "from_email",
-        "template_id",
-        "subject",
+        FromEmailListFilter,
+        TemplateIdListFilter,
+        SubjectListFilter,
     )
-    search_fields = ("to_emails", "cc_emails", "bcc_emails")
+    # Searched through the recipients table in get_search_results, declared only for the search box to be shown
+    search_fields = ("recipients__email_address",)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Looks up the email logs sent to the searched email address, or to any email address starting with it.
+        Quote the search term, e.g. "user@example.com", to match the email address exactly.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        exact = len(search_term) > 1 and search_term[0] == search_term[-1] == '"'
+        email_log_ids_queryset = EmailRecipient.get_email_log_ids_queryset(
+            search_term.strip('"'), prefix=not exact
+        )
+
+        return queryset.filter(id__in=email_log_ids_queryset), False
+
+
+class EmailTemplateAdmin(admin.ModelAdmin):
+    list_display = ("name", "version", "updated_at")
+    search_fields = ("name",)
+    readonly_fields = ("version",)
+
+    def save_model(self, request, obj, form, change):
+        # A new version makes the processes sending emails compile the changed template afresh
+        if change and "body" in form.changed_data:
+            obj.version += 1
+
+        super().save_model(request, obj, form, change)
+
+
+class SuppressedEmailAddressAdmin(admin.ModelAdmin):
+    list_display = ("email_address", "reason", "created_at")
+    list_filter = ("reason",)
+    search_fields = ("email_address",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Email addresses are stored in lowercase, an exact match goes through the unique index
+        if not search_term:
+            return queryset, False
+
+        return queryset.filter(email_address=search_term.strip().lower()), False
+
+    def save_model(self, request, obj, form, change):
+        obj.email_address = obj.email_address.lower()
+        if change:
+            super().save_model(request, obj, form, change)
+            return
+
+        # Suppressed again if it was suppressed before and deleted since
+        SuppressedEmailAddress.suppress([obj.email_address], obj.reason)
+        obj.pk = SuppressedEmailAddress.objects.get(email_address=obj.email_address).pk
 
 
 admin.site.register(EmailLog, EmailLogAdmin)
+admin.site.register(EventLog, EventLogAdmin)
+admin.site.register(EmailTemplate, EmailTemplateAdmin)
+admin.site.register(SuppressedEmailAddress, SuppressedEmailAddressAdmin)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class DjangoEmailConfig(AppConfig):
     name = "django_email"
+
+    def ready(self):
+        from .providers.registry import provider_registry
+
+        provider_registry.load()
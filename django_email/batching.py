@@ -0,0 +1,96 @@
+import json
+import threading
+
+from django.conf import settings
+
+from .tasks import handle_webhook
+
+
+class _Batch(object):
+    def __init__(self):
+        self.event_infos = []
+        self.full = threading.Event()
+        self.published = threading.Event()
+        self.error = None
+
+
+class WebhookEventBatcher(object):
+    """
+    Groups the events of concurrent webhook requests into a single task. The first request of a batch waits up
+    to `max_wait` seconds, or until the batch has `max_events` events, and then publishes the batch on behalf of
+    every request in it. A request returns only once its events are published and raises if publishing failed,
+    so that the provider retries them: the events are delivered at least once, like when every request is
+    published on its own.
+
+    Batches only form when requests are handled concurrently by the threads of the same process, i.e. by a
+    threaded WSGI server.
+    """
+
+    def __init__(self, publish, max_events=100, max_wait=0.05):
+        self.publish = publish
+        self.max_events = max_events
+        self.max_wait = max_wait
+
+        self._provider_vs_batch = {}
+        self._lock = threading.Lock()
+
+    def _close(self, email_provider, batch):
+        if self._provider_vs_batch.get(email_provider) is batch:
+            del self._provider_vs_batch[email_provider]
+
+    def submit(self, email_provider, event_infos: list):
+        with self._lock:
+            batch = self._provider_vs_batch.get(email_provider)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._provider_vs_batch[email_provider] = _Batch()
+
+            batch.event_infos.extend(event_infos)
+            if len(batch.event_infos) >= self.max_events:
+                self._close(email_provider, batch)
+                batch.full.set()
+
+        if not is_leader:
+            batch.published.wait()
+            if batch.error is not None:
+                raise batch.error
+
+            return
+
+        batch.full.wait(self.max_wait)
+        with self._lock:
+            self._close(email_provider, batch)
+
+        try:
+            self.publish(email_provider, batch.event_infos)
+        except Exception as e:
+            batch.error = e
+            raise
+        finally:
+            batch.published.set()
+
+
+def publish_event_infos(email_provider, event_infos: list):
+    handle_webhook.apply_async((json.dumps(event_infos), email_provider))
+
+
+_webhook_event_batcher = None
+_webhook_event_batcher_lock = threading.Lock()
+
+
+def get_webhook_event_batcher():
+    """
+    Returns the webhook event batcher of this process as configured in DJANGO_EMAIL_WEBHOOK_BATCHING, or None
+    if webhook events are not to be batched.
+    """
+    global _webhook_event_batcher
+
+    options = getattr(settings, "DJANGO_EMAIL_WEBHOOK_BATCHING", None)
+    if options is None:
+        return None
+
+    with _webhook_event_batcher_lock:
+        if _webhook_event_batcher is None:
+            _webhook_event_batcher = WebhookEventBatcher(publish_event_infos, **options)
+
+    return _webhook_event_batcher
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+
+class ConcurrencySlot(object):
+    """
+    Handed to the code holding a slot, which sets `overloaded` when the provider signalled that it is overloaded,
+    e.g. with a 429 or a 5xx response.
+    """
+
+    def __init__(self):
+        self.overloaded = False
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+    Limits the number of requests in flight to a provider with an AIMD algorithm. The limit grows by one for every
+    `limit` requests completing while the latency stays within `latency_tolerance` times the lowest latency seen,
+    and is multiplied by `backoff_ratio` when a request is overloaded, fails or is slower than that.
+    """
+
+    def __init__(
+        self, initial_limit=4, min_limit=1, max_limit=100, backoff_ratio=0.9, latency_tolerance=2.0,
+        rtt_smoothing=0.1,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.rtt_smoothing = rtt_smoothing
+
+        self.in_flight = 0
+        self.rtt_min = None
+        self.rtt_ewma = None
+
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        with self._condition:
+            if self.in_flight >= max(int(self.limit), self.min_limit):
+                return False
+
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(int(self.limit), self.min_limit):
+                self._condition.wait()
+
+            self.in_flight += 1
+
+    def release(self, rtt, overloaded=False):
+        with self._condition:
+            self.in_flight -= 1
+
+            if not overloaded:
+                self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+                self.rtt_ewma = (
+                    rtt if self.rtt_ewma is None
+                    else self.rtt_ewma + self.rtt_smoothing * (rtt - self.rtt_ewma)
+                )
+
+            if overloaded or rtt > self.rtt_min * self.latency_tolerance:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+            # Only grow when the current limit is being used, otherwise it would grow without ever being tested
+            elif self.in_flight + 1 >= int(self.limit):
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        slot = ConcurrencySlot()
+        start = time.monotonic()
+
+        try:
+            yield slot
+        except Exception:
+            slot.overloaded = True
+            raise
+        finally:
+            self.release(time.monotonic() - start, slot.overloaded)
+
+    @asynccontextmanager
+    async def aslot(self, poll_interval=0.01):
+        while not self.try_acquire():
+            await asyncio.sleep(poll_interval)
+
+        slot = ConcurrencySlot()
+        start = time.monotonic()
+
+        try:
+            yield slot
+        except Exception:
+            slot.overloaded = True
+            raise
+        finally:
+            self.release(time.monotonic() - start, slot.overloaded)
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rtt_min": self.rtt_min,
+                "rtt_ewma": self.rtt_ewma,
+            }
+
+
+_provider_vs_concurrency_limiter = {}
+_concurrency_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(provider):
+    """
+    Returns the concurrency limiter of this process for the provider as configured in
+    DJANGO_EMAIL_ADAPTIVE_CONCURRENCY, or None if the concurrency of the provider is not to be limited.
+    """
+    options = getattr(settings, "DJANGO_EMAIL_ADAPTIVE_CONCURRENCY", {}).get(provider)
+    if options is None:
+        return None
+
+    with _concurrency_limiters_lock:
+        concurrency_limiter = _provider_vs_concurrency_limiter.get(provider)
+
+        if concurrency_limiter is None:
+            concurrency_limiter = _provider_vs_concurrency_limiter[provider] = AdaptiveConcurrencyLimiter(
+                **options
+            )
+
+    return concurrency_limiter
+
+
+@contextmanager
+def concurrency_slot(provider):
+    concurrency_limiter = get_concurrency_limiter(provider)
+
+    if concurrency_limiter is None:
+        yield ConcurrencySlot()
+    else:
+        with concurrency_limiter.slot() as slot:
+            yield slot
+
+
+@asynccontextmanager
+async def aconcurrency_slot(provider):
+    concurrency_limiter = get_concurrency_limiter(provider)
+
+    if concurrency_limiter is None:
+        yield ConcurrencySlot()
+    else:
+        async with concurrency_limiter.aslot() as slot:
+            yield slot
+
+
+def get_concurrency_stats():
+    """
+    Returns the current limit, requests in flight and observed round trip times of every provider in this process.
+    """
+    with _concurrency_limiters_lock:
+        return {
+            provider: concurrency_limiter.get_stats()
+            for provider, concurrency_limiter in _provider_vs_concurrency_limiter.items()
+        }
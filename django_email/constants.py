@@ -1,5 +1,11 @@
+from datetime import timedelta
+
 EMAIL_PROVIDER_MAILJET = "mailjet"
 EMAIL_PROVIDER_CHOICES = ((EMAIL_PROVIDER_MAILJET, "Mailjet"),)
 
 
 DEFAULT_EMAIL_PROVIDER = EMAIL_PROVIDER_MAILJET
+
+# Events are looked up from the time their email was sent minus this margin for clock differences between the
+# provider and this server
+EVENT_AT_CLOCK_SKEW_MARGIN = timedelta(days=1)
@@ -1,2 +1,17 @@
 class EmailActivityTrackerNotFoundException(Exception):
-    pass
+    """
+    Deprecated, no longer raised: webhook events whose tracker does not exist yet are parked as PendingEvent
+    instead. Kept so that code catching it still imports, and to be removed in a future release.
+    """
+
+
+class RateLimitExceededException(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class RecipientsSuppressedException(Exception):
+    def __init__(self, suppressed_email_addresses=None):
+        super().__init__(f"All the recipients of the email are suppressed: {suppressed_email_addresses}")
+        self.suppressed_email_addresses = suppressed_email_addresses
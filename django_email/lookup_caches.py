@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class AbstractTrackerLookupCache(object):
+    """
+    Cache of the ids of the tracker and of the email log of every message id, so that webhook events can be logged
+    against their tracker without looking it up in the database. A message id never moves to another tracker,
+    hence the cached ids only go stale when the tracker is deleted for good, e.g. archived.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+        self._stats_lock = threading.Lock()
+
+    def _get_many(self, message_ids: list):
+        raise NotImplementedError
+
+    def set_many(self, message_id_vs_ids: dict):
+        """
+        Caches the (tracker id, email log id) tuples of the message ids.
+        """
+        raise NotImplementedError
+
+    def get_many(self, message_ids: list):
+        """
+        Returns the (tracker id, email log id) tuples of the cached message ids among the given ones.
+        """
+        started_at = time.perf_counter()
+        message_id_vs_ids = self._get_many(message_ids)
+        lookup_seconds = time.perf_counter() - started_at
+
+        with self._stats_lock:
+            self.hits += len(message_id_vs_ids)
+            self.misses += len(message_ids) - len(message_id_vs_ids)
+            self.lookups += 1
+            self.lookup_seconds += lookup_seconds
+
+        return message_id_vs_ids
+
+    def get_stats(self):
+        with self._stats_lock:
+            looked_up_count = self.hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / looked_up_count if looked_up_count else None,
+                "average_lookup_ms": self.lookup_seconds * 1000 / self.lookups if self.lookups else None,
+            }
+
+
+class LocalTrackerLookupCache(AbstractTrackerLookupCache):
+    """
+    Least recently used cache in the memory of the process. Only the processes which both send emails and handle
+    webhooks, or have handled the earlier events of a message, find its ids here.
+    """
+
+    def __init__(self, max_size=100000):
+        super().__init__()
+        self.max_size = max_size
+
+        self._message_id_vs_ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_many(self, message_ids: list):
+        message_id_vs_ids = {}
+
+        with self._lock:
+            for message_id in message_ids:
+                ids = self._message_id_vs_ids.get(message_id)
+                if ids is not None:
+                    self._message_id_vs_ids.move_to_end(message_id)
+                    message_id_vs_ids[message_id] = ids
+
+        return message_id_vs_ids
+
+    def set_many(self, message_id_vs_ids: dict):
+        with self._lock:
+            for message_id, ids in message_id_vs_ids.items():
+                self._message_id_vs_ids[message_id] = tuple(ids)
+                self._message_id_vs_ids.move_to_end(message_id)
+
+            while len(self._message_id_vs_ids) > self.max_size:
+                self._message_id_vs_ids.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._message_id_vs_ids.clear()
+
+
+class CacheTrackerLookupCache(AbstractTrackerLookupCache):
+    """
+    Lookup cache shared by all the processes using the same Django cache, e.g. redis or memcached, so that the ids
+    cached when an email is sent are found by whichever process handles its events.
+    """
+
+    key_prefix = "django_email:tracker"
+
+    def __init__(self, cache="default", timeout=7 * 24 * 60 * 60):
+        super().__init__()
+        self.cache = caches[cache]
+        self.timeout = timeout
+
+    def _get_cache_key(self, message_id):
+        return f"{self.key_prefix}:{message_id}"
+
+    def _get_many(self, message_ids: list):
+        cache_key_vs_ids = self.cache.get_many([self._get_cache_key(message_id) for message_id in message_ids])
+
+        return {
+            message_id: tuple(cache_key_vs_ids[self._get_cache_key(message_id)])
+            for message_id in message_ids
+            if self._get_cache_key(message_id) in cache_key_vs_ids
+        }
+
+    def set_many(self, message_id_vs_ids: dict):
+        self.cache.set_many(
+            {self._get_cache_key(message_id): tuple(ids) for message_id, ids in message_id_vs_ids.items()},
+            timeout=self.timeout,
+        )
+
+
+_tracker_lookup_cache = None
+_tracker_lookup_cache_lock = threading.Lock()
+
+
+def get_tracker_lookup_cache():
+    """
+    Returns the tracker lookup cache of this process as configured in DJANGO_EMAIL_TRACKER_LOOKUP_CACHE, or None
+    if trackers are always looked up in the database.
+    """
+    global _tracker_lookup_cache
+
+    options = getattr(settings, "DJANGO_EMAIL_TRACKER_LOOKUP_CACHE", None)
+    if options is None:
+        return None
+
+    with _tracker_lookup_cache_lock:
+        if _tracker_lookup_cache is None:
+            options = dict(options)
+            tracker_lookup_cache_class = import_string(
+                options.pop("class", "django_email.lookup_caches.LocalTrackerLookupCache")
+            )
+            _tracker_lookup_cache = tracker_lookup_cache_class(**options)
+
+    return _tracker_lookup_cache
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from ...models import EmailLog, EmailRecipient
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds the recipients of the email logs created before recipients were being recorded, so that they can "
+        "be searched by recipient. Works through the email logs in ranges of ids, each in its own transaction, "
+        "and can be stopped and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Number of email log ids covered by a transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        id_range = EmailLog.objects.unfiltered().aggregate(min_id=Min("id"), max_id=Max("id"))
+        if id_range["min_id"] is None:
+            self.stdout.write("Added 0 email recipients")
+            return
+
+        added_count = 0
+        for from_email_log_id in range(id_range["min_id"], id_range["max_id"] + 1, batch_size):
+            added_count += EmailRecipient.backfill(from_email_log_id, from_email_log_id + batch_size)
+
+        self.stdout.write(f"Added {added_count} email recipients")
@@ -0,0 +1,90 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from ...models import EmailActivityTracker, EmailLog, EventLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the email logs older than the given number of days, along with their trackers and events, out of "
+        "the database into gzipped JSON lines files, one file per chunk of email logs. Every chunk is written to "
+        "its file before it is deleted in its own short transaction, so the command can be stopped and run again "
+        "at any time. A chunk interrupted between the two is written again to the same file on the next run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, required=True, help="Archive the email logs created these many days ago",
+        )
+        parser.add_argument("--output-dir", required=True, help="Directory to write the archive files to")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Number of email logs archived in a chunk",
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(options["output_dir"], exist_ok=True)
+        created_before = timezone.now() - timedelta(days=options["older_than"])
+
+        # Buffered counter increments would be lost along with the trackers they belong to
+        EmailActivityTracker.flush_counter_deltas()
+
+        archived_count = 0
+        last_email_log_id = 0
+        while True:
+            email_log_ids = list(
+                EmailLog.objects.unfiltered()
+                .filter(id__gt=last_email_log_id, created_at__lt=created_before)
+                .order_by("id")
+                .values_list("id", flat=True)[:options["batch_size"]]
+            )
+            if not email_log_ids:
+                break
+
+            self._archive_chunk(email_log_ids, options["output_dir"])
+
+            archived_count += len(email_log_ids)
+            last_email_log_id = email_log_ids[-1]
+
+        self.stdout.write(f"Archived {archived_count} email logs")
+
+    def _archive_chunk(self, email_log_ids, output_dir):
+        email_logs = EmailLog.objects.unfiltered().filter(id__in=email_log_ids).order_by("id")
+        email_activity_trackers = (
+            EmailActivityTracker.objects.unfiltered().filter(email_log_id__in=email_log_ids).order_by("id")
+        )
+        event_logs = (
+            EventLog.objects.unfiltered()
+            .filter(email_activity_tracker__email_log_id__in=email_log_ids)
+            .order_by("id")
+        )
+
+        path = os.path.join(output_dir, f"email_logs_{email_log_ids[0]}_{email_log_ids[-1]}.jsonl.gz")
+        temporary_path = f"{path}.tmp"
+
+        with open(temporary_path, "wb") as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode="wb") as gzip_file:
+                for queryset in (email_logs, email_activity_trackers, event_logs):
+                    # Streamed with a server side cursor, there can be any number of events in a chunk
+                    for obj in queryset.iterator(chunk_size=2000):
+                        line = json.dumps(serializers.serialize("python", [obj])[0], cls=DjangoJSONEncoder)
+                        gzip_file.write(f"{line}\n".encode())
+
+            # Nothing is deleted before its archive is safely on disk
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+        os.replace(temporary_path, path)
+
+        # Counter deltas and recipients are deleted along with their trackers and email logs
+        with transaction.atomic():
+            event_logs.force_delete()
+            email_activity_trackers.force_delete()
+            email_logs.force_delete()
@@ -0,0 +1,106 @@
+import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from ...services import EmailService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Continuously sends queued email logs. Every worker claims a batch of queued email logs which nobody else "
+        "has claimed, until they are sent or for DJANGO_EMAIL_DISPATCH_CLAIM_TTL seconds if the worker dies, so any "
+        "number of dispatchers can run on any number of nodes alongside the other ways of sending emails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="Number of batches being sent at the same time",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=50, help="Maximum number of email logs claimed by a worker at once",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds for which a worker waits before polling again when there was nothing to send",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=0,
+            help="Only send email logs queued at least these many seconds ago, e.g. to leave the ones being created "
+            "by send_email or send_bulk to the process creating them. Email logs claimed by another process are "
+            "skipped whatever their age.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once there are no more queued email logs to send",
+        )
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        previous_sigterm_handler = signal.signal(signal.SIGTERM, self._stop)
+        previous_sigint_handler = signal.signal(signal.SIGINT, self._stop)
+
+        concurrency = options["concurrency"]
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [
+                    executor.submit(
+                        self._run_worker,
+                        options["batch_size"],
+                        options["poll_interval"],
+                        options["min_age"],
+                        options["once"],
+                    )
+                    for _ in range(concurrency)
+                ]
+
+        finally:
+            signal.signal(signal.SIGTERM, previous_sigterm_handler)
+            signal.signal(signal.SIGINT, previous_sigint_handler)
+
+        dispatched_count = sum(future.result() for future in futures)
+        self.stdout.write(f"Dispatched {dispatched_count} email logs")
+
+    def _stop(self, signum, frame):
+        logger.info("Email dispatcher: stopping after the batches being sent")
+        self.stop_event.set()
+
+    def _run_worker(self, batch_size, poll_interval, min_age, once):
+        dispatched_count = 0
+
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+
+                try:
+                    batch_dispatched_count = EmailService.dispatch_email_logs(
+                        limit=batch_size,
+                        created_before=timezone.now() - timedelta(seconds=min_age),
+                    )
+                except Exception:
+                    # The email logs not sent stay queued and are picked up again after the poll interval
+                    logger.exception("Email dispatcher: could not send batch")
+                    batch_dispatched_count = 0
+
+                dispatched_count += batch_dispatched_count
+
+                if not batch_dispatched_count:
+                    if once:
+                        break
+
+                    self.stop_event.wait(poll_interval)
+
+        finally:
+            connection.close()
+
+        return dispatched_count
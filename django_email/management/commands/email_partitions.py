@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ... import partitioning
+from ...models import EmailLog, EventLog
+
+MODEL_NAME_VS_MODEL = {
+    "eventlog": EventLog,
+    "emaillog": EmailLog,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Manages the monthly partitions of the event log and email log tables. `setup` partitions a table once, "
+        "`create` creates the partitions of the coming months ahead of time and should be scheduled, e.g. daily, "
+        "and `detach` removes the partitions of the event log table which are past the retention period. Old email "
+        "logs are removed with the email_archive command, along with their trackers and recipients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["setup", "create", "detach"])
+        parser.add_argument(
+            "--model",
+            choices=list(MODEL_NAME_VS_MODEL),
+            action="append",
+            help="Table to manage, may be repeated. Defaults to the event log for setup and to every partitioned "
+            "table otherwise.",
+        )
+        parser.add_argument(
+            "--months-ahead", type=int, default=3, help="Number of months for which partitions are created ahead",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            help="Partitions holding only rows older than these many months are detached",
+        )
+        parser.add_argument(
+            "--drop", action="store_true", help="Drop the detached partitions instead of keeping them as tables",
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"]
+
+        if options["model"]:
+            models = [MODEL_NAME_VS_MODEL[model_name] for model_name in options["model"]]
+        elif action == "setup":
+            models = [EventLog]
+        else:
+            models = [
+                model
+                for model in MODEL_NAME_VS_MODEL.values()
+                if partitioning.is_partitioned(model)
+                and (action != "detach" or model in partitioning.DETACHABLE_MODELS)
+            ]
+
+        for model in models:
+            table = model._meta.db_table
+
+            if action == "setup":
+                if partitioning.is_partitioned(model):
+                    self.stdout.write(f"{table} is already partitioned")
+                    continue
+
+                partitioning.partition_table(model)
+                partition_names = partitioning.create_partitions(model, options["months_ahead"])
+                self.stdout.write(f"Partitioned {table}, created {', '.join(partition_names) or 'no partitions'}")
+
+            elif not partitioning.is_partitioned(model):
+                raise CommandError(f"{table} is not partitioned, run the setup action first")
+
+            elif action == "create":
+                partition_names = partitioning.create_partitions(model, options["months_ahead"])
+                self.stdout.write(f"Created {', '.join(partition_names) or 'no partitions'} of {table}")
+
+            else:
+                if options["retention_months"] is None:
+                    raise CommandError("--retention-months is required to detach partitions")
+                if model not in partitioning.DETACHABLE_MODELS:
+                    raise CommandError(
+                        f"Partitions of {table} can not be detached, remove old email logs with email_archive instead"
+                    )
+
+                before = partitioning.get_month_start(
+                    timezone.now(), months=-options["retention_months"]
+                )
+                partition_names = partitioning.detach_partitions(model, before, drop=options["drop"])
+                self.stdout.write(
+                    f"{'Dropped' if options['drop'] else 'Detached'} "
+                    f"{', '.join(partition_names) or 'no partitions'} of {table}"
+                )
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from ...models import EmailLog, EngagementRollup
+
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the engagement rollups of the emails created between the given days, both included, from the "
+        "trackers and event logs, e.g. for the days before the rollups were kept. Every day is rebuilt in its own "
+        "transaction, during which the emails and webhook events of that day wait for it, and the command can be "
+        "stopped and run again at any time. Rollups of days whose emails were all archived are left as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from-date",
+            type=parse_day,
+            help="First day to rebuild as YYYY-MM-DD, the day of the oldest email log by default",
+        )
+        parser.add_argument(
+            "--to-date", type=parse_day, help="Last day to rebuild as YYYY-MM-DD, today by default",
+        )
+
+    def handle(self, *args, **options):
+        from_day = options["from_date"]
+        if from_day is None:
+            oldest_created_at = EmailLog.objects.unfiltered().aggregate(oldest=Min("created_at"))["oldest"]
+            if oldest_created_at is None:
+                self.stdout.write("Rebuilt 0 engagement rollups")
+                return
+
+            from_day = EngagementRollup.get_day(oldest_created_at)
+
+        to_day = options["to_date"] or EngagementRollup.get_day(timezone.now())
+
+        rebuilt_count = 0
+        day = from_day
+        while day <= to_day:
+            rebuilt_count += EngagementRollup.rebuild(day)
+            day += timedelta(days=1)
+
+        self.stdout.write(f"Rebuilt {rebuilt_count} engagement rollups")
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0006_auto_20200716_1518'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailActivityCounterDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_count', models.IntegerField(default=0, help_text='Open count to be added to the tracker')),
+                ('click_count', models.IntegerField(default=0, help_text='Click count to be added to the tracker')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+                ('email_activity_tracker', models.ForeignKey(help_text='The tracker whose counters are to be incremented', on_delete=django.db.models.deletion.CASCADE, to='django_email.emailactivitytracker')),
+            ],
+        ),
+    ]
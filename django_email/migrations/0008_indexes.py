@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:33
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without blocking writes to the tables, which can not be done in a transaction
+    atomic = False
+
+    dependencies = [
+        ('django_email', '0007_emailactivitycounterdelta'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['dispatch_status', 'created_at'], name='emaillog_status_created_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['template_id', 'created_at'], name='emaillog_template_created_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['email_provider', 'created_at'], name='emaillog_provider_created_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['from_email', 'created_at'], name='emaillog_from_email_created_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=models.Index(condition=models.Q(('dispatch_status', 'queued'), ('is_active', True)), fields=['id'], name='emaillog_queued'),
+        ),
+        AddIndexConcurrently(
+            model_name='emaillog',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='emaillog_created_at_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='eventlog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['email_activity_tracker', 'event_at'], name='eventlog_tracker_event_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='eventlog',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='eventlog_created_at_brin'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailRecipient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_type', models.CharField(choices=[('to', 'To'), ('cc', 'Cc'), ('bcc', 'Bcc')], help_text='Type of recipient to whom the email was sent', max_length=3)),
+                ('email_address', models.EmailField(help_text='Lower cased email address of the recipient', max_length=254)),
+                ('email_log', models.ForeignKey(help_text='The email log which was sent to this recipient', on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='django_email.emaillog')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='emailrecipient',
+            index=models.Index(fields=['email_address'], name='emailrecipient_email_address', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0009_emailrecipient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailTemplate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Time of updation of this object')),
+                ('is_active', models.BooleanField(default=True, help_text='Denotes if the object is active or not. Inactive objects behave similar to how a deleted object works.')),
+                ('name', models.CharField(help_text='Name by which the template is used', max_length=128, unique=True)),
+                ('version', models.PositiveIntegerField(default=1, help_text='Incremented every time the body of the template is changed')),
+                ('body', models.TextField(help_text='Body of the email in the Django template language')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='email_template',
+            field=models.ForeignKey(help_text='Local template the body is rendered with when the email is sent', null=True, on_delete=django.db.models.deletion.PROTECT, to='django_email.emailtemplate'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0010_emailtemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailIdempotencyKey',
+            fields=[
+                ('key', models.CharField(help_text='Idempotency key given by the caller', max_length=255, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+                ('email_log', models.ForeignKey(db_constraint=False, help_text='The email log created for the key, set in the same transaction as the key is claimed', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='django_email.emaillog')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='emailidempotencykey',
+            index=models.Index(fields=['created_at'], name='idempotencykey_created_at'),
+        ),
+    ]
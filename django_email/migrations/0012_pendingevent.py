@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:47
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0011_emailidempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_provider', models.CharField(choices=[('mailjet', 'Mailjet')], help_text='Name of the email provider which sent the event', max_length=32)),
+                ('message_id', models.CharField(db_index=True, help_text='Unique identifier of the message the event belongs to', max_length=128)),
+                ('event_info', django.contrib.postgres.fields.jsonb.JSONField(help_text='The event as sent by the provider')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+EVENT_LOG_TABLE = 'django_email_eventlog'
+CONSTRAINT_NAME = 'eventlog_dedup_key_event_at'
+
+
+def add_dedup_key_constraint(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [EVENT_LOG_TABLE])
+        partitioned = cursor.fetchone() is not None
+
+    if partitioned:
+        # Postgres can neither build the index of a partitioned table concurrently nor attach a constraint to one
+        schema_editor.execute(
+            f'ALTER TABLE {EVENT_LOG_TABLE} ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE (dedup_key, event_at)'
+        )
+        return
+
+    # The index is built without blocking writes to the table, then the constraint takes it over
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY {CONSTRAINT_NAME} ON {EVENT_LOG_TABLE} (dedup_key, event_at)'
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {EVENT_LOG_TABLE} ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE USING INDEX {CONSTRAINT_NAME}'
+    )
+
+
+def remove_dedup_key_constraint(apps, schema_editor):
+    schema_editor.execute(f'ALTER TABLE {EVENT_LOG_TABLE} DROP CONSTRAINT {CONSTRAINT_NAME}')
+
+
+class Migration(migrations.Migration):
+    # The index can not be built concurrently in a transaction
+    atomic = False
+
+    dependencies = [
+        ('django_email', '0012_pendingevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventlog',
+            name='dedup_key',
+            field=models.UUIDField(editable=False, help_text='Hash identifying the event, the same event delivered again by the provider is not logged twice', null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_dedup_key_constraint, remove_dedup_key_constraint),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='eventlog',
+                    constraint=models.UniqueConstraint(fields=('dedup_key', 'event_at'), name=CONSTRAINT_NAME),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0013_eventlog_dedup_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_provider', models.CharField(choices=[('mailjet', 'Mailjet')], help_text='Name of the email provider used to send the emails', max_length=32)),
+                ('template_id', models.CharField(blank=True, help_text='Template Id of the emails, empty for emails sent without one', max_length=64)),
+                ('from_email', models.EmailField(help_text='Email address of the sender', max_length=254)),
+                ('day', models.DateField(help_text='Day on which the emails were created, in the current time zone')),
+                ('sent_count', models.IntegerField(default=0, help_text='Number of recipients the emails were sent to')),
+                ('delivered_count', models.IntegerField(default=0, help_text='Number of delivered events')),
+                ('opened_count', models.IntegerField(default=0, help_text='Number of opened events, including repeat opens')),
+                ('clicked_count', models.IntegerField(default=0, help_text='Number of clicked events, including repeat clicks')),
+                ('spammed_count', models.IntegerField(default=0, help_text='Number of spammed events')),
+                ('soft_bounced_count', models.IntegerField(default=0, help_text='Number of soft bounced events')),
+                ('hard_bounced_count', models.IntegerField(default=0, help_text='Number of hard bounced events')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='engagementrollup',
+            index=models.Index(fields=['day', 'template_id'], name='engagementrollup_day_template'),
+        ),
+        migrations.AddConstraint(
+            model_name='engagementrollup',
+            constraint=models.UniqueConstraint(fields=('email_provider', 'template_id', 'from_email', 'day'), name='engagementrollup_key'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0014_engagementrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressedEmailAddress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Time of updation of this object')),
+                ('is_active', models.BooleanField(default=True, help_text='Denotes if the object is active or not. Inactive objects behave similar to how a deleted object works.')),
+                ('email_address', models.EmailField(help_text='The suppressed email address, in lowercase', max_length=254, unique=True)),
+                ('reason', models.CharField(choices=[('hard_bounced', 'Hard bounced'), ('spammed', 'Spammed'), ('manual', 'Manual')], default='manual', help_text='Why the email address is suppressed', max_length=16)),
+            ],
+            options={
+                'verbose_name_plural': 'suppressed email addresses',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='suppressedemailaddress',
+            index=models.Index(fields=['updated_at'], name='suppressed_updated_at'),
+        ),
+    ]
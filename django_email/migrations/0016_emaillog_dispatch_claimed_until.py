@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0015_suppressedemailaddress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='dispatch_claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Time until which the email log is being sent by the process which claimed it', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0016_emaillog_dispatch_claimed_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementRollupDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_provider', models.CharField(choices=[('mailjet', 'Mailjet')], help_text='Name of the email provider used to send the emails', max_length=32)),
+                ('template_id', models.CharField(blank=True, help_text='Template Id of the emails, empty for emails sent without one', max_length=64)),
+                ('from_email', models.EmailField(help_text='Email address of the sender', max_length=254)),
+                ('day', models.DateField(db_index=True, help_text='Day on which the emails were created, in the current time zone')),
+                ('sent_count', models.IntegerField(default=0, help_text='Sent count to be added to the rollup')),
+                ('delivered_count', models.IntegerField(default=0, help_text='Delivered count to be added to the rollup')),
+                ('opened_count', models.IntegerField(default=0, help_text='Opened count to be added to the rollup')),
+                ('clicked_count', models.IntegerField(default=0, help_text='Clicked count to be added to the rollup')),
+                ('spammed_count', models.IntegerField(default=0, help_text='Spammed count to be added to the rollup')),
+                ('soft_bounced_count', models.IntegerField(default=0, help_text='Soft bounced count to be added to the rollup')),
+                ('hard_bounced_count', models.IntegerField(default=0, help_text='Hard bounced count to be added to the rollup')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Time of creation of this object')),
+            ],
+        ),
+    ]
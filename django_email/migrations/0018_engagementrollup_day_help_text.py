@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_email', '0017_engagementrollupdelta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='engagementrollup',
+            name='day',
+            field=models.DateField(help_text='Day on which the emails were created, in the TIME_ZONE setting'),
+        ),
+        migrations.AlterField(
+            model_name='engagementrollupdelta',
+            name='day',
+            field=models.DateField(db_index=True, help_text='Day on which the emails were created, in the TIME_ZONE setting'),
+        ),
+    ]
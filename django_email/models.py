@@ -1,8 +1,57 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
 from django.contrib.postgres.fields import JSONField, ArrayField
-from django.db import models
-from django.db.models import F
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from .abstract_models import AbstractModel
-from .constants import EMAIL_PROVIDER_CHOICES
+from .constants import EMAIL_PROVIDER_CHOICES, EVENT_AT_CLOCK_SKEW_MARGIN
+from .lookup_caches import get_tracker_lookup_cache
+from .rendering import render_template
+
+
+class EmailTemplate(AbstractModel):
+    """
+    Template of the body of emails rendered by this app with the `template_dynamic_data` of every email, as
+    opposed to the templates stored with the provider and referred to by `template_id`.
+    """
+
+    name = models.CharField(max_length=128, unique=True, help_text="Name by which the template is used")
+    version = models.PositiveIntegerField(
+        default=1, help_text="Incremented every time the body of the template is changed"
+    )
+    body = models.TextField(help_text="Body of the email in the Django template language")
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def register(cls, name, body):
+        """
+        Creates the template, or updates its body and version if it has changed. Meant to be called with the
+        templates shipped with the code, e.g. from a data migration.
+        """
+        email_template, created = cls.objects.get_or_create(name=name, defaults={"body": body})
+        if not created and email_template.body != body:
+            email_template.update_fields(body=body, version=email_template.version + 1)
+
+        return email_template
+
+    @classmethod
+    def get_by_name(cls, name):
+        try:
+            return cls.objects.get(name=name)
+        except cls.DoesNotExist:
+            return None
+
+    def render(self, template_dynamic_data: dict = None):
+        return render_template((self.id, self.version), self.body, template_dynamic_data)
 
 
 class EmailLog(AbstractModel):
@@ -50,6 +99,12 @@ class EmailLog(AbstractModel):
         null=True,
         help_text="Dictionary containing values for " "dynamic variables in template",
     )
+    email_template = models.ForeignKey(
+        EmailTemplate,
+        null=True,
+        on_delete=models.PROTECT,
+        help_text="Local template the body is rendered with when the email is sent",
+    )
 
     dispatch_status = models.CharField(
         max_length=16,
@@ -58,12 +113,50 @@ class EmailLog(AbstractModel):
         help_text="Status of the message whether it is not sent or sent",
     )
 
+    dispatch_claimed_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Time until which the email log is being sent by the process which claimed it",
+    )
+
     error_info = JSONField(
         null=True, help_text="Details of error when message sending is failed"
     )
 
     reply_to = models.EmailField(null=True, blank=True, help_text="The Reply-to email address")
 
+    class Meta:
+        # Every query of the default manager filters on is_active, hence the partial indexes
+        indexes = [
+            models.Index(
+                fields=["dispatch_status", "created_at"],
+                condition=Q(is_active=True),
+                name="emaillog_status_created_at",
+            ),
+            models.Index(
+                fields=["template_id", "created_at"],
+                condition=Q(is_active=True),
+                name="emaillog_template_created_at",
+            ),
+            models.Index(
+                fields=["email_provider", "created_at"],
+                condition=Q(is_active=True),
+                name="emaillog_provider_created_at",
+            ),
+            models.Index(
+                fields=["from_email", "created_at"],
+                condition=Q(is_active=True),
+                name="emaillog_from_email_created_at",
+            ),
+            # Lets the dispatcher find queued email logs without going through the sent ones
+            models.Index(
+                fields=["id"],
+                condition=Q(is_active=True, dispatch_status="queued"),
+                name="emaillog_queued",
+            ),
+            BrinIndex(fields=["created_at"], name="emaillog_created_at_brin"),
+        ]
+
     def __str__(self):
         return f"To: {self.to_emails} Subject:{self.subject}"
 
@@ -81,6 +174,7 @@ class EmailLog(AbstractModel):
         template_id,
         template_dynamic_data,
         reply_to,
+        email_template=None,
     ):
         email_log = cls.objects.create(
             email_provider=email_provider,
@@ -93,11 +187,321 @@ class EmailLog(AbstractModel):
             body=body,
             template_id=template_id,
             template_dynamic_data=template_dynamic_data,
-            reply_to=reply_to
+            reply_to=reply_to,
+            email_template=email_template,
         )
+        EmailRecipient.add_recipients([email_log])
 
         return email_log
 
+    @classmethod
+    def create_logs(cls, logs_data: list):
+        email_logs = cls.objects.bulk_create([cls(**log_data) for log_data in logs_data])
+        EmailRecipient.add_recipients(email_logs)
+
+        return email_logs
+
+    @classmethod
+    def get_by_recipient(cls, email_address, prefix=False):
+        """
+        Returns the email logs sent to, cc'ed or bcc'ed to the email address, or to any email address starting
+        with it when `prefix` is set. Case insensitive.
+        """
+        return cls.objects.filter(
+            id__in=EmailRecipient.get_email_log_ids_queryset(email_address, prefix=prefix)
+        )
+
+    @classmethod
+    def get_queued_for_dispatch(cls, email_log_ids: list = None, limit=None, created_before=None):
+        """
+        Locks and returns queued email logs which are not claimed, skipping the ones already locked by someone
+        else. Must be called inside a transaction.
+        """
+        queryset = cls.objects.select_for_update(skip_locked=True).filter(
+            Q(dispatch_claimed_until__isnull=True) | Q(dispatch_claimed_until__lte=timezone.now()),
+            dispatch_status=cls.EMAIL_STATUS_QUEUED,
+        )
+        if email_log_ids is not None:
+            queryset = queryset.filter(id__in=email_log_ids)
+
+        if created_before is not None:
+            queryset = queryset.filter(created_at__lt=created_before)
+
+        queryset = queryset.order_by("id")
+        if limit is not None:
+            queryset = queryset[:limit]
+
+        return list(queryset)
+
+    @classmethod
+    def claim_for_dispatch(cls, email_log_ids: list = None, limit=None, created_before=None):
+        """
+        Claims and returns queued email logs, skipping the ones claimed by someone else, so that they can be sent
+        without holding a transaction open. A claim which is not released, e.g. as the process died while sending,
+        expires after DJANGO_EMAIL_DISPATCH_CLAIM_TTL.
+        """
+        claim_ttl = timedelta(seconds=getattr(settings, "DJANGO_EMAIL_DISPATCH_CLAIM_TTL", 10 * 60))
+
+        with transaction.atomic():
+            email_logs = cls.get_queued_for_dispatch(
+                email_log_ids=email_log_ids, limit=limit, created_before=created_before
+            )
+            if email_logs:
+                dispatch_claimed_until = timezone.now() + claim_ttl
+                cls.objects.filter(id__in=[email_log.id for email_log in email_logs]).update(
+                    dispatch_claimed_until=dispatch_claimed_until
+                )
+                for email_log in email_logs:
+                    email_log.dispatch_claimed_until = dispatch_claimed_until
+
+        return email_logs
+
+    @classmethod
+    def release_claims(cls, email_logs: list):
+        """
+        Releases the claims of the email logs which are still queued, so that they can be sent again right away.
+        """
+        cls.objects.filter(
+            id__in=[email_log.id for email_log in email_logs], dispatch_status=cls.EMAIL_STATUS_QUEUED
+        ).update(dispatch_claimed_until=None)
+
+    @classmethod
+    def render_bodies(cls, email_logs: list):
+        """
+        Renders the body of the email logs using a local template which are yet to be rendered, and saves it.
+        Every template is fetched once and compiled once per process however many email logs use it.
+        """
+        email_logs = [
+            email_log for email_log in email_logs if email_log.email_template_id and email_log.body is None
+        ]
+        if not email_logs:
+            return
+
+        email_templates = EmailTemplate.objects.unfiltered().in_bulk(
+            {email_log.email_template_id for email_log in email_logs}
+        )
+        for email_log in email_logs:
+            email_log.body = email_templates[email_log.email_template_id].render(email_log.template_dynamic_data)
+
+        cls.objects.bulk_update(email_logs, fields=["body"])
+
+    @classmethod
+    def update_dispatch_statuses(cls, email_logs: list):
+        if not email_logs:
+            return
+
+        updated_at = timezone.now()
+        for email_log in email_logs:
+            email_log.updated_at = updated_at
+
+        cls.objects.bulk_update(
+            email_logs, fields=["dispatch_status", "error_info", "updated_at"]
+        )
+
+
+class EmailRecipient(models.Model):
+    """
+    One row per recipient of an email log, so that email logs can be looked up by recipient with an index instead
+    of scanning the recipient arrays of every email log. Email addresses are stored lower cased. The rows only
+    mirror the recipient arrays of their email log, with which they are added and removed, so they have no
+    is_active flag of their own.
+    """
+
+    TO_RECIPIENT_TYPE = "to"
+    CC_RECIPIENT_TYPE = "cc"
+    BCC_RECIPIENT_TYPE = "bcc"
+
+    RECIPIENT_TYPE_CHOICES = (
+        (TO_RECIPIENT_TYPE, "To"),
+        (CC_RECIPIENT_TYPE, "Cc"),
+        (BCC_RECIPIENT_TYPE, "Bcc"),
+    )
+
+    email_log = models.ForeignKey(
+        EmailLog,
+        on_delete=models.CASCADE,
+        related_name="recipients",
+        help_text="The email log which was sent to this recipient",
+    )
+    recipient_type = models.CharField(
+        max_length=3,
+        choices=RECIPIENT_TYPE_CHOICES,
+        help_text="Type of recipient to whom the email was sent",
+    )
+    email_address = models.EmailField(help_text="Lower cased email address of the recipient")
+
+    class Meta:
+        indexes = [
+            # The pattern ops serve both exact and prefix (LIKE 'prefix%') lookups
+            models.Index(
+                fields=["email_address"],
+                opclasses=["varchar_pattern_ops"],
+                name="emailrecipient_email_address",
+            ),
+        ]
+
+    def __str__(self):
+        return self.email_address
+
+    @classmethod
+    def _get_recipients_of_email_log(cls, email_log):
+        recipient_type_vs_email_addresses = (
+            (cls.TO_RECIPIENT_TYPE, email_log.to_emails),
+            (cls.CC_RECIPIENT_TYPE, email_log.cc_emails),
+            (cls.BCC_RECIPIENT_TYPE, email_log.bcc_emails),
+        )
+
+        return [
+            cls(email_log=email_log, recipient_type=recipient_type, email_address=email_address.lower())
+            for recipient_type, email_addresses in recipient_type_vs_email_addresses
+            for email_address in email_addresses or []
+        ]
+
+    @classmethod
+    def add_recipients(cls, email_logs: list):
+        return cls.objects.bulk_create(
+            [
+                recipient
+                for email_log in email_logs
+                for recipient in cls._get_recipients_of_email_log(email_log)
+            ]
+        )
+
+    @classmethod
+    def get_email_log_ids_queryset(cls, email_address, prefix=False):
+        email_address = email_address.lower()
+        if prefix:
+            queryset = cls.objects.filter(email_address__startswith=email_address)
+        else:
+            queryset = cls.objects.filter(email_address=email_address)
+
+        return queryset.values("email_log_id")
+
+    @classmethod
+    def backfill(cls, from_email_log_id, to_email_log_id):
+        """
+        Adds the recipients of the email logs with ids in the given range which do not have any yet, e.g. the
+        ones created before this model was added. Returns the number of recipients added.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} (email_log_id, recipient_type, email_address)
+                SELECT email_log.id, recipient.recipient_type, lower(recipient.email_address)
+                FROM {EmailLog._meta.db_table} email_log
+                CROSS JOIN LATERAL (
+                    SELECT %s AS recipient_type, unnest(email_log.to_emails) AS email_address
+                    UNION ALL
+                    SELECT %s, unnest(email_log.cc_emails)
+                    UNION ALL
+                    SELECT %s, unnest(email_log.bcc_emails)
+                ) recipient
+                WHERE email_log.id >= %s AND email_log.id < %s
+                AND NOT EXISTS (
+                    SELECT 1 FROM {cls._meta.db_table} existing WHERE existing.email_log_id = email_log.id
+                )
+                """,
+                [
+                    cls.TO_RECIPIENT_TYPE,
+                    cls.CC_RECIPIENT_TYPE,
+                    cls.BCC_RECIPIENT_TYPE,
+                    from_email_log_id,
+                    to_email_log_id,
+                ],
+            )
+
+            return cursor.rowcount
+
+
+class EmailIdempotencyKey(models.Model):
+    """
+    Key given by the caller of `EmailService.send_email` so that calling it again, e.g. when a task is retried,
+    returns the email sent the first time instead of sending another one. Kept in a table of its own rather than
+    on the email log so that the lookup goes through a small index, and expired keys are deleted for good.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True, help_text="Idempotency key given by the caller")
+    email_log = models.ForeignKey(
+        EmailLog,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+        # Not enforced by the database, which can not reference the email log table once it is partitioned
+        db_constraint=False,
+        help_text="The email log created for the key, set in the same transaction as the key is claimed",
+    )
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Time of creation of this object",
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"], name="idempotencykey_created_at")]
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def get_ttl(cls):
+        return timedelta(seconds=getattr(settings, "DJANGO_EMAIL_IDEMPOTENCY_KEY_TTL", 7 * 24 * 60 * 60))
+
+    @classmethod
+    def claim(cls, key):
+        """
+        Inserts the key and returns True, or returns False if it already exists. An expired key which is not deleted
+        yet is claimed again as if it did not exist. A concurrent claim of the same key waits until the transaction
+        which claimed it first is over.
+        """
+        now = timezone.now()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} (key, created_at) VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE SET created_at = EXCLUDED.created_at, email_log_id = NULL
+                WHERE {cls._meta.db_table}.created_at < %s RETURNING key
+                """,
+                [key, now, now - cls.get_ttl()],
+            )
+            return cursor.fetchone() is not None
+
+    @classmethod
+    def set_email_log(cls, key, email_log):
+        cls.objects.filter(key=key).update(email_log=email_log)
+
+    @classmethod
+    def get_email_log(cls, key):
+        """
+        Returns the email log created for the key, or None if the key does not exist or has expired, whether or not
+        it is deleted yet.
+        """
+        idempotency_key = (
+            cls.objects.select_related("email_log")
+            .filter(key=key, created_at__gte=timezone.now() - cls.get_ttl())
+            .first()
+        )
+
+        return idempotency_key.email_log if idempotency_key else None
+
+    @classmethod
+    def delete_expired(cls, ttl, batch_size=1000):
+        """
+        Deletes the keys older than `ttl`, a timedelta, in batches and returns the number of keys deleted.
+        """
+        created_before = timezone.now() - ttl
+        deleted_count = 0
+
+        while True:
+            keys = list(
+                cls.objects.filter(created_at__lt=created_before).values_list("key", flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted_count
+
+            deleted_count += cls.objects.filter(key__in=keys).delete()[0]
+
 
 class EmailActivityTracker(AbstractModel):
     TO_RECIPIENT_TYPE = "to"
@@ -155,6 +559,16 @@ class EmailActivityTracker(AbstractModel):
     def __str__(self):
         return self.email_address
 
+    def get_event_logs(self):
+        """
+        Returns the event logs of this tracker, latest first. Events occur after the email is sent, i.e. after the
+        tracker is created, and bounding them by that lets Postgres skip the older partitions of a partitioned
+        event log table.
+        """
+        return EventLog.objects.filter(
+            email_activity_tracker=self, event_at__gte=self.created_at - EVENT_AT_CLOCK_SKEW_MARGIN
+        ).order_by("-event_at")
+
     @classmethod
     def get_by_message_id(cls, message_id):
         try:
@@ -162,26 +576,283 @@ class EmailActivityTracker(AbstractModel):
         except cls.DoesNotExist:
             return None
 
+    @classmethod
+    def _cache_ids_on_commit(cls, email_activity_trackers: list):
+        tracker_lookup_cache = get_tracker_lookup_cache()
+        if tracker_lookup_cache is None:
+            return
+
+        message_id_vs_ids = {
+            email_activity_tracker.message_id: (email_activity_tracker.id, email_activity_tracker.email_log_id)
+            for email_activity_tracker in email_activity_trackers
+        }
+        # Cached only once committed, so that the cache never refers to trackers which were rolled back
+        transaction.on_commit(lambda: tracker_lookup_cache.set_many(message_id_vs_ids))
+
     @classmethod
     def track_recipient(cls, recipient_data: dict):
-        cls.objects.create(**recipient_data)
+        email_activity_tracker = cls.objects.create(**recipient_data)
+        cls._cache_ids_on_commit([email_activity_tracker])
 
-    def update_fields_on_event(self, event_type):
-        event_type_vs_update_fields = {
-            EventLog.EMAIL_OPENED_EVENT_TYPE: {"open_count": F("open_count") + 1},
-            EventLog.EMAIL_CLICKED_EVENT_TYPE: {"click_count": F("click_count") + 1},
-            EventLog.EMAIL_DELIVERED_EVENT_TYPE: {
-                "email_status": EmailActivityTracker.SENT_EMAIL_STATUS_DELIVERED
-            },
-            EventLog.EMAIL_SOFT_BOUNCED_EVENT_TYPE: {
-                "email_status": EmailActivityTracker.SENT_EMAIL_STATUS_SOFT_BOUNCED
-            },
-            EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE: {
-                "email_status": EmailActivityTracker.SENT_EMAIL_STATUS_HARD_BOUNCED
-            },
+    @classmethod
+    def track_recipients(cls, recipients_data: list):
+        email_activity_trackers = cls.objects.bulk_create(
+            [cls(**recipient_data) for recipient_data in recipients_data]
+        )
+        cls._cache_ids_on_commit(email_activity_trackers)
+
+        return email_activity_trackers
+
+    @classmethod
+    def get_ids_by_message_ids(cls, message_ids: list):
+        """
+        Returns the (tracker id, email log id) tuples of the message ids which are tracked, from the tracker lookup
+        cache when DJANGO_EMAIL_TRACKER_LOOKUP_CACHE is set, and from the database otherwise or on a miss.
+        """
+        tracker_lookup_cache = get_tracker_lookup_cache()
+        message_id_vs_ids = tracker_lookup_cache.get_many(message_ids) if tracker_lookup_cache else {}
+
+        missed_message_ids = [message_id for message_id in message_ids if message_id not in message_id_vs_ids]
+        if missed_message_ids:
+            found_message_id_vs_ids = {
+                message_id: (email_activity_tracker_id, email_log_id)
+                for message_id, email_activity_tracker_id, email_log_id in cls.objects.filter(
+                    message_id__in=missed_message_ids
+                ).values_list("message_id", "id", "email_log_id")
+            }
+            if tracker_lookup_cache is not None and found_message_id_vs_ids:
+                tracker_lookup_cache.set_many(found_message_id_vs_ids)
+
+            message_id_vs_ids.update(found_message_id_vs_ids)
+
+        return message_id_vs_ids
+
+    @classmethod
+    def _coalesce_counters(cls):
+        return getattr(settings, "DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS", False)
+
+    @classmethod
+    def _get_counter_deltas_for_events(cls, event_types: list):
+        return {
+            "open_count": event_types.count(EventLog.EMAIL_OPENED_EVENT_TYPE),
+            "click_count": event_types.count(EventLog.EMAIL_CLICKED_EVENT_TYPE),
+        }
+
+    @classmethod
+    def _get_update_fields_for_events(cls, event_types: list, with_counters=True):
+        """
+        Collapses the given event types, ordered by the time at which they occurred, into the fields to be
+        updated on a tracker. Counters are incremented by the number of events and the status of the
+        latest status changing event wins.
+        """
+        event_type_vs_email_status = {
+            EventLog.EMAIL_DELIVERED_EVENT_TYPE: cls.SENT_EMAIL_STATUS_DELIVERED,
+            EventLog.EMAIL_SPAMMED_EVENT_TYPE: cls.SENT_EMAIL_STATUS_SPAMMED,
+            EventLog.EMAIL_SOFT_BOUNCED_EVENT_TYPE: cls.SENT_EMAIL_STATUS_SOFT_BOUNCED,
+            EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE: cls.SENT_EMAIL_STATUS_HARD_BOUNCED,
         }
 
-        self.update_fields(**event_type_vs_update_fields[event_type])
+        update_fields = {}
+
+        if with_counters:
+            for field, delta in cls._get_counter_deltas_for_events(event_types).items():
+                if delta:
+                    update_fields[field] = F(field) + delta
+
+        email_statuses = [
+            event_type_vs_email_status[event_type]
+            for event_type in event_types
+            if event_type in event_type_vs_email_status
+        ]
+        if email_statuses:
+            update_fields["email_status"] = email_statuses[-1]
+
+        return update_fields
+
+    def update_fields_on_event(self, event_type):
+        coalesce_counters = self._coalesce_counters()
+        if coalesce_counters:
+            EmailActivityCounterDelta.add_deltas(
+                {self.id: self._get_counter_deltas_for_events([event_type])}
+            )
+
+        update_fields = self._get_update_fields_for_events([event_type], with_counters=not coalesce_counters)
+        # Opens and clicks whose counters are buffered leave the tracker alone
+        if update_fields:
+            self.update_fields(**update_fields)
+
+    @classmethod
+    def update_fields_on_events(cls, tracker_id_vs_event_types: dict):
+        coalesce_counters = cls._coalesce_counters()
+        if coalesce_counters:
+            EmailActivityCounterDelta.add_deltas(
+                {
+                    tracker_id: cls._get_counter_deltas_for_events(event_types)
+                    for tracker_id, event_types in tracker_id_vs_event_types.items()
+                }
+            )
+
+        for tracker_id, event_types in tracker_id_vs_event_types.items():
+            update_fields = cls._get_update_fields_for_events(
+                event_types, with_counters=not coalesce_counters
+            )
+            if update_fields:
+                cls.objects.filter(id=tracker_id).update(**update_fields)
+
+    @classmethod
+    def flush_counter_deltas(cls):
+        """
+        Applies all the buffered open and click count deltas to their trackers, and the buffered engagement rollup
+        deltas to their rollups.
+        """
+        flushed_count = 0
+        for delta_model in (EmailActivityCounterDelta, EngagementRollupDelta):
+            while True:
+                batch_flushed_count = delta_model.flush()
+                if not batch_flushed_count:
+                    break
+
+                flushed_count += batch_flushed_count
+
+        return flushed_count
+
+
+class EmailActivityCounterDelta(models.Model):
+    """
+    Buffer of open and click count increments which are yet to be applied to their trackers. Inserting
+    a row here does not lock the tracker, so bursts of opens on the same email do not contend with each
+    other. The rows are applied in aggregate and deleted for good in the same transaction when flushed.
+    """
+
+    email_activity_tracker = models.ForeignKey(
+        EmailActivityTracker,
+        on_delete=models.CASCADE,
+        help_text="The tracker whose counters are to be incremented",
+    )
+    open_count = models.IntegerField(default=0, help_text="Open count to be added to the tracker")
+    click_count = models.IntegerField(default=0, help_text="Click count to be added to the tracker")
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Time of creation of this object",
+        editable=False,
+    )
+
+    def __str__(self):
+        return f"{self.email_activity_tracker_id}: +{self.open_count} opens, +{self.click_count} clicks"
+
+    @classmethod
+    def add_deltas(cls, tracker_id_vs_counter_deltas: dict):
+        cls.objects.bulk_create(
+            [
+                cls(email_activity_tracker_id=tracker_id, **counter_deltas)
+                for tracker_id, counter_deltas in tracker_id_vs_counter_deltas.items()
+                if any(counter_deltas.values())
+            ]
+        )
+
+    @classmethod
+    def flush(cls, batch_size=None):
+        """
+        Applies one batch of buffered deltas with a single update per tracker and returns the number of
+        deltas applied. Rows locked by a concurrent flush are skipped.
+        """
+        batch_size = batch_size or getattr(
+            settings, "DJANGO_EMAIL_COUNTER_FLUSH_BATCH_SIZE", 1000
+        )
+
+        with transaction.atomic():
+            deltas = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", "email_activity_tracker_id", "open_count", "click_count")[
+                    :batch_size
+                ]
+            )
+            if not deltas:
+                return 0
+
+            tracker_id_vs_counts = {}
+            for _, tracker_id, open_count, click_count in deltas:
+                counts = tracker_id_vs_counts.setdefault(tracker_id, [0, 0])
+                counts[0] += open_count
+                counts[1] += click_count
+
+            # Trackers are updated in a fixed order so that concurrent flushes can not deadlock
+            for tracker_id, (open_count, click_count) in sorted(tracker_id_vs_counts.items()):
+                EmailActivityTracker.objects.unfiltered().filter(id=tracker_id).update(
+                    open_count=F("open_count") + open_count,
+                    click_count=F("click_count") + click_count,
+                )
+
+            cls.objects.filter(id__in=[delta[0] for delta in deltas]).delete()
+
+        return len(deltas)
+
+
+class PendingEvent(models.Model):
+    """
+    Webhook event whose tracker does not exist yet, usually because the provider reported it before the response
+    of the send request was handled. Parked here until the tracker is created instead of being retried blindly.
+    The event is deleted for good once it is handled, or once it has waited for DJANGO_EMAIL_PENDING_EVENT_TTL.
+    """
+
+    email_provider = models.CharField(
+        max_length=32,
+        choices=EMAIL_PROVIDER_CHOICES,
+        help_text="Name of the email provider which sent the event",
+    )
+    message_id = models.CharField(
+        max_length=128, db_index=True, help_text="Unique identifier of the message the event belongs to",
+    )
+    event_info = JSONField(help_text="The event as sent by the provider")
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Time of creation of this object",
+        editable=False,
+    )
+
+    def __str__(self):
+        return f"{self.email_provider}: {self.message_id}"
+
+    @classmethod
+    def park(cls, email_provider, message_id_vs_event_infos: list):
+        """
+        Parks the events given as (message_id, event_info) tuples.
+        """
+        return cls.objects.bulk_create(
+            [
+                cls(email_provider=email_provider, message_id=message_id, event_info=event_info)
+                for message_id, event_info in message_id_vs_event_infos
+            ]
+        )
+
+    @classmethod
+    def get_for_handling(cls, email_provider, message_ids: list = None, after_id=0, limit=None):
+        """
+        Locks and returns the parked events of the provider, skipping the ones being handled by someone else.
+        Must be called inside a transaction which is held until the events are handled.
+        """
+        queryset = cls.objects.select_for_update(skip_locked=True).filter(
+            email_provider=email_provider, id__gt=after_id
+        )
+        if message_ids is not None:
+            queryset = queryset.filter(message_id__in=message_ids)
+
+        queryset = queryset.order_by("id")
+        if limit is not None:
+            queryset = queryset[:limit]
+
+        return list(queryset)
+
+    @classmethod
+    def delete_expired(cls, ttl):
+        """
+        Deletes the events parked for longer than `ttl`, a timedelta, whose tracker is never going to be created,
+        e.g. the events of emails sent by another application with the same provider account.
+        """
+        return cls.objects.filter(created_at__lt=timezone.now() - ttl).delete()[0]
 
 
 class EventLog(AbstractModel):
@@ -215,9 +886,537 @@ class EventLog(AbstractModel):
 
     event_at = models.DateTimeField(help_text="The time at which this event occurred")
 
+    dedup_key = models.UUIDField(
+        null=True,
+        editable=False,
+        help_text="Hash identifying the event, the same event delivered again by the provider is not logged twice",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["email_activity_tracker", "event_at"],
+                condition=Q(is_active=True),
+                name="eventlog_tracker_event_at",
+            ),
+            BrinIndex(fields=["created_at"], name="eventlog_created_at_brin"),
+        ]
+        constraints = [
+            # The time of the event is part of the key, hence can be part of the constraint, which a partitioned
+            # table requires
+            models.UniqueConstraint(fields=["dedup_key", "event_at"], name="eventlog_dedup_key_event_at"),
+        ]
+
     def __str__(self):
         return f"{self.event_at}: {self.event_type}"
 
+    @classmethod
+    def get_dedup_key(cls, *parts):
+        return uuid.UUID(bytes=hashlib.md5("\x1f".join(str(part) for part in parts).encode()).digest())
+
+    @classmethod
+    def _insert_new(cls, event_logs: list):
+        """
+        Inserts the event logs in a single statement which skips the ones already logged, as well as the repeats
+        among the given event logs, and returns the event logs inserted. Event logs without a dedup key get one
+        from their tracker and content.
+        """
+        if not event_logs:
+            return []
+
+        for event_log in event_logs:
+            if event_log.dedup_key is None:
+                event_log.dedup_key = cls.get_dedup_key(
+                    event_log.email_activity_tracker_id,
+                    event_log.event_type,
+                    event_log.event_at.isoformat(),
+                    json.dumps(event_log.event_info, sort_keys=True, cls=DjangoJSONEncoder),
+                )
+
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key]
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        row_placeholders = f"({', '.join(['%s'] * len(fields))})"
+        params = [
+            field.get_db_prep_save(field.pre_save(event_log, True), connection)
+            for event_log in event_logs
+            for field in fields
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} ({columns}) VALUES {", ".join([row_placeholders] * len(event_logs))}
+                ON CONFLICT (dedup_key, event_at) DO NOTHING RETURNING id, dedup_key
+                """,
+                params,
+            )
+            dedup_key_vs_id = {str(dedup_key): event_log_id for event_log_id, dedup_key in cursor.fetchall()}
+
+        inserted_event_logs = []
+        for event_log in event_logs:
+            event_log_id = dedup_key_vs_id.pop(str(event_log.dedup_key), None)
+            if event_log_id is not None:
+                event_log.id = event_log_id
+                event_log._state.adding = False
+                inserted_event_logs.append(event_log)
+
+        return inserted_event_logs
+
     @classmethod
     def add_new_event_log(cls, event_info):
-        return cls.objects.create(**event_info)
+        """
+        Returns the new event log, or None if the event is already logged.
+        """
+        inserted_event_logs = cls._insert_new([cls(**event_info)])
+
+        return inserted_event_logs[0] if inserted_event_logs else None
+
+    @classmethod
+    def add_new_event_logs(cls, events_info: list):
+        """
+        Returns the new event logs, leaving out the events which are already logged.
+        """
+        return cls._insert_new([cls(**event_info) for event_info in events_info])
+
+
+class EngagementRollup(models.Model):
+    """
+    Number of recipients emailed and of their events per provider, template id, sender and day the emails were
+    sent, kept up to date as emails are sent and events are logged so that engagement rates are read without
+    aggregating the event logs. The rollups of a day are replaced outright when the day is rebuilt from the other
+    tables with the rebuild_engagement_rollups command.
+    """
+
+    EVENT_TYPE_VS_FIELD = {
+        EventLog.EMAIL_DELIVERED_EVENT_TYPE: "delivered_count",
+        EventLog.EMAIL_OPENED_EVENT_TYPE: "opened_count",
+        EventLog.EMAIL_CLICKED_EVENT_TYPE: "clicked_count",
+        EventLog.EMAIL_SPAMMED_EVENT_TYPE: "spammed_count",
+        EventLog.EMAIL_SOFT_BOUNCED_EVENT_TYPE: "soft_bounced_count",
+        EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE: "hard_bounced_count",
+    }
+    COUNT_FIELDS = ["sent_count", *EVENT_TYPE_VS_FIELD.values()]
+    # First key of the advisory locks taken on the rollups of a day, the second one being the day
+    DAY_LOCK_NAMESPACE = 0x454D524C
+
+    email_provider = models.CharField(
+        max_length=32,
+        choices=EMAIL_PROVIDER_CHOICES,
+        help_text="Name of the email provider used to send the emails",
+    )
+    template_id = models.CharField(
+        max_length=64, blank=True, help_text="Template Id of the emails, empty for emails sent without one",
+    )
+    from_email = models.EmailField(help_text="Email address of the sender")
+    day = models.DateField(help_text="Day on which the emails were created, in the TIME_ZONE setting")
+
+    sent_count = models.IntegerField(default=0, help_text="Number of recipients the emails were sent to")
+    delivered_count = models.IntegerField(default=0, help_text="Number of delivered events")
+    opened_count = models.IntegerField(default=0, help_text="Number of opened events, including repeat opens")
+    clicked_count = models.IntegerField(default=0, help_text="Number of clicked events, including repeat clicks")
+    spammed_count = models.IntegerField(default=0, help_text="Number of spammed events")
+    soft_bounced_count = models.IntegerField(default=0, help_text="Number of soft bounced events")
+    hard_bounced_count = models.IntegerField(default=0, help_text="Number of hard bounced events")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["email_provider", "template_id", "from_email", "day"], name="engagementrollup_key"
+            ),
+        ]
+        indexes = [models.Index(fields=["day", "template_id"], name="engagementrollup_day_template")]
+
+    def __str__(self):
+        return f"{self.day}: {self.template_id}"
+
+    @classmethod
+    def get_day(cls, created_at):
+        """
+        Returns the day of the time in the TIME_ZONE setting, rather than the time zone activated for the current
+        request, so that an email is counted on the same day by every process.
+        """
+        return timezone.localdate(created_at, timezone.get_default_timezone()) if settings.USE_TZ else created_at.date()
+
+    @classmethod
+    def get_day_start(cls, day):
+        day_start = datetime.combine(day, time.min)
+
+        return timezone.make_aware(day_start, timezone.get_default_timezone()) if settings.USE_TZ else day_start
+
+    @classmethod
+    def _get_key(cls, email_provider, template_id, from_email, created_at):
+        return email_provider, template_id or "", from_email, cls.get_day(created_at)
+
+    @classmethod
+    def lock_days(cls, days, exclusive=False, wait=True):
+        """
+        Takes the advisory locks of the days until the end of the transaction. Counts are added to the rollups of a
+        day under a shared lock, while it is rebuilt under an exclusive one. Returns the days locked, which are all
+        of them unless `wait` is off.
+        """
+        function = "pg_advisory_xact_lock" if wait else "pg_try_advisory_xact_lock"
+        if not exclusive:
+            function += "_shared"
+
+        locked_days = []
+        with connection.cursor() as cursor:
+            # Locked in order so that the rebuild of a day can not deadlock with the updates of many days
+            for day in sorted(set(days)):
+                cursor.execute(f"SELECT {function}(%s, %s)", [cls.DAY_LOCK_NAMESPACE, day.toordinal()])
+                if wait or cursor.fetchone()[0]:
+                    locked_days.append(day)
+
+        return locked_days
+
+    @classmethod
+    def _upsert_counts(cls, key_vs_counts: dict):
+        if not key_vs_counts:
+            return
+
+        qn = connection.ops.quote_name
+        columns = ["email_provider", "template_id", "from_email", "day", *cls.COUNT_FIELDS]
+        row_placeholders = f"({', '.join(['%s'] * len(columns))})"
+        params = [
+            value
+            for key, counts in sorted(key_vs_counts.items())
+            for value in (*key, *(counts.get(field, 0) for field in cls.COUNT_FIELDS))
+        ]
+        table = qn(cls._meta.db_table)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({", ".join(qn(column) for column in columns)})
+                VALUES {", ".join([row_placeholders] * len(key_vs_counts))}
+                ON CONFLICT (email_provider, template_id, from_email, day) DO UPDATE SET
+                {", ".join(f"{qn(field)} = {table}.{qn(field)} + EXCLUDED.{qn(field)}" for field in cls.COUNT_FIELDS)}
+                """,
+                params,
+            )
+
+    @classmethod
+    def add_counts(cls, key_vs_counts: dict):
+        """
+        Adds the counts, dicts of count field vs count for every (email provider, template id, from email, day) key,
+        to the rollups in a single upsert. The keys are upserted in order so that concurrent upserts lock the rows
+        in the same order instead of deadlocking.
+        """
+        if not key_vs_counts:
+            return
+
+        with transaction.atomic():
+            cls.lock_days([key[3] for key in key_vs_counts])
+            cls._upsert_counts(key_vs_counts)
+
+    @classmethod
+    def _add(cls, key_vs_counts: dict):
+        # Upserting the rollup row would serialize the transactions of all the emails of a campaign, hence the
+        # counts are buffered along with the open and click counts of the trackers when those are coalesced
+        if EmailActivityTracker._coalesce_counters():
+            EngagementRollupDelta.add_deltas(key_vs_counts)
+        else:
+            cls.add_counts(key_vs_counts)
+
+    @classmethod
+    def add_sent(cls, email_log_vs_recipient_count: dict):
+        key_vs_counts = {}
+        for email_log, recipient_count in email_log_vs_recipient_count.items():
+            key = cls._get_key(
+                email_log.email_provider, email_log.template_id, email_log.from_email, email_log.created_at
+            )
+            counts = key_vs_counts.setdefault(key, {})
+            counts["sent_count"] = counts.get("sent_count", 0) + recipient_count
+
+        cls._add(key_vs_counts)
+
+    @classmethod
+    def add_events(cls, email_log_id_vs_event_types: dict):
+        """
+        Adds the events of the email logs, given by their ids, to the rollups of the email logs.
+        """
+        if not email_log_id_vs_event_types:
+            return
+
+        key_vs_counts = {}
+        for email_log_id, *key_fields in EmailLog.objects.unfiltered().filter(
+            id__in=list(email_log_id_vs_event_types)
+        ).values_list("id", "email_provider", "template_id", "from_email", "created_at"):
+            counts = key_vs_counts.setdefault(cls._get_key(*key_fields), {})
+            for event_type in email_log_id_vs_event_types[email_log_id]:
+                field = cls.EVENT_TYPE_VS_FIELD[event_type]
+                counts[field] = counts.get(field, 0) + 1
+
+        cls._add(key_vs_counts)
+
+    @classmethod
+    def rebuild(cls, day):
+        """
+        Recomputes the rollups of the emails created on the day from the trackers and event logs. Only the updates
+        of the rollups of that day wait for it meanwhile, and are applied on top once it is done. Days without
+        email logs, e.g. as they were archived, are left as they are. Returns the number of rollups rebuilt.
+        """
+        created_from = cls.get_day_start(day)
+        created_to = cls.get_day_start(day + timedelta(days=1))
+        email_log_filters = {"created_at__gte": created_from, "created_at__lt": created_to}
+
+        if not EmailLog.objects.unfiltered().filter(**email_log_filters).exists():
+            return 0
+
+        with transaction.atomic():
+            cls.lock_days([day], exclusive=True)
+
+            cls.objects.filter(day=day).delete()
+            # Their events are committed, hence counted below
+            EngagementRollupDelta.objects.filter(day=day).delete()
+
+            key_vs_counts = {}
+            for *key_fields, sent_count in (
+                EmailActivityTracker.objects.unfiltered()
+                .filter(**{f"email_log__{lookup}": value for lookup, value in email_log_filters.items()})
+                .values_list("email_log__email_provider", "email_log__template_id", "email_log__from_email")
+                .annotate(count=models.Count("id"))
+                .order_by()
+            ):
+                key_vs_counts.setdefault(cls._get_key(*key_fields, created_from), {})["sent_count"] = sent_count
+
+            for *key_fields, event_type, event_count in (
+                EventLog.objects.unfiltered()
+                .filter(
+                    # Lets Postgres skip the older partitions of a partitioned event log table
+                    event_at__gte=created_from - EVENT_AT_CLOCK_SKEW_MARGIN,
+                    **{
+                        f"email_activity_tracker__email_log__{lookup}": value
+                        for lookup, value in email_log_filters.items()
+                    },
+                )
+                .values_list(
+                    "email_activity_tracker__email_log__email_provider",
+                    "email_activity_tracker__email_log__template_id",
+                    "email_activity_tracker__email_log__from_email",
+                    "event_type",
+                )
+                .annotate(count=models.Count("id"))
+                .order_by()
+            ):
+                key_vs_counts.setdefault(cls._get_key(*key_fields, created_from), {})[
+                    cls.EVENT_TYPE_VS_FIELD[event_type]
+                ] = event_count
+
+            cls._upsert_counts(key_vs_counts)
+
+        return len(key_vs_counts)
+
+    @classmethod
+    def get_stats(cls, from_day, to_day, **filters):
+        """
+        Returns the counts and rates per template id and day between the two days, both included, summed over the
+        rollups matching the filters, e.g. template_id or from_email. Rates are relative to the recipients emailed.
+        """
+        stats = list(
+            cls.objects.filter(day__gte=from_day, day__lte=to_day, **filters)
+            .values("template_id", "day")
+            .annotate(**{field: models.Sum(field) for field in cls.COUNT_FIELDS})
+            .order_by("day", "template_id")
+        )
+
+        for stat in stats:
+            sent_count = stat["sent_count"]
+            for rate, fields in (
+                ("delivery_rate", ["delivered_count"]),
+                ("open_rate", ["opened_count"]),
+                ("click_rate", ["clicked_count"]),
+                ("bounce_rate", ["soft_bounced_count", "hard_bounced_count"]),
+                ("spam_rate", ["spammed_count"]),
+            ):
+                stat[rate] = sum(stat[field] for field in fields) / sent_count if sent_count else None
+
+        return stats
+
+
+class EngagementRollupDelta(models.Model):
+    """
+    Buffer of engagement rollup increments which are yet to be applied, used instead of updating the rollups in the
+    transaction of every event when DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS is set. Flushing a batch of rows adds
+    their sum to the rollups and deletes them, as does rebuilding their day.
+    """
+
+    email_provider = models.CharField(
+        max_length=32,
+        choices=EMAIL_PROVIDER_CHOICES,
+        help_text="Name of the email provider used to send the emails",
+    )
+    template_id = models.CharField(
+        max_length=64, blank=True, help_text="Template Id of the emails, empty for emails sent without one",
+    )
+    from_email = models.EmailField(help_text="Email address of the sender")
+    day = models.DateField(db_index=True, help_text="Day on which the emails were created, in the TIME_ZONE setting")
+
+    sent_count = models.IntegerField(default=0, help_text="Sent count to be added to the rollup")
+    delivered_count = models.IntegerField(default=0, help_text="Delivered count to be added to the rollup")
+    opened_count = models.IntegerField(default=0, help_text="Opened count to be added to the rollup")
+    clicked_count = models.IntegerField(default=0, help_text="Clicked count to be added to the rollup")
+    spammed_count = models.IntegerField(default=0, help_text="Spammed count to be added to the rollup")
+    soft_bounced_count = models.IntegerField(default=0, help_text="Soft bounced count to be added to the rollup")
+    hard_bounced_count = models.IntegerField(default=0, help_text="Hard bounced count to be added to the rollup")
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Time of creation of this object",
+        editable=False,
+    )
+
+    def __str__(self):
+        return f"{self.day}: {self.template_id}"
+
+    @classmethod
+    def add_deltas(cls, key_vs_counts: dict):
+        if not key_vs_counts:
+            return
+
+        with transaction.atomic():
+            # Shared with the other updates of the day, so that a rebuild of the day knows which deltas it counted
+            EngagementRollup.lock_days([key[3] for key in key_vs_counts])
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        email_provider=email_provider, template_id=template_id, from_email=from_email, day=day,
+                        **counts
+                    )
+                    for (email_provider, template_id, from_email, day), counts in key_vs_counts.items()
+                ]
+            )
+
+    @classmethod
+    def flush(cls, batch_size=None):
+        """
+        Applies one batch of buffered deltas with a single upsert and returns the number of deltas applied. Rows
+        locked by a concurrent flush are skipped, and so are the deltas of the days being rebuilt, which the
+        rebuild counts itself.
+        """
+        batch_size = batch_size or getattr(
+            settings, "DJANGO_EMAIL_COUNTER_FLUSH_BATCH_SIZE", 1000
+        )
+
+        with transaction.atomic():
+            deltas = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list(
+                    "id", "email_provider", "template_id", "from_email", "day", *EngagementRollup.COUNT_FIELDS
+                )[:batch_size]
+            )
+            if not deltas:
+                return 0
+
+            # Not waiting for a rebuild, which waits for the rows locked here
+            locked_days = set(EngagementRollup.lock_days([delta[4] for delta in deltas], wait=False))
+            deltas = [delta for delta in deltas if delta[4] in locked_days]
+
+            key_vs_counts = {}
+            for delta in deltas:
+                counts = key_vs_counts.setdefault(tuple(delta[1:5]), {})
+                for field, count in zip(EngagementRollup.COUNT_FIELDS, delta[5:]):
+                    counts[field] = counts.get(field, 0) + count
+
+            EngagementRollup._upsert_counts(key_vs_counts)
+            cls.objects.filter(id__in=[delta[0] for delta in deltas]).delete()
+
+        return len(deltas)
+
+
+class SuppressedEmailAddress(AbstractModel):
+    """
+    Email address which is not emailed anymore, either because it hard bounced or marked an email as spam, or
+    because it was added by hand. Deleting it, e.g. from the admin, only marks it inactive, which lets the
+    processes holding suppressed addresses in memory pick up the removal like any other change.
+    """
+
+    REASON_HARD_BOUNCED = "hard_bounced"
+    REASON_SPAMMED = "spammed"
+    REASON_MANUAL = "manual"
+
+    REASON_CHOICES = (
+        (REASON_HARD_BOUNCED, "Hard bounced"),
+        (REASON_SPAMMED, "Spammed"),
+        (REASON_MANUAL, "Manual"),
+    )
+
+    EVENT_TYPE_VS_REASON = {
+        EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE: REASON_HARD_BOUNCED,
+        EventLog.EMAIL_SPAMMED_EVENT_TYPE: REASON_SPAMMED,
+    }
+
+    email_address = models.EmailField(unique=True, help_text="The suppressed email address, in lowercase")
+    reason = models.CharField(
+        max_length=16,
+        choices=REASON_CHOICES,
+        default=REASON_MANUAL,
+        help_text="Why the email address is suppressed",
+    )
+
+    class Meta:
+        verbose_name_plural = "suppressed email addresses"
+        # Lets the in memory filters fetch the addresses changed since they were last refreshed
+        indexes = [models.Index(fields=["updated_at"], name="suppressed_updated_at")]
+
+    def __str__(self):
+        return self.email_address
+
+    @classmethod
+    def suppress(cls, email_addresses: list, reason=REASON_MANUAL):
+        """
+        Suppresses the email addresses with a single upsert, including the ones suppressed before and deleted
+        since. Already suppressed email addresses keep their reason.
+        """
+        email_addresses = sorted({email_address.lower() for email_address in email_addresses})
+        if not email_addresses:
+            return
+
+        now = timezone.now()
+        table = connection.ops.quote_name(cls._meta.db_table)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (email_address, reason, created_at, updated_at, is_active)
+                VALUES {", ".join(["(%s, %s, %s, %s, true)"] * len(email_addresses))}
+                ON CONFLICT (email_address) DO UPDATE SET
+                reason = EXCLUDED.reason, updated_at = EXCLUDED.updated_at, is_active = true
+                WHERE NOT {table}.is_active
+                """,
+                [value for email_address in email_addresses for value in (email_address, reason, now, now)],
+            )
+
+    @classmethod
+    def add_for_events(cls, tracker_id_vs_event_types: dict):
+        """
+        Suppresses the recipients of the trackers which hard bounced or were marked as spam.
+        """
+        tracker_id_vs_reason = {
+            tracker_id: cls.EVENT_TYPE_VS_REASON[event_type]
+            for tracker_id, event_types in tracker_id_vs_event_types.items()
+            for event_type in event_types
+            if event_type in cls.EVENT_TYPE_VS_REASON
+        }
+        if not tracker_id_vs_reason:
+            return
+
+        reason_vs_email_addresses = {}
+        for tracker_id, email_address in EmailActivityTracker.objects.unfiltered().filter(
+            id__in=list(tracker_id_vs_reason)
+        ).values_list("id", "email_address"):
+            reason_vs_email_addresses.setdefault(tracker_id_vs_reason[tracker_id], []).append(email_address)
+
+        for reason, email_addresses in reason_vs_email_addresses.items():
+            cls.suppress(email_addresses, reason)
+
+    @classmethod
+    def get_suppressed(cls, email_addresses: list):
+        """
+        Returns the suppressed ones among the email addresses, in lowercase.
+        """
+        return set(
+            cls.objects.filter(
+                email_address__in=list({email_address.lower() for email_address in email_addresses})
+            ).values_list("email_address", flat=True)
+        )
@@ -0,0 +1,40 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def get_estimated_count(queryset):
+    """
+    Returns the number of rows the planner expects the queryset to return. The estimate comes from the table
+    statistics Postgres keeps in pg_class and pg_statistic, so it costs no more than planning the query however
+    big the table is, but it is only as fresh as the last ANALYZE.
+    """
+    sql, params = queryset.query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which counts the rows exactly only when the planner expects fewer than
+    DJANGO_EMAIL_ADMIN_EXACT_COUNT_THRESHOLD of them, and otherwise uses the planner's estimate instead of
+    running a COUNT(*) over a large table.
+    """
+
+    @cached_property
+    def count(self):
+        estimated_count = get_estimated_count(self.object_list)
+        if estimated_count < getattr(settings, "DJANGO_EMAIL_ADMIN_EXACT_COUNT_THRESHOLD", 10000):
+            return self.object_list.count()
+
+        return estimated_count
@@ -0,0 +1,221 @@
+import re
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import EmailLog, EventLog
+
+# Models which can be partitioned by month, and the field they are partitioned on
+MODEL_VS_PARTITION_FIELD = {
+    EventLog: "event_at",
+    EmailLog: "created_at",
+}
+
+LEGACY_PARTITION_SUFFIX = "_legacy"
+
+# Models whose old partitions can be detached. The trackers, recipients and idempotency keys of an email log are
+# not removed along with it once the foreign keys to it are dropped, hence old email logs are removed with the
+# email_archive command instead.
+DETACHABLE_MODELS = [EventLog]
+
+
+def get_month_start(value, months=0):
+    month_index = value.year * 12 + value.month - 1 + months
+
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _get_partition_name(model, month_start):
+    return f"{model._meta.db_table}_p{month_start:%Y%m}"
+
+
+def _get_partition_column(model):
+    return model._meta.get_field(MODEL_VS_PARTITION_FIELD[model]).column
+
+
+def is_partitioned(model):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [model._meta.db_table]
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions(model):
+    """
+    Returns the name and the upper bound of every partition of the model, oldest first. The upper bound is
+    exclusive.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [model._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, partition_bound in rows:
+        upper_bound = re.search(r"TO \('([^']+)'\)", partition_bound)
+        partitions.append((name, parse_datetime(upper_bound.group(1)) if upper_bound else None))
+
+    return sorted(partitions, key=lambda partition: partition[1] or datetime.max.replace(tzinfo=timezone.utc))
+
+
+def partition_table(model):
+    """
+    Turns the table of the model into a table partitioned by month, keeping the existing rows in place as its
+    first partition. That partition covers everything up to the end of the current month. The table is locked
+    while the primary key of the existing rows is rebuilt to include the partition column, as Postgres requires.
+
+    Foreign keys referencing the table are dropped, since Postgres can only reference a partitioned table by its
+    whole primary key. The columns are kept and the ORM still joins on them.
+    """
+    table = model._meta.db_table
+    legacy_table = f"{table}{LEGACY_PARTITION_SUFFIX}"
+    partition_column = _get_partition_column(model)
+    pk_column = model._meta.pk.column
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Deferred foreign key checks still pending in the transaction would prevent altering the table
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(
+            """
+            SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid)
+            FROM pg_index
+            JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = %s::regclass AND NOT pg_index.indisprimary
+            """,
+            [table],
+        )
+        index_definitions = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+        foreign_key_definitions = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT conrelid::regclass::text, conname FROM pg_constraint
+            WHERE confrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+        for referencing_table, constraint_name in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {qn(constraint_name)}")
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, pk_column])
+        pk_sequence = cursor.fetchone()[0]
+
+        # The existing table and its indexes make way for the partitioned table, which takes over their names
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy_table)}")
+        for index_name, _ in index_definitions:
+            cursor.execute(
+                f"ALTER INDEX {qn(index_name)} RENAME TO {qn(index_name[:56] + LEGACY_PARTITION_SUFFIX)}"
+            )
+
+        cursor.execute(
+            """
+            SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'
+            """,
+            [legacy_table],
+        )
+        cursor.execute(f"ALTER TABLE {qn(legacy_table)} DROP CONSTRAINT {qn(cursor.fetchone()[0])}")
+        cursor.execute(
+            f"ALTER TABLE {qn(legacy_table)} ADD CONSTRAINT {qn(legacy_table + '_pkey')} "
+            f"PRIMARY KEY ({qn(pk_column)}, {qn(partition_column)})"
+        )
+
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy_table)} INCLUDING DEFAULTS INCLUDING STORAGE) "
+            f"PARTITION BY RANGE ({qn(partition_column)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_pkey')} "
+            f"PRIMARY KEY ({qn(pk_column)}, {qn(partition_column)})"
+        )
+        if pk_sequence:
+            cursor.execute(f"ALTER SEQUENCE {pk_sequence} OWNED BY {qn(table)}.{qn(pk_column)}")
+
+        # Recreated on the empty partitioned table, the indexes and foreign keys of the existing table are then
+        # attached to them as is when it becomes a partition, instead of being built again
+        for _, index_definition in index_definitions:
+            cursor.execute(index_definition)
+        for constraint_name, foreign_key_definition in foreign_key_definitions:
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(constraint_name)} {foreign_key_definition}"
+            )
+
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(legacy_table)} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [get_month_start(timezone.now(), months=1)],
+        )
+
+
+def create_partitions(model, months_ahead=3):
+    """
+    Creates the monthly partitions of the model which are missing up to `months_ahead` months from now. Returns
+    the names of the partitions created.
+    """
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+
+    partitions = get_partitions(model)
+    month_start = partitions[-1][1] if partitions else get_month_start(timezone.now())
+    last_month_start = get_month_start(timezone.now(), months=months_ahead)
+
+    created_partition_names = []
+    with connection.cursor() as cursor:
+        while month_start <= last_month_start:
+            partition_name = _get_partition_name(model, month_start)
+            next_month_start = get_month_start(month_start, months=1)
+
+            cursor.execute(
+                f"CREATE TABLE {qn(partition_name)} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (%s)",
+                [month_start, next_month_start],
+            )
+            created_partition_names.append(partition_name)
+            month_start = next_month_start
+
+    return created_partition_names
+
+
+def detach_partitions(model, before, drop=False):
+    """
+    Detaches the partitions of the model holding only rows older than `before`, and drops them as well when
+    `drop` is set. Removes a whole month of rows at once without the cost of deleting them one by one. Returns
+    the names of the partitions detached.
+    """
+    if model not in DETACHABLE_MODELS:
+        raise ValueError(f"Partitions of {model._meta.db_table} can not be detached")
+
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+
+    detached_partition_names = []
+    with connection.cursor() as cursor:
+        for partition_name, upper_bound in get_partitions(model):
+            if upper_bound is None or upper_bound > before:
+                break
+
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(partition_name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {qn(partition_name)}")
+
+            detached_partition_names.append(partition_name)
+
+    return detached_partition_names
@@ -1,2 +0,0 @@
-# Import providers to be detected as subclasses
-from ..providers.mailjet import MailjetEmailProvider  # noqa
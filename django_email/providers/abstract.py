@@ -1,18 +1,69 @@
-from ..exceptions import EmailActivityTrackerNotFoundException
-from ..models import EmailActivityTracker, EmailLog, EventLog
+import logging
+
+from django.db import transaction
+
+from ..models import (
+    EmailActivityTracker,
+    EmailLog,
+    EngagementRollup,
+    EventLog,
+    PendingEvent,
+    SuppressedEmailAddress,
+)
+from ..rate_limiters import get_max_wait, get_rate_limiter
+
+logger = logging.getLogger(__name__)
 
 
 class AbstractEmailProvider(object):
     provider = None
+    # Maximum number of messages which can be sent to the provider in a single request
+    max_messages_per_request = 1
+
+    @classmethod
+    def get_rate_limit_key(cls):
+        return cls.provider
+
+    @classmethod
+    def throttle(cls):
+        """
+        Waits until a request can be made to the provider within its configured rate limit. Raises
+        RateLimitExceededException if that would take longer than DJANGO_EMAIL_RATE_LIMIT_MAX_WAIT seconds.
+        """
+        rate_limiter = get_rate_limiter(cls.provider)
+        if rate_limiter is not None:
+            rate_limiter.acquire(cls.get_rate_limit_key(), max_wait=get_max_wait())
+
+    @classmethod
+    async def athrottle(cls):
+        rate_limiter = get_rate_limiter(cls.provider)
+        if rate_limiter is not None:
+            await rate_limiter.aacquire(cls.get_rate_limit_key(), max_wait=get_max_wait())
 
     @classmethod
     def send_email(cls, email_log: EmailLog):
         raise NotImplementedError
 
+    @classmethod
+    async def asend_email(cls, email_log: EmailLog):
+        raise NotImplementedError
+
+    @classmethod
+    def send_bulk_email(cls, email_logs: list):
+        raise NotImplementedError
+
     @classmethod
     def parse_send_email_response_for_email_log(cls, response):
         raise NotImplementedError
 
+    @classmethod
+    def parse_send_bulk_email_response_for_email_logs(cls, response, email_logs: list):
+        """
+        Returns a list of (email_status, parsed_response) tuples, one for each of the email logs in the
+        order in which they were sent.
+        """
+        raise NotImplementedError
+
     @classmethod
     def parse_event_webhook(cls, event_info):
         raise NotImplementedError
@@ -23,30 +74,222 @@ class AbstractEmailProvider(object):
             response
         )
         if email_status == EmailLog.EMAIL_STATUS_SENT:
-            email_log.update_fields(dispatch_status=email_status)
+            with transaction.atomic():
+                email_log.update_fields(dispatch_status=email_status)
+
+                for recipient_data in parsed_response:
+                    recipient_data["email_log"] = email_log
+                    EmailActivityTracker.track_recipient(recipient_data)
+
+                EngagementRollup.add_sent({email_log: len(parsed_response)})
 
-            for recipient_data in parsed_response:
-                recipient_data["email_log"] = email_log
-                EmailActivityTracker.track_recipient(recipient_data)
+            cls._handle_pending_events_on_commit(
+                [recipient_data["message_id"] for recipient_data in parsed_response]
+            )
 
         elif email_status == EmailLog.EMAIL_STATUS_FAILED:
             email_log.update_fields(
                 dispatch_status=email_status, error_info=parsed_response
             )
 
-    # Handle this via creating a Celery task that retries at most 5 times
-    # Figure out how to reference celery @app.task inside a package
+    @classmethod
+    def handle_send_bulk_email_response(cls, response, email_logs: list):
+        parsed_responses = cls.parse_send_bulk_email_response_for_email_logs(
+            response, email_logs
+        )
+
+        updated_email_logs = []
+        recipients_data = []
+        email_log_vs_recipient_count = {}
+        for email_log, (email_status, parsed_response) in zip(email_logs, parsed_responses):
+            if email_status == EmailLog.EMAIL_STATUS_SENT:
+                email_log.dispatch_status = email_status
+                for recipient_data in parsed_response:
+                    recipient_data["email_log"] = email_log
+                    recipients_data.append(recipient_data)
+
+                email_log_vs_recipient_count[email_log] = len(parsed_response)
+
+            elif email_status == EmailLog.EMAIL_STATUS_FAILED:
+                email_log.dispatch_status = email_status
+                email_log.error_info = parsed_response
+
+            else:
+                continue
+
+            updated_email_logs.append(email_log)
+
+        with transaction.atomic():
+            EmailLog.update_dispatch_statuses(updated_email_logs)
+            EmailActivityTracker.track_recipients(recipients_data)
+            EngagementRollup.add_sent(email_log_vs_recipient_count)
+
+        cls._handle_pending_events_on_commit(
+            [recipient_data["message_id"] for recipient_data in recipients_data]
+        )
+
+    @classmethod
+    def _handle_pending_events_on_commit(cls, message_ids: list):
+        """
+        Handles the events of the new trackers which arrived before them once the trackers are committed. Done
+        after the commit so that a failure here can not undo the sending of the email.
+        """
+        if not message_ids:
+            return
+
+        def handle_pending_events():
+            try:
+                cls.handle_pending_events(message_ids=message_ids)
+            except Exception:
+                logger.exception(f"{cls.provider}: Could not handle pending events of new trackers")
+
+        transaction.on_commit(handle_pending_events)
+
+    @classmethod
+    def get_provider_event_id(cls, event_info):
+        """
+        Returns what the provider identifies the event by, apart from its message, type and time, or None.
+        """
+        return None
+
+    @classmethod
+    def get_event_dedup_key(cls, message_id, parsed_event_data, event_info):
+        return EventLog.get_dedup_key(
+            cls.provider,
+            message_id,
+            parsed_event_data["event_type"],
+            parsed_event_data["event_at"].isoformat(),
+            cls.get_provider_event_id(event_info),
+        )
+
+    @classmethod
+    def _parse_events(cls, event_infos: list):
+        """
+        Parses the events one at a time, leaving out the ones which can not be parsed, e.g. as their type is not
+        tracked, so that they do not take the other events of their group down with them. Returns (event_info,
+        message_id, parsed_event_data) tuples.
+        """
+        parsed_events = []
+        for event_info in event_infos:
+            try:
+                parsed_events.append((event_info, *cls.parse_event_webhook(event_info)))
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"{cls.provider}: Skipping event which could not be parsed: {event_info}", exc_info=True)
+
+        return parsed_events
 
     @classmethod
     def handle_event_webhook(cls, event_info):
-        message_id, parsed_event_data = cls.parse_event_webhook(event_info)
+        parsed_events = cls._parse_events([event_info])
+        if not parsed_events:
+            return
+
+        _, message_id, parsed_event_data = parsed_events[0]
+
+        ids = EmailActivityTracker.get_ids_by_message_ids([message_id]).get(message_id)
+        if ids is None:
+            # Handled once the tracker is created, or by the periodic sweep of pending events
+            PendingEvent.park(cls.provider, [(message_id, event_info)])
+            return
+
+        parsed_event_data["email_activity_tracker_id"], email_log_id = ids
+        parsed_event_data["dedup_key"] = cls.get_event_dedup_key(message_id, parsed_event_data, event_info)
+
+        with transaction.atomic():
+            event_log = EventLog.add_new_event_log(parsed_event_data)
+            if event_log is None:
+                # The provider delivered the event again, the tracker is already updated for it
+                return
+
+            tracker_id_vs_event_types = {event_log.email_activity_tracker_id: [event_log.event_type]}
+            EmailActivityTracker.update_fields_on_events(tracker_id_vs_event_types)
+            EngagementRollup.add_events({email_log_id: [event_log.event_type]})
+            SuppressedEmailAddress.add_for_events(tracker_id_vs_event_types)
+
+    @classmethod
+    def handle_event_webhooks(cls, event_infos: list):
+        """
+        Handles a group of events in a fixed number of queries. The events for which no activity tracker was
+        found are parked until the tracker is created, and returned.
+        """
+        unmatched_events = cls._log_events(event_infos)
+        PendingEvent.park(cls.provider, unmatched_events)
+
+        return [event_info for _, event_info in unmatched_events]
+
+    @classmethod
+    def handle_pending_events(cls, message_ids: list = None, batch_size=1000):
+        """
+        Handles the parked events of the provider whose trackers exist by now, either of the given message ids
+        or all of them, and returns the number of events handled.
+        """
+        handled_count = 0
+        last_pending_event_id = 0
+
+        while True:
+            with transaction.atomic():
+                pending_events = PendingEvent.get_for_handling(
+                    cls.provider, message_ids=message_ids, after_id=last_pending_event_id, limit=batch_size
+                )
+                if not pending_events:
+                    return handled_count
+
+                unmatched_events = cls._log_events([pending_event.event_info for pending_event in pending_events])
+                unmatched_event_info_ids = {id(event_info) for _, event_info in unmatched_events}
+
+                handled_pending_event_ids = [
+                    pending_event.id
+                    for pending_event in pending_events
+                    if id(pending_event.event_info) not in unmatched_event_info_ids
+                ]
+                PendingEvent.objects.filter(id__in=handled_pending_event_ids).delete()
+
+            handled_count += len(handled_pending_event_ids)
+            last_pending_event_id = pending_events[-1].id
+
+    @classmethod
+    def _log_events(cls, event_infos: list):
+        """
+        Logs the events whose trackers exist and updates the trackers and the engagement rollups, and suppresses
+        the recipients which hard bounced or marked the email as spam. Returns the other events as
+        (message_id, event_info) tuples.
+        """
+        parsed_events = cls._parse_events(event_infos)
+
+        message_id_vs_ids = EmailActivityTracker.get_ids_by_message_ids(
+            list({message_id for _, message_id, _ in parsed_events})
+        )
+
+        unmatched_events = []
+        events_data = []
+        tracker_id_vs_email_log_id = {}
+        for event_info, message_id, parsed_event_data in parsed_events:
+            ids = message_id_vs_ids.get(message_id)
+            if ids is None:
+                unmatched_events.append((message_id, event_info))
+                continue
+
+            email_activity_tracker_id, tracker_id_vs_email_log_id[email_activity_tracker_id] = ids
+            parsed_event_data["email_activity_tracker_id"] = email_activity_tracker_id
+            parsed_event_data["dedup_key"] = cls.get_event_dedup_key(message_id, parsed_event_data, event_info)
+            events_data.append(parsed_event_data)
+
+        with transaction.atomic():
+            # Events delivered again by the provider are left out, so trackers are only updated for the new ones
+            event_logs = EventLog.add_new_event_logs(events_data)
 
-        email_activity_tracker = EmailActivityTracker.get_by_message_id(message_id)
-        if email_activity_tracker is None:
-            # raise a normal exception here
-            raise EmailActivityTrackerNotFoundException()
+            tracker_id_vs_event_types = {}
+            email_log_id_vs_event_types = {}
+            for event_log in sorted(event_logs, key=lambda event_log: event_log.event_at):
+                tracker_id_vs_event_types.setdefault(
+                    event_log.email_activity_tracker_id, []
+                ).append(event_log.event_type)
+                email_log_id_vs_event_types.setdefault(
+                    tracker_id_vs_email_log_id[event_log.email_activity_tracker_id], []
+                ).append(event_log.event_type)
 
-        parsed_event_data["email_activity_tracker"] = email_activity_tracker
-        event_log = EventLog.add_new_event_log(parsed_event_data)
+            EmailActivityTracker.update_fields_on_events(tracker_id_vs_event_types)
+            EngagementRollup.add_events(email_log_id_vs_event_types)
+            SuppressedEmailAddress.add_for_events(tracker_id_vs_event_types)
 
-        email_activity_tracker.update_fields_on_event(event_log.event_type)
+        return unmatched_events
@@ -1,13 +1,18 @@
+import asyncio
+import json
 import logging
+import weakref
 from datetime import datetime
 
 import pytz
 from django.conf import settings
-from mailjet_rest import Client
 
+from ..concurrency import aconcurrency_slot, concurrency_slot
 from ..constants import EMAIL_PROVIDER_MAILJET
+from ..exceptions import RateLimitExceededException
 from ..models import EventLog, EmailActivityTracker, EmailLog
 from ..providers.abstract import AbstractEmailProvider
+from ..providers.transport import get_session, get_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +20,90 @@ logger = logging.getLogger(__name__)
 class MailjetEmailProvider(AbstractEmailProvider):
 
     provider = EMAIL_PROVIDER_MAILJET
-    sdk_client = Client(
-        auth=(settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY),
-        version="v3.1",
-    )
+    # Send API v3.1 accepts at most 50 messages in a single request
+    max_messages_per_request = 50
+    # Created on first use, so that importing this module does not need the sdk or the credentials
+    _sdk_client = None
+    # httpx.AsyncClient instances, along with what closes them, keyed by the event loop they are used in, as their
+    # connection pools can not be shared between loops
+    _async_clients = weakref.WeakKeyDictionary()
 
     @classmethod
-    def _create_email_data(cls, email_log):
+    def get_sdk_client(cls):
+        if cls._sdk_client is None:
+            from mailjet_rest import Client
+
+            cls._sdk_client = Client(
+                auth=(settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY),
+                version="v3.1",
+            )
+
+        return cls._sdk_client
+
+    @staticmethod
+    async def _close_on_loop_shutdown(async_client):
+        try:
+            yield
+        finally:
+            await async_client.aclose()
+
+    @classmethod
+    async def _get_async_client(cls):
+        loop = asyncio.get_running_loop()
+        async_client, _ = cls._async_clients.get(loop, (None, None))
+
+        if async_client is None:
+            # httpx is an optional dependency and only needed when sending emails asynchronously
+            import httpx
+
+            async_client = httpx.AsyncClient(
+                auth=cls.get_sdk_client().auth,
+                limits=httpx.Limits(
+                    max_connections=getattr(settings, "DJANGO_EMAIL_ASYNC_MAX_CONNECTIONS", 100),
+                    max_keepalive_connections=getattr(
+                        settings, "DJANGO_EMAIL_ASYNC_MAX_KEEPALIVE_CONNECTIONS", 20
+                    ),
+                    keepalive_expiry=getattr(settings, "DJANGO_EMAIL_ASYNC_KEEPALIVE_EXPIRY", 5.0),
+                ),
+                timeout=getattr(settings, "DJANGO_EMAIL_ASYNC_TIMEOUT", 60),
+                # Needs the h2 package, i.e. httpx[http2]
+                http2=getattr(settings, "DJANGO_EMAIL_HTTP2", False),
+            )
+            # Closed by the loop along with its other async generators when it is shut down, e.g. at the end of
+            # asyncio.run or of every async_to_sync call, so that the connections of short lived loops are not leaked
+            closer = cls._close_on_loop_shutdown(async_client)
+            cls._async_clients[loop] = (async_client, closer)
+            await closer.__anext__()
+
+        return async_client
+
+    @classmethod
+    def get_rate_limit_key(cls):
+        return f"{cls.provider}:{settings.MAILJET_API_KEY}"
+
+    @classmethod
+    def _raise_for_rate_limit(cls, response):
+        # Throttled requests are not failures of the email, they are raised so that the email stays queued and is
+        # sent again later
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                retry_after = None
+
+            raise RateLimitExceededException(retry_after=retry_after)
+
+    @classmethod
+    def _is_overloaded_response(cls, response):
+        return response.status_code == 429 or response.status_code >= 500
+
+    @classmethod
+    def _is_success_response(cls, response):
+        # Works for both requests and httpx responses
+        return response.status_code < 400
+
+    @classmethod
+    def _create_message(cls, email_log):
         message = {
             "From": {"Email": email_log.from_email, "Name": email_log.from_name or email_log.from_email},
             "Subject": email_log.subject,
@@ -47,12 +129,78 @@ class MailjetEmailProvider(AbstractEmailProvider):
         if email_log.reply_to:
             message['ReplyTo'] = {'Email': email_log.reply_to}
 
-        return {"Messages": [message]}
+        return message
+
+    @classmethod
+    def _create_email_data(cls, email_log):
+        return {"Messages": [cls._create_message(email_log)]}
+
+    @classmethod
+    def _create_bulk_email_data(cls, email_logs):
+        return {"Messages": [cls._create_message(email_log) for email_log in email_logs]}
+
+    @classmethod
+    def _parse_message_response(cls, recipients_response_data):
+        recipient_vs_type = {
+            "To": EmailActivityTracker.TO_RECIPIENT_TYPE,
+            "Cc": EmailActivityTracker.CC_RECIPIENT_TYPE,
+            "Bcc": EmailActivityTracker.BCC_RECIPIENT_TYPE,
+        }
+
+        parsed_response = []
+        for recipient in recipient_vs_type.keys():
+            parsed_response += [
+                {
+                    "recipient_type": recipient_vs_type[recipient],
+                    "email_address": recipient_response_data["Email"],
+                    "message_id": str(recipient_response_data["MessageID"]),
+                }
+                for recipient_response_data in recipients_response_data.get(recipient, [])
+            ]
+
+        return parsed_response
+
+    @classmethod
+    def _send(cls, data):
+        # The sdk client opens a new connection for every request, so only its configuration is used here and the
+        # request is made through the pooled session of this process instead
+        sdk_client = cls.get_sdk_client()
+        url, headers = sdk_client.config["send"]
+
+        with concurrency_slot(cls.provider) as slot:
+            response = get_session(cls.provider).post(
+                url, data=json.dumps(data), headers=headers, auth=sdk_client.auth, timeout=get_timeout()
+            )
+            slot.overloaded = cls._is_overloaded_response(response)
+            cls._raise_for_rate_limit(response)
+
+        return response
 
     @classmethod
     def send_email(cls, email_log):
         data = cls._create_email_data(email_log)
-        response = cls.sdk_client.send.create(data=data)
+        response = cls._send(data)
+
+        return response
+
+    @classmethod
+    async def asend_email(cls, email_log):
+        data = cls._create_email_data(email_log)
+        url, headers = cls.get_sdk_client().config["send"]
+        async with aconcurrency_slot(cls.provider) as slot:
+            async_client = await cls._get_async_client()
+            response = await async_client.post(
+                url, content=json.dumps(data), headers=headers
+            )
+            slot.overloaded = cls._is_overloaded_response(response)
+            cls._raise_for_rate_limit(response)
+
+        return response
+
+    @classmethod
+    def send_bulk_email(cls, email_logs):
+        data = cls._create_bulk_email_data(email_logs)
+        response = cls._send(data)
 
         return response
 
@@ -60,25 +208,8 @@ class MailjetEmailProvider(AbstractEmailProvider):
     def parse_send_email_response_for_email_log(cls, response):
         response_data = response.json()
 
-        if response.ok:
-            recipients_response_data = response_data["Messages"][0]
-
-            recipient_vs_type = {
-                "To": EmailActivityTracker.TO_RECIPIENT_TYPE,
-                "Cc": EmailActivityTracker.CC_RECIPIENT_TYPE,
-                "Bcc": EmailActivityTracker.BCC_RECIPIENT_TYPE,
-            }
-
-            parsed_response = []
-            for recipient in recipient_vs_type.keys():
-                parsed_response += [
-                    {
-                        "recipient_type": recipient_vs_type[recipient],
-                        "email_address": recipient_response_data["Email"],
-                        "message_id": str(recipient_response_data["MessageID"]),
-                    }
-                    for recipient_response_data in recipients_response_data[recipient]
-                ]
+        if cls._is_success_response(response):
+            parsed_response = cls._parse_message_response(response_data["Messages"][0])
 
             return EmailLog.EMAIL_STATUS_SENT, parsed_response
 
@@ -92,6 +223,46 @@ class MailjetEmailProvider(AbstractEmailProvider):
 
             return EmailLog.EMAIL_STATUS_FAILED, error_info
 
+    @classmethod
+    def parse_send_bulk_email_response_for_email_logs(cls, response, email_logs):
+        response_data = response.json()
+        messages_response_data = response_data.get("Messages") if isinstance(response_data, dict) else None
+
+        # Mailjet reports the status of every message separately and in the order they were sent. If the
+        # response does not carry one entry per message, the whole request is considered to have failed.
+        if not messages_response_data or len(messages_response_data) != len(email_logs):
+            error_info = {"error": response_data}
+
+            logger.exception(
+                "Mailjet: Could not send bulk email",
+                extra={"status code": response.status_code, "errors": error_info},
+            )
+
+            return [(EmailLog.EMAIL_STATUS_FAILED, error_info)] * len(email_logs)
+
+        parsed_responses = []
+        for message_response_data in messages_response_data:
+            if message_response_data.get("Status") == "success":
+                parsed_responses.append(
+                    (EmailLog.EMAIL_STATUS_SENT, cls._parse_message_response(message_response_data))
+                )
+            else:
+                parsed_responses.append((EmailLog.EMAIL_STATUS_FAILED, {"error": message_response_data}))
+
+        if not cls._is_success_response(response):
+            logger.warning(
+                "Mailjet: Could not send some of the bulk emails",
+                extra={"status code": response.status_code},
+            )
+
+        return parsed_responses
+
+    @classmethod
+    def get_provider_event_id(cls, event_info):
+        # Mailjet events carry no id of their own and their time is in seconds, the url tells apart clicks on
+        # different links in the same second
+        return event_info.get("url")
+
     @classmethod
     def parse_event_webhook(cls, event_info):
         message_id = str(event_info["MessageID"])
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from ..constants import EMAIL_PROVIDER_MAILJET
+
+BUILTIN_PROVIDER_CLASSES = {
+    EMAIL_PROVIDER_MAILJET: "django_email.providers.mailjet.MailjetEmailProvider",
+}
+
+
+class ProviderRegistry(object):
+    """
+    Maps provider names to their provider classes. Built-in providers are only imported when they are first
+    used, the ones listed in the DJANGO_EMAIL_PROVIDERS setting are imported when the registry is loaded as the
+    name of the provider is only known from the class.
+    """
+
+    def __init__(self):
+        self._provider_vs_class_path = {}
+        self._provider_vs_class = {}
+
+    def register(self, provider_class):
+        self._provider_vs_class_path[provider_class.provider] = (
+            f"{provider_class.__module__}.{provider_class.__qualname__}"
+        )
+        self._provider_vs_class[provider_class.provider] = provider_class
+
+    def load(self):
+        self._provider_vs_class_path = dict(BUILTIN_PROVIDER_CLASSES)
+        self._provider_vs_class = {}
+
+        for class_path in getattr(settings, "DJANGO_EMAIL_PROVIDERS", []):
+            self.register(import_string(class_path))
+
+    def get_provider_class(self, provider: str):
+        """
+        Raises KeyError if the provider is not registered.
+        """
+        provider_class = self._provider_vs_class.get(provider)
+
+        if provider_class is None:
+            provider_class = self._provider_vs_class[provider] = import_string(
+                self._provider_vs_class_path[provider]
+            )
+
+        return provider_class
+
+
+provider_registry = ProviderRegistry()
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# Sessions keep their connections open between requests so that every send does not pay for a new TCP and TLS
+# handshake. They are created per process, since sockets inherited from a parent process (e.g. by celery prefork
+# workers) can not be shared safely.
+_sessions = {}
+_sessions_pid = None
+_sessions_lock = threading.Lock()
+
+
+def _create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, "DJANGO_EMAIL_HTTP_POOL_CONNECTIONS", 10),
+        pool_maxsize=getattr(settings, "DJANGO_EMAIL_HTTP_POOL_MAXSIZE", 10),
+        pool_block=getattr(settings, "DJANGO_EMAIL_HTTP_POOL_BLOCK", False),
+        max_retries=getattr(settings, "DJANGO_EMAIL_HTTP_MAX_RETRIES", 0),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_session(name):
+    """
+    Returns the pooled session of this process for the given name, usually the name of the provider.
+    """
+    global _sessions_pid
+
+    with _sessions_lock:
+        if _sessions_pid != os.getpid():
+            # Forked from a process which had already opened connections, start afresh
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = _create_session()
+
+    return session
+
+
+def get_timeout():
+    return getattr(settings, "DJANGO_EMAIL_HTTP_TIMEOUT", 60)
+
+
+def get_pool_stats():
+    """
+    Returns the number of connections opened and requests made per host for the sessions of this process. A
+    number of requests much higher than the number of connections means connections are being reused.
+    """
+    stats = {}
+
+    with _sessions_lock:
+        if _sessions_pid != os.getpid():
+            return stats
+
+        for name, session in _sessions.items():
+            session_stats = stats[name] = {}
+
+            for adapter in set(session.adapters.values()):
+                for pool_key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[pool_key]
+                    session_stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                        "connections": pool.num_connections,
+                        "requests": pool.num_requests,
+                    }
+
+    return stats
@@ -0,0 +1,159 @@
+import asyncio
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .exceptions import RateLimitExceededException
+
+
+class AbstractRateLimiter(object):
+    """
+    Allows `rate` requests per second on average with bursts of up to `burst` requests for every key.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+
+    def try_acquire(self, key, tokens=1):
+        """
+        Takes the tokens if they are available and returns 0, otherwise returns the number of seconds after which
+        they could be available.
+        """
+        raise NotImplementedError
+
+    def _take_tokens(self, bucket, now, tokens):
+        """
+        Refills the bucket, a tuple of the tokens available and the time they were counted at, for the time elapsed
+        since and takes the tokens from it if they are available. Returns the bucket left and the number of seconds
+        to wait, 0 if the tokens were taken.
+        """
+        available_tokens, updated_at = bucket or (self.burst, now)
+        available_tokens = min(self.burst, available_tokens + max(0, now - updated_at) * self.rate)
+
+        if available_tokens >= tokens:
+            return (available_tokens - tokens, now), 0
+
+        return (available_tokens, now), (tokens - available_tokens) / self.rate
+
+    def acquire(self, key, tokens=1, max_wait=None):
+        """
+        Waits for the tokens for at most `max_wait` seconds, raises RateLimitExceededException if they would not
+        be available by then.
+        """
+        waited = 0
+        while True:
+            wait = self.try_acquire(key, tokens)
+            if not wait:
+                return
+
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitExceededException(retry_after=wait)
+
+            time.sleep(wait)
+            waited += wait
+
+    async def aacquire(self, key, tokens=1, max_wait=None):
+        waited = 0
+        while True:
+            wait = self.try_acquire(key, tokens)
+            if not wait:
+                return
+
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitExceededException(retry_after=wait)
+
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+class LocalRateLimiter(AbstractRateLimiter):
+    """
+    Token bucket kept in the memory of the process. Every process gets the whole rate, so the rate should be
+    divided by the number of processes sending emails.
+    """
+
+    def __init__(self, rate, burst=None):
+        super().__init__(rate, burst)
+        self._key_vs_bucket = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key, tokens=1):
+        now = time.monotonic()
+
+        with self._lock:
+            self._key_vs_bucket[key], wait = self._take_tokens(self._key_vs_bucket.get(key), now, tokens)
+
+        return wait
+
+
+class CacheRateLimiter(AbstractRateLimiter):
+    """
+    Token bucket shared by all the processes using the same Django cache, e.g. redis or memcached. The bucket is
+    read and written back under a lock taken with an atomic add to the cache, so that all the processes together
+    never get more than `burst` requests at once and `rate` requests per second on average. Relies on the clocks
+    of the servers being in sync. The cache used can be set with DJANGO_EMAIL_RATE_LIMITER_CACHE.
+    """
+
+    key_prefix = "django_email:rate_limit"
+    # Seconds after which the lock is released anyway, should its process die while holding it
+    lock_timeout = 1
+    # Seconds after which the tokens are tried again when another process holds the lock
+    lock_retry_interval = 0.01
+
+    def __init__(self, rate, burst=None):
+        super().__init__(rate, burst)
+        self.cache = caches[getattr(settings, "DJANGO_EMAIL_RATE_LIMITER_CACHE", "default")]
+        # A bucket which has not been used for that long is full again, hence is not kept any longer
+        self.bucket_timeout = math.ceil(self.burst / self.rate) + 1
+
+    def try_acquire(self, key, tokens=1):
+        bucket_key = f"{self.key_prefix}:{key}"
+        lock_key = f"{bucket_key}:lock"
+
+        if not self.cache.add(lock_key, 1, timeout=self.lock_timeout):
+            return self.lock_retry_interval
+
+        try:
+            bucket, wait = self._take_tokens(self.cache.get(bucket_key), time.time(), tokens)
+            self.cache.set(bucket_key, bucket, timeout=self.bucket_timeout)
+
+        finally:
+            self.cache.delete(lock_key)
+
+        return wait
+
+
+_provider_vs_rate_limiter = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """
+    Returns the rate limiter of the provider as configured in DJANGO_EMAIL_RATE_LIMITS, or None if the provider is
+    not to be rate limited.
+    """
+    rate_limit = getattr(settings, "DJANGO_EMAIL_RATE_LIMITS", {}).get(provider)
+    if not rate_limit:
+        return None
+
+    with _rate_limiters_lock:
+        rate_limiter = _provider_vs_rate_limiter.get(provider)
+
+        if rate_limiter is None:
+            rate_limiter_class = import_string(
+                getattr(settings, "DJANGO_EMAIL_RATE_LIMITER_CLASS", "django_email.rate_limiters.LocalRateLimiter")
+            )
+            rate_limiter = _provider_vs_rate_limiter[provider] = rate_limiter_class(
+                rate_limit["rate"], rate_limit.get("burst")
+            )
+
+    return rate_limiter
+
+
+def get_max_wait():
+    return getattr(settings, "DJANGO_EMAIL_RATE_LIMIT_MAX_WAIT", 10)
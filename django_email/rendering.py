@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Engine
+
+_engine = None
+
+
+def get_engine():
+    """
+    Returns the template engine of the email templates. It is independent of the TEMPLATES setting of the project,
+    so email templates can only use the built in tags and filters, and it autoescapes the dynamic data.
+    """
+    global _engine
+
+    if _engine is None:
+        _engine = Engine(autoescape=True)
+
+    return _engine
+
+
+class CompiledTemplateCache(object):
+    """
+    Least recently used cache of compiled templates, keyed by the template and its version so that a changed
+    template is compiled afresh.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._key_vs_compiled_template = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, source):
+        with self._lock:
+            compiled_template = self._key_vs_compiled_template.get(key)
+            if compiled_template is not None:
+                self._key_vs_compiled_template.move_to_end(key)
+                self.hits += 1
+                return compiled_template
+
+            self.misses += 1
+
+        # Compiled outside the lock, compiling the same template twice at once is harmless
+        compiled_template = get_engine().from_string(source)
+
+        with self._lock:
+            self._key_vs_compiled_template[key] = compiled_template
+            self._key_vs_compiled_template.move_to_end(key)
+            while len(self._key_vs_compiled_template) > self.max_size:
+                self._key_vs_compiled_template.popitem(last=False)
+
+        return compiled_template
+
+    def clear(self):
+        with self._lock:
+            self._key_vs_compiled_template.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self._key_vs_compiled_template), "hits": self.hits, "misses": self.misses}
+
+
+_compiled_template_cache = None
+_compiled_template_cache_lock = threading.Lock()
+
+
+def get_compiled_template_cache():
+    global _compiled_template_cache
+
+    with _compiled_template_cache_lock:
+        if _compiled_template_cache is None:
+            _compiled_template_cache = CompiledTemplateCache(
+                getattr(settings, "DJANGO_EMAIL_TEMPLATE_CACHE_SIZE", 128)
+            )
+
+    return _compiled_template_cache
+
+
+def render_template(key, source, template_dynamic_data: dict = None):
+    compiled_template = get_compiled_template_cache().get(key, source)
+
+    return compiled_template.render(Context(template_dynamic_data or {}))
@@ -1,10 +1,14 @@
 import logging
+from datetime import timedelta
 
 from django.conf import settings
+from django.db import transaction
 
 from .constants import DEFAULT_EMAIL_PROVIDER
-from .models import EmailLog
-from .providers.abstract import AbstractEmailProvider
+from .exceptions import RateLimitExceededException, RecipientsSuppressedException
+from .models import EmailIdempotencyKey, EmailLog, EmailTemplate, EngagementRollup, PendingEvent
+from .providers.registry import provider_registry
+from .suppression import get_suppressed_email_addresses
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +16,10 @@ logger = logging.getLogger(__name__)
 class EmailService(object):
     @classmethod
     def _get_provider_class_for_provider(cls, provider: str):
-        for provider_class in AbstractEmailProvider.__subclasses__():
-            if provider_class.provider == provider:
-                return provider_class
+        try:
+            return provider_registry.get_provider_class(provider)
 
-        else:
+        except KeyError:
             logger.warning(
                 f"Unsupported email provider {provider} requested for service"
             )
@@ -24,6 +27,86 @@ class EmailService(object):
                 f"Provider {provider} is not supported by the email module as of today."
             )
 
+    @classmethod
+    def _get_email_template(cls, email_template_name):
+        if email_template_name is None:
+            return None
+
+        email_template = EmailTemplate.get_by_name(email_template_name)
+        if email_template is None:
+            raise ValueError(f"Email template {email_template_name} does not exist.")
+
+        return email_template
+
+    @classmethod
+    def _drop_suppressed_recipients(cls, to_emails: list, cc_emails: list = None, bcc_emails: list = None):
+        """
+        Returns the to, cc and bcc email addresses without the suppressed ones, unless DJANGO_EMAIL_SUPPRESS_RECIPIENTS
+        is turned off. Raises RecipientsSuppressedException if none of the to email addresses are left.
+        """
+        if not getattr(settings, "DJANGO_EMAIL_SUPPRESS_RECIPIENTS", True):
+            return to_emails, cc_emails, bcc_emails
+
+        suppressed_email_addresses = get_suppressed_email_addresses(
+            [*to_emails, *(cc_emails or []), *(bcc_emails or [])]
+        )
+        if not suppressed_email_addresses:
+            return to_emails, cc_emails, bcc_emails
+
+        logger.info(f"Not emailing the suppressed email addresses {sorted(suppressed_email_addresses)}")
+
+        to_emails, cc_emails, bcc_emails = [
+            email_addresses
+            if email_addresses is None
+            else [
+                email_address
+                for email_address in email_addresses
+                if email_address.lower() not in suppressed_email_addresses
+            ]
+            for email_addresses in (to_emails, cc_emails, bcc_emails)
+        ]
+        if not to_emails:
+            raise RecipientsSuppressedException(sorted(suppressed_email_addresses))
+
+        return to_emails, cc_emails, bcc_emails
+
+    @classmethod
+    def _create_log(
+        cls, idempotency_key, email_provider, from_email, from_name, to_emails, cc_emails, bcc_emails, *log_args,
+        **log_kwargs
+    ):
+        """
+        Creates the email log without the suppressed recipients, or returns the one already created for the
+        idempotency key as it is. Also returns whether the email log was created.
+        """
+        def create_log():
+            return EmailLog.create_log(
+                email_provider,
+                from_email,
+                from_name,
+                *cls._drop_suppressed_recipients(to_emails, cc_emails, bcc_emails),
+                *log_args,
+                **log_kwargs,
+            )
+
+        if idempotency_key is None:
+            return create_log(), True
+
+        # Repeat calls are answered by this lookup alone, even if the recipients were suppressed since
+        email_log = EmailIdempotencyKey.get_email_log(idempotency_key)
+        if email_log is not None:
+            return email_log, False
+
+        with transaction.atomic():
+            if not EmailIdempotencyKey.claim(idempotency_key):
+                return EmailIdempotencyKey.get_email_log(idempotency_key), False
+
+            # The key is released along with the rest if all the recipients are suppressed
+            email_log = create_log()
+            EmailIdempotencyKey.set_email_log(idempotency_key, email_log)
+
+        return email_log, True
+
     @classmethod
     def send_email(
         cls,
@@ -34,14 +117,35 @@ class EmailService(object):
         body=None,
         template_id=None,
         template_dynamic_data: dict = None,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        from_name=settings.DEFAULT_FROM_NAME,
+        from_email=None,
+        from_name=None,
         email_provider=DEFAULT_EMAIL_PROVIDER,
-        reply_to=None
+        reply_to=None,
+        async_dispatch=False,
+        email_template=None,
+        idempotency_key=None,
     ):
+        """
+        Sends the email right away, or when `async_dispatch` is set, only saves it in queued status and leaves
+        sending it to a celery worker once the current transaction is committed.
+
+        `email_template` is the name of a local template which the body is rendered with, using
+        `template_dynamic_data`, when the email is sent.
+
+        When called again with the same `idempotency_key`, returns the email log created by the first call
+        instead of creating another one, until the key expires after DJANGO_EMAIL_IDEMPOTENCY_KEY_TTL. The email
+        log is sent, or queued, again only if it is still queued, e.g. as the first call failed before sending it.
+
+        Suppressed email addresses are left out of the recipients. RecipientsSuppressedException is raised, and
+        nothing is saved, if all the to email addresses are suppressed.
+        """
         provider_class = cls._get_provider_class_for_provider(email_provider)
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        from_name = from_name or settings.DEFAULT_FROM_NAME
+        email_template = cls._get_email_template(email_template)
 
-        email_log = EmailLog.create_log(
+        email_log, created = cls._create_log(
+            idempotency_key,
             email_provider,
             from_email,
             from_name,
@@ -52,14 +156,315 @@ class EmailService(object):
             body,
             template_id,
             template_dynamic_data,
-            reply_to
+            reply_to,
+            email_template=email_template,
         )
+        # An email log left queued by a failed call is sent by the repeat call, unless it is being sent already
+        if not created and email_log.dispatch_status != EmailLog.EMAIL_STATUS_QUEUED:
+            return email_log
+
+        if async_dispatch:
+            cls._enqueue_dispatch([email_log.id])
+            return email_log
+
+        # Claimed while it is being sent so that the email dispatcher does not pick it up as well. The claim is
+        # committed right away, so that no transaction is held open while waiting on the provider.
+        if not EmailLog.claim_for_dispatch(email_log_ids=[email_log.id]):
+            return email_log
+
+        try:
+            EmailLog.render_bodies([email_log])
+            provider_class.throttle()
+            response = provider_class.send_email(email_log)
+            provider_class.handle_send_email_response(response, email_log)
+
+        except RateLimitExceededException as e:
+            logger.info(f"Rate limit of {email_provider} exceeded, email log {email_log.id} is sent later")
+            EmailLog.release_claims([email_log])
+            cls._enqueue_dispatch([email_log.id], countdown=e.retry_after)
+
+        except Exception:
+            # The email log stays queued and is sent again by the email dispatcher
+            EmailLog.release_claims([email_log])
+            raise
 
-        response = provider_class.send_email(email_log)
-        provider_class.handle_send_email_response(response, email_log)
+        return email_log
+
+    @classmethod
+    async def asend_email(
+        cls,
+        to_emails: list,
+        subject,
+        cc_emails: list = None,
+        bcc_emails: list = None,
+        body=None,
+        template_id=None,
+        template_dynamic_data: dict = None,
+        from_email=None,
+        from_name=None,
+        email_provider=DEFAULT_EMAIL_PROVIDER,
+        reply_to=None,
+        email_template=None,
+        idempotency_key=None,
+    ):
+        """
+        Same as `send_email` but waits on the provider without blocking the thread, so that many emails can
+        be in flight at once. The ORM writes are run through sync_to_async. An email which is not sent as the rate
+        limit is exceeded is left to the dispatch_email_logs task, as with `send_email`.
+        """
+        from asgiref.sync import sync_to_async
+
+        provider_class = cls._get_provider_class_for_provider(email_provider)
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        from_name = from_name or settings.DEFAULT_FROM_NAME
+        email_template = await sync_to_async(cls._get_email_template)(email_template)
+
+        email_log, created = await sync_to_async(cls._create_log)(
+            idempotency_key,
+            email_provider,
+            from_email,
+            from_name,
+            to_emails,
+            cc_emails,
+            bcc_emails,
+            subject,
+            body,
+            template_id,
+            template_dynamic_data,
+            reply_to,
+            email_template=email_template,
+        )
+        # An email log left queued by a failed call is sent by the repeat call, unless it is being sent already
+        if not created and email_log.dispatch_status != EmailLog.EMAIL_STATUS_QUEUED:
+            return email_log
+
+        if not await sync_to_async(EmailLog.claim_for_dispatch)(email_log_ids=[email_log.id]):
+            return email_log
+
+        try:
+            await sync_to_async(EmailLog.render_bodies)([email_log])
+            await provider_class.athrottle()
+            response = await provider_class.asend_email(email_log)
+            await sync_to_async(provider_class.handle_send_email_response)(response, email_log)
+
+        except RateLimitExceededException as e:
+            logger.info(f"Rate limit of {email_provider} exceeded, email log {email_log.id} is sent later")
+            await sync_to_async(EmailLog.release_claims)([email_log])
+            await sync_to_async(cls._enqueue_dispatch)([email_log.id], countdown=e.retry_after)
+
+        except Exception:
+            await sync_to_async(EmailLog.release_claims)([email_log])
+            raise
+
+        return email_log
+
+    @classmethod
+    def send_bulk(cls, messages: list, email_provider=DEFAULT_EMAIL_PROVIDER, async_dispatch=False):
+        """
+        Sends many emails with as few provider requests as possible. Each item of `messages` is a dict
+        accepting the same keyword arguments as `send_email` except `email_provider` and `async_dispatch`.
+        Returns the email logs of the messages, leaving out the ones all of whose to email addresses are
+        suppressed. Messages with an `idempotency_key` which was used before get the email log created then,
+        which is only sent if it is still queued.
+        """
+        provider_class = cls._get_provider_class_for_provider(email_provider)
+
+        email_template_name_vs_email_template = {
+            email_template_name: cls._get_email_template(email_template_name)
+            for email_template_name in {message.get("email_template") for message in messages}
+        }
+
+        def get_log_data(message):
+            return {
+                "email_provider": email_provider,
+                "from_email": message.get("from_email") or settings.DEFAULT_FROM_EMAIL,
+                "from_name": message.get("from_name") or settings.DEFAULT_FROM_NAME,
+                "to_emails": message["to_emails"],
+                "cc_emails": message.get("cc_emails"),
+                "bcc_emails": message.get("bcc_emails"),
+                "subject": message["subject"],
+                "body": message.get("body"),
+                "template_id": message.get("template_id"),
+                "template_dynamic_data": message.get("template_dynamic_data"),
+                "reply_to": message.get("reply_to"),
+                "email_template": email_template_name_vs_email_template[message.get("email_template")],
+            }
+
+        # The messages with an idempotency key are created one by one, the others all at once, in the same order
+        message_index_vs_email_log = {}
+        message_index_vs_log_data = {}
+        for message_index, message in enumerate(messages):
+            log_data = get_log_data(message)
+
+            try:
+                if message.get("idempotency_key") is None:
+                    log_data["to_emails"], log_data["cc_emails"], log_data["bcc_emails"] = (
+                        cls._drop_suppressed_recipients(
+                            log_data["to_emails"], log_data["cc_emails"], log_data["bcc_emails"]
+                        )
+                    )
+                    message_index_vs_log_data[message_index] = log_data
+
+                else:
+                    message_index_vs_email_log[message_index], _ = cls._create_log(
+                        message["idempotency_key"], **log_data
+                    )
+
+            except RecipientsSuppressedException:
+                continue
+
+        message_index_vs_email_log.update(
+            zip(message_index_vs_log_data, EmailLog.create_logs(list(message_index_vs_log_data.values())))
+        )
+        email_logs = [message_index_vs_email_log[message_index] for message_index in sorted(message_index_vs_email_log)]
+        # The ones sent by an earlier call with the same idempotency key are not sent again
+        queued_email_logs = [
+            email_log for email_log in email_logs if email_log.dispatch_status == EmailLog.EMAIL_STATUS_QUEUED
+        ]
+
+        batch_size = provider_class.max_messages_per_request
+        for index in range(0, len(queued_email_logs), batch_size):
+            batch = queued_email_logs[index:index + batch_size]
+
+            if async_dispatch:
+                cls._enqueue_dispatch([email_log.id for email_log in batch])
+                continue
+
+            # Only the email logs claimed are sent, the others are being sent by the email dispatcher already
+            claimed_email_log_ids = {
+                email_log.id
+                for email_log in EmailLog.claim_for_dispatch(email_log_ids=[email_log.id for email_log in batch])
+            }
+            batch = [email_log for email_log in batch if email_log.id in claimed_email_log_ids]
+            if not batch:
+                continue
+
+            try:
+                cls._send_batch(provider_class, batch)
+
+            except RateLimitExceededException as e:
+                logger.info(f"Rate limit of {email_provider} exceeded, remaining bulk emails are sent later")
+                async_dispatch = True
+                EmailLog.release_claims(batch)
+                cls._enqueue_dispatch([email_log.id for email_log in batch], countdown=e.retry_after)
+
+            except Exception:
+                EmailLog.release_claims(batch)
+                raise
+
+        return email_logs
+
+    @classmethod
+    def _send_batch(cls, provider_class, email_logs: list):
+        EmailLog.render_bodies(email_logs)
+
+        if provider_class.max_messages_per_request > 1:
+            provider_class.throttle()
+            response = provider_class.send_bulk_email(email_logs)
+            provider_class.handle_send_bulk_email_response(response, email_logs)
+
+        else:
+            for email_log in email_logs:
+                provider_class.throttle()
+                response = provider_class.send_email(email_log)
+                provider_class.handle_send_email_response(response, email_log)
+
+    @classmethod
+    def _enqueue_dispatch(cls, email_log_ids: list, countdown=None):
+        from .tasks import dispatch_email_logs
+
+        # Queued only after commit so that the worker can see the email logs
+        transaction.on_commit(
+            lambda: dispatch_email_logs.apply_async((email_log_ids,), countdown=countdown)
+        )
+
+    @classmethod
+    def dispatch_email_logs(cls, email_log_ids: list = None, limit=None, created_before=None):
+        """
+        Sends queued email logs, either the given ones or any of them. The email logs are claimed before they are
+        sent and the ones claimed by another worker are skipped, so the same email log is never sent twice
+        concurrently. The outcome of every provider request is saved as soon as it is received, hence a failed
+        request only leaves its own and the following email logs queued. Returns the number of email logs sent.
+        """
+        dispatched_count = 0
+
+        email_logs = EmailLog.claim_for_dispatch(
+            email_log_ids=email_log_ids, limit=limit, created_before=created_before
+        )
+
+        provider_vs_email_logs = {}
+        for email_log in email_logs:
+            provider_vs_email_logs.setdefault(email_log.email_provider, []).append(email_log)
+
+        try:
+            for email_provider, provider_email_logs in provider_vs_email_logs.items():
+                provider_class = cls._get_provider_class_for_provider(email_provider)
+
+                batch_size = provider_class.max_messages_per_request
+                for index in range(0, len(provider_email_logs), batch_size):
+                    batch = provider_email_logs[index:index + batch_size]
+                    cls._send_batch(provider_class, batch)
+
+                    dispatched_count += len(batch)
+
+        except Exception:
+            # The email logs not sent yet can be sent again right away
+            EmailLog.release_claims(email_logs)
+            raise
+
+        return dispatched_count
+
+    @classmethod
+    def delete_expired_idempotency_keys(cls):
+        return EmailIdempotencyKey.delete_expired(EmailIdempotencyKey.get_ttl())
+
+    @classmethod
+    def get_email_logs_for_recipient(cls, email_address, prefix=False):
+        """
+        Returns the email logs sent to the email address, or to any email address starting with it when `prefix`
+        is set, latest first.
+        """
+        return EmailLog.get_by_recipient(email_address, prefix=prefix).order_by("-id")
+
+    @classmethod
+    def get_engagement_stats(cls, from_day, to_day, template_id=None, from_email=None, email_provider=None):
+        """
+        Returns the number of recipients emailed and of their events, with the delivery, open, click, bounce and
+        spam rates, per template id and day the emails were sent between the two days, both included. Read from
+        the engagement rollups, optionally only of the given template id, sender or provider.
+        """
+        filters = {"template_id": template_id, "from_email": from_email, "email_provider": email_provider}
+
+        return EngagementRollup.get_stats(
+            from_day, to_day, **{field: value for field, value in filters.items() if value is not None}
+        )
 
     @classmethod
     def handle_event_webhook(cls, email_provider, event_info):
         provider_class = cls._get_provider_class_for_provider(email_provider)
 
         provider_class.handle_event_webhook(event_info)
+
+    @classmethod
+    def handle_event_webhooks(cls, email_provider, event_infos: list):
+        provider_class = cls._get_provider_class_for_provider(email_provider)
+
+        return provider_class.handle_event_webhooks(event_infos)
+
+    @classmethod
+    def handle_pending_events(cls):
+        """
+        Handles the parked events of every provider whose trackers exist by now, and deletes the ones parked for
+        longer than DJANGO_EMAIL_PENDING_EVENT_TTL. Returns the number of events handled.
+        """
+        handled_count = 0
+        for email_provider in PendingEvent.objects.values_list("email_provider", flat=True).distinct():
+            provider_class = cls._get_provider_class_for_provider(email_provider)
+            handled_count += provider_class.handle_pending_events()
+
+        ttl = timedelta(seconds=getattr(settings, "DJANGO_EMAIL_PENDING_EVENT_TTL", 24 * 60 * 60))
+        expired_count = PendingEvent.delete_expired(ttl)
+        if expired_count:
+            logger.warning(f"Deleted {expired_count} pending events whose trackers were never created")
+
+        return handled_count
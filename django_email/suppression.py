@@ -0,0 +1,172 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import SuppressedEmailAddress
+
+# Changes are fetched from this long before the latest change seen, so that the ones committed late are not missed
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+class BloomFilter(object):
+    """
+    Set of strings which answers whether it may contain a string in a few microseconds, taking about 10 bits per
+    string for an error rate of 1%, and never misses a string it contains.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+
+        self._bits = bytearray(math.ceil(self.size / 8))
+
+    def _get_positions(self, value):
+        # Positions derived from two halves of a single hash, which is as good as independent hashes
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first_hash, second_hash = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+        return [(first_hash + index * second_hash) % self.size for index in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._get_positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._get_positions(value))
+
+
+class SuppressionFilter(object):
+    """
+    Bloom filter of the suppressed email addresses in the memory of the process, so that the recipients of almost
+    every email are checked without a query. The email addresses it may contain are confirmed against the
+    suppressed email address table, hence a false positive costs a query and never drops a recipient.
+
+    The filter is refreshed with the email addresses suppressed since its latest change at most every
+    `refresh_interval` seconds, and rebuilt every `rebuild_interval` seconds, or once it is full, to let go of
+    the email addresses which are not suppressed anymore.
+    """
+
+    def __init__(self, refresh_interval=60, rebuild_interval=60 * 60, error_rate=0.01, min_capacity=100000):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+
+        self._bloom_filter = None
+        self._added_count = 0
+        self._updated_until = None
+        self._refresh_at = 0
+        self._rebuild_at = 0
+        self._refresh_lock = threading.Lock()
+
+    def _rebuild(self):
+        queryset = SuppressedEmailAddress.objects.unfiltered()
+        # Taken before loading, the changes made while loading are fetched again by the next refresh
+        updated_until = queryset.aggregate(updated_until=Max("updated_at"))["updated_until"]
+        suppressed_count = SuppressedEmailAddress.objects.count()
+
+        bloom_filter = BloomFilter(max(self.min_capacity, 2 * suppressed_count), self.error_rate)
+        for email_address in SuppressedEmailAddress.objects.values_list("email_address", flat=True).iterator(
+            chunk_size=10000
+        ):
+            bloom_filter.add(email_address)
+
+        self._bloom_filter = bloom_filter
+        self._added_count = suppressed_count
+        self._updated_until = updated_until
+        self._rebuild_at = time.monotonic() + self.rebuild_interval
+
+    def _add_changed(self):
+        queryset = SuppressedEmailAddress.objects
+        if self._updated_until is not None:
+            queryset = queryset.filter(updated_at__gte=self._updated_until - REFRESH_OVERLAP)
+
+        for email_address, updated_at in queryset.values_list("email_address", "updated_at"):
+            # The addresses fetched again within the overlap, or suppressed again, do not fill the filter any further
+            if email_address not in self._bloom_filter:
+                self._bloom_filter.add(email_address)
+                self._added_count += 1
+            self._updated_until = max(self._updated_until or updated_at, updated_at)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._bloom_filter is not None and now < self._refresh_at:
+            return
+
+        # A single thread refreshes the filter while the others go on with it as it is, unless there is none yet
+        if not self._refresh_lock.acquire(blocking=force or self._bloom_filter is None):
+            return
+
+        try:
+            if not force and self._bloom_filter is not None and time.monotonic() < self._refresh_at:
+                return
+
+            if force or self._bloom_filter is None or now >= self._rebuild_at or (
+                self._added_count > self._bloom_filter.capacity
+            ):
+                self._rebuild()
+            else:
+                self._add_changed()
+
+            self._refresh_at = time.monotonic() + self.refresh_interval
+
+        finally:
+            self._refresh_lock.release()
+
+    def get_suppressed(self, email_addresses: list):
+        """
+        Returns the suppressed ones among the email addresses, in lowercase.
+        """
+        self.refresh()
+
+        bloom_filter = self._bloom_filter
+        candidate_email_addresses = [
+            email_address for email_address in {email_address.lower() for email_address in email_addresses}
+            if email_address in bloom_filter
+        ]
+        if not candidate_email_addresses:
+            return set()
+
+        return SuppressedEmailAddress.get_suppressed(candidate_email_addresses)
+
+
+_suppression_filter = None
+_suppression_filter_lock = threading.Lock()
+
+
+def get_suppression_filter():
+    """
+    Returns the suppression filter of this process as configured in DJANGO_EMAIL_SUPPRESSION_FILTER, or None if
+    the suppressed email address table is to be queried for every email.
+    """
+    global _suppression_filter
+
+    options = getattr(settings, "DJANGO_EMAIL_SUPPRESSION_FILTER", {})
+    if options is None:
+        return None
+
+    with _suppression_filter_lock:
+        if _suppression_filter is None:
+            _suppression_filter = SuppressionFilter(**options)
+
+    return _suppression_filter
+
+
+def get_suppressed_email_addresses(email_addresses: list):
+    """
+    Returns the suppressed ones among the email addresses, in lowercase.
+    """
+    if not email_addresses:
+        return set()
+
+    suppression_filter = get_suppression_filter()
+    if suppression_filter is None:
+        return SuppressedEmailAddress.get_suppressed(email_addresses)
+
+    return suppression_filter.get_suppressed(email_addresses)
@@ -2,14 +2,46 @@ import json
 
 from celery import shared_task
 
-from .exceptions import EmailActivityTrackerNotFoundException
+from .exceptions import RateLimitExceededException
+from .models import EmailActivityTracker
 from .services import EmailService
 
 
-@shared_task(
-    autoretry_for=(EmailActivityTrackerNotFoundException,), default_retry_delay=60,
-    retry_kwargs={'max_retries': 5}
-)
+@shared_task
 def handle_webhook(request_body: str, email_provider):
     event_info = json.loads(request_body)
-    EmailService.handle_event_webhook(email_provider, event_info)
+
+    # Providers can group many events into a single request in which case the body is a list of events. Events
+    # whose trackers are not created yet are parked rather than retried.
+    if isinstance(event_info, list):
+        EmailService.handle_event_webhooks(email_provider, event_info)
+
+    else:
+        EmailService.handle_event_webhook(email_provider, event_info)
+
+
+@shared_task
+def handle_pending_events():
+    # Meant to be scheduled periodically with celery beat, handles the parked events missed when their trackers
+    # were created
+    return EmailService.handle_pending_events()
+
+
+@shared_task
+def flush_activity_counters():
+    # Meant to be scheduled periodically with celery beat when DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS is set
+    return EmailActivityTracker.flush_counter_deltas()
+
+
+# Email logs throttled by the provider stay queued and are retried with an exponential backoff
+@shared_task(
+    autoretry_for=(RateLimitExceededException,), retry_backoff=True, retry_kwargs={'max_retries': 10}
+)
+def dispatch_email_logs(email_log_ids: list):
+    return EmailService.dispatch_email_logs(email_log_ids)
+
+
+@shared_task
+def delete_expired_idempotency_keys():
+    # Meant to be scheduled periodically with celery beat when idempotency keys are used
+    return EmailService.delete_expired_idempotency_keys()
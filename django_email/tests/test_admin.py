@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from ..models import EmailLog, SuppressedEmailAddress
+from ..pagination import EstimatedCountPaginator, get_estimated_count
+from ..tests.factories import EmailLogFactory, EventLogFactory
+
+urlpatterns = [path("admin/", admin.site.urls)]
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def test_get_estimated_count(self):
+        self.assertGreaterEqual(get_estimated_count(EmailLog.objects.all()), 0)
+
+    def test_count(self):
+        for _ in range(3):
+            EmailLogFactory()
+
+        self.assertEqual(EstimatedCountPaginator(EmailLog.objects.order_by("id"), 2).count, 3)
+
+        with mock.patch("django_email.pagination.get_estimated_count") as mocked_get_estimated_count:
+            mocked_get_estimated_count.return_value = 1000000
+
+            self.assertEqual(EstimatedCountPaginator(EmailLog.objects.order_by("id"), 2).count, 1000000)
+
+
+@override_settings(ROOT_URLCONF="django_email.tests.test_admin")
+class EmailLogAdminTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        self.changelist_url = reverse("admin:django_email_emaillog_changelist")
+
+    def test_changelist_pages_by_keyset(self):
+        email_logs = [EmailLogFactory(template_id="template_id") for _ in range(5)]
+
+        with mock.patch.object(admin.site._registry[EmailLog], "list_per_page", 2):
+            response = self.client.get(self.changelist_url)
+
+            self.assertListEqual(
+                list(response.context["cl"].result_list), [email_logs[4], email_logs[3]]
+            )
+            self.assertContains(response, f"?before_id={email_logs[3].id}")
+
+            response = self.client.get(self.changelist_url, {"before_id": email_logs[1].id})
+
+            self.assertListEqual(list(response.context["cl"].result_list), [email_logs[0]])
+            self.assertIsNone(response.context["cl"].next_cursor)
+
+            # A mangled cursor shows the latest page instead of failing
+            response = self.client.get(self.changelist_url, {"before_id": "abc"})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertListEqual(
+                list(response.context["cl"].result_list), [email_logs[4], email_logs[3]]
+            )
+
+        # The cached filter choices are listed and filter the email logs
+        response = self.client.get(self.changelist_url, {"template_id": "template_id"})
+
+        self.assertEqual(len(response.context["cl"].result_list), 5)
+        self.assertContains(response, "?template_id=template_id")
+
+    def test_changelist_sorted_by_column(self):
+        EmailLogFactory()
+
+        response = self.client.get(self.changelist_url, {"o": "2"})
+
+        self.assertFalse(response.context["cl"].keyset)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_change_view_links_events(self):
+        event_log = EventLogFactory()
+        email_activity_tracker = event_log.email_activity_tracker
+
+        response = self.client.get(
+            reverse("admin:django_email_emaillog_change", args=(email_activity_tracker.email_log_id,))
+        )
+        self.assertContains(
+            response, f"?email_activity_tracker__id__exact={email_activity_tracker.id}"
+        )
+
+        response = self.client.get(
+            reverse("admin:django_email_eventlog_changelist"),
+            {"email_activity_tracker__id__exact": email_activity_tracker.id},
+        )
+        self.assertListEqual(list(response.context["cl"].result_list), [event_log])
+
+
+@override_settings(ROOT_URLCONF="django_email.tests.test_admin")
+class SuppressedEmailAddressAdminTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+
+    def test_changelist_search(self):
+        SuppressedEmailAddress.suppress(["foo@example.com", "bar@example.com"])
+
+        response = self.client.get(
+            reverse("admin:django_email_suppressedemailaddress_changelist"), {"q": " Foo@Example.com"}
+        )
+
+        self.assertTrue(response.context["cl"].search_fields)
+        self.assertListEqual(
+            [suppressed.email_address for suppressed in response.context["cl"].result_list], ["foo@example.com"]
+        )
@@ -0,0 +1,66 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..batching import WebhookEventBatcher
+
+
+class WebhookEventBatcherTestCase(SimpleTestCase):
+    def submit_concurrently(self, webhook_event_batcher, event_infos_list):
+        errors = []
+
+        def submit(event_infos):
+            try:
+                webhook_event_batcher.submit("test_provider", event_infos)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=submit, args=(event_infos,)) for event_infos in event_infos_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        return errors
+
+    def test_submit(self):
+        publish = mock.Mock()
+        webhook_event_batcher = WebhookEventBatcher(publish, max_events=100, max_wait=0.5)
+
+        errors = self.submit_concurrently(
+            webhook_event_batcher, [[{"event": "open", "index": index}] for index in range(10)]
+        )
+
+        self.assertListEqual(errors, [])
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args[0][0], "test_provider")
+        self.assertListEqual(
+            sorted(event_info["index"] for event_info in publish.call_args[0][1]), list(range(10))
+        )
+
+    def test_submit_when_batch_is_full(self):
+        publish = mock.Mock()
+        # The batches are published as soon as they are full, long before the wait is over
+        webhook_event_batcher = WebhookEventBatcher(publish, max_events=2, max_wait=60)
+
+        errors = self.submit_concurrently(
+            webhook_event_batcher, [[{"event": "open", "index": index}] for index in range(4)]
+        )
+
+        self.assertListEqual(errors, [])
+        self.assertEqual(publish.call_count, 2)
+        self.assertListEqual(
+            sorted(event_info["index"] for call in publish.call_args_list for event_info in call[0][1]),
+            list(range(4)),
+        )
+
+    def test_submit_when_publish_fails(self):
+        publish = mock.Mock(side_effect=ConnectionError("broker is down"))
+        webhook_event_batcher = WebhookEventBatcher(publish, max_events=100, max_wait=0.5)
+
+        errors = self.submit_concurrently(webhook_event_batcher, [[{"event": "open"}] for _ in range(3)])
+
+        # Every request of the batch fails, so that the provider retries all of the events
+        self.assertEqual(len(errors), 3)
+        publish.assert_called_once()
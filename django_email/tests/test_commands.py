@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from ..constants import EMAIL_PROVIDER_MAILJET
+from ..models import EmailLog, EmailRecipient, EngagementRollup, EventLog
+from ..providers.mailjet import MailjetEmailProvider
+from ..tests.factories import EmailLogFactory, EventLogFactory
+
+
+class EmailDispatcherCommandTestCase(TransactionTestCase):
+    def test_email_dispatcher(self):
+        queued_email_logs = [
+            EmailLogFactory(email_provider=EMAIL_PROVIDER_MAILJET) for _ in range(5)
+        ]
+        EmailLogFactory(
+            email_provider=EMAIL_PROVIDER_MAILJET, dispatch_status=EmailLog.EMAIL_STATUS_SENT
+        )
+
+        def mark_sent(response, email_logs):
+            for email_log in email_logs:
+                email_log.dispatch_status = EmailLog.EMAIL_STATUS_SENT
+            EmailLog.update_dispatch_statuses(email_logs)
+
+        with mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response", side_effect=mark_sent
+        ):
+            stdout = StringIO()
+            call_command(
+                "email_dispatcher", "--once", "--concurrency=2", "--batch-size=2", stdout=stdout
+            )
+
+            sent_email_log_ids = [
+                email_log.id
+                for call in mocked_mailjet_send_bulk_email.call_args_list
+                for email_log in call[0][0]
+            ]
+
+            # Every queued email log is sent exactly once even though two workers are claiming them
+            self.assertListEqual(
+                sorted(sent_email_log_ids), [email_log.id for email_log in queued_email_logs]
+            )
+            self.assertIn("Dispatched 5 email logs", stdout.getvalue())
+            self.assertFalse(
+                EmailLog.objects.filter(dispatch_status=EmailLog.EMAIL_STATUS_QUEUED).exists()
+            )
+
+
+class BackfillEmailRecipientsCommandTestCase(TransactionTestCase):
+    def test_backfill_email_recipients(self):
+        email_logs = [EmailLogFactory(cc_emails=None, bcc_emails=None) for _ in range(5)]
+
+        stdout = StringIO()
+        call_command("backfill_email_recipients", "--batch-size=2", stdout=stdout)
+
+        self.assertIn("Added 5 email recipients", stdout.getvalue())
+        self.assertListEqual(
+            list(EmailRecipient.objects.order_by("email_log_id").values_list("email_log_id", flat=True)),
+            [email_log.id for email_log in email_logs],
+        )
+
+        # Email logs which already have their recipients are skipped
+        stdout = StringIO()
+        call_command("backfill_email_recipients", stdout=stdout)
+
+        self.assertIn("Added 0 email recipients", stdout.getvalue())
+
+
+class EmailArchiveCommandTestCase(TransactionTestCase):
+    def test_email_archive(self):
+        old_email_logs = [
+            EmailLogFactory(created_at=timezone.now() - timedelta(days=100)) for _ in range(3)
+        ]
+        old_email_logs[1].delete()
+        event_log = EventLogFactory(email_activity_tracker__email_log=old_email_logs[0])
+        EmailRecipient.add_recipients(old_email_logs)
+        recent_email_log = EmailLogFactory()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            stdout = StringIO()
+            call_command(
+                "email_archive", "--older-than=30", f"--output-dir={output_dir}", "--batch-size=2", stdout=stdout
+            )
+
+            self.assertIn("Archived 3 email logs", stdout.getvalue())
+            self.assertListEqual(
+                sorted(os.listdir(output_dir)),
+                [
+                    f"email_logs_{old_email_logs[0].id}_{old_email_logs[1].id}.jsonl.gz",
+                    f"email_logs_{old_email_logs[2].id}_{old_email_logs[2].id}.jsonl.gz",
+                ],
+            )
+
+            with gzip.open(
+                os.path.join(output_dir, f"email_logs_{old_email_logs[0].id}_{old_email_logs[1].id}.jsonl.gz"), "rt"
+            ) as archive_file:
+                archived_objects = [json.loads(line) for line in archive_file]
+
+        self.assertListEqual(
+            [(archived_object["model"], archived_object["pk"]) for archived_object in archived_objects],
+            [
+                ("django_email.emaillog", old_email_logs[0].id),
+                ("django_email.emaillog", old_email_logs[1].id),
+                ("django_email.emailactivitytracker", event_log.email_activity_tracker_id),
+                ("django_email.eventlog", event_log.id),
+            ],
+        )
+        self.assertListEqual(list(EmailLog.objects.unfiltered()), [recent_email_log])
+        self.assertFalse(EventLog.objects.unfiltered().exists())
+        self.assertFalse(EmailRecipient.objects.exists())
+
+
+class RebuildEngagementRollupsCommandTestCase(TransactionTestCase):
+    def test_rebuild_engagement_rollups(self):
+        old_event_log = EventLogFactory(
+            email_activity_tracker__email_log__created_at=timezone.now() - timedelta(days=2),
+            event_type=EventLog.EMAIL_OPENED_EVENT_TYPE,
+            event_at=timezone.now() - timedelta(days=1),
+        )
+        EventLogFactory(event_type=EventLog.EMAIL_CLICKED_EVENT_TYPE, event_at=timezone.now())
+
+        stdout = StringIO()
+        call_command("rebuild_engagement_rollups", stdout=stdout)
+
+        self.assertIn("Rebuilt 2 engagement rollups", stdout.getvalue())
+        self.assertListEqual(
+            list(EngagementRollup.objects.order_by("day").values_list("sent_count", "opened_count", "clicked_count")),
+            [(1, 1, 0), (1, 0, 1)],
+        )
+
+        # Only the given days are rebuilt
+        EngagementRollup.objects.update(sent_count=0)
+        old_day = timezone.localdate(old_event_log.email_activity_tracker.email_log.created_at)
+        call_command(
+            "rebuild_engagement_rollups", f"--from-date={old_day}", f"--to-date={old_day}", stdout=StringIO()
+        )
+
+        self.assertListEqual(
+            list(EngagementRollup.objects.order_by("day").values_list("sent_count", flat=True)), [1, 0]
+        )
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from .. import concurrency
+from ..concurrency import (
+    AdaptiveConcurrencyLimiter,
+    concurrency_slot,
+    get_concurrency_limiter,
+    get_concurrency_stats,
+)
+from ..constants import EMAIL_PROVIDER_MAILJET
+
+
+class AdaptiveConcurrencyLimiterTestCase(SimpleTestCase):
+    def test_limit_grows_while_latency_is_flat(self):
+        concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3)
+
+        for _ in range(10):
+            concurrency_limiter.acquire()
+            concurrency_limiter.acquire()
+            concurrency_limiter.release(0.1)
+            concurrency_limiter.release(0.1)
+
+        self.assertEqual(concurrency_limiter.limit, 3)
+        self.assertDictEqual(
+            concurrency_limiter.get_stats(),
+            {"limit": 3, "in_flight": 0, "rtt_min": 0.1, "rtt_ewma": 0.1},
+        )
+
+    def test_limit_does_not_grow_when_not_used(self):
+        concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+
+        for _ in range(10):
+            concurrency_limiter.acquire()
+            concurrency_limiter.release(0.1)
+
+        self.assertEqual(concurrency_limiter.limit, 4)
+
+    def test_limit_backs_off_when_overloaded_or_slow(self):
+        concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5)
+
+        concurrency_limiter.acquire()
+        concurrency_limiter.release(0.1, overloaded=True)
+        self.assertEqual(concurrency_limiter.limit, 5)
+
+        concurrency_limiter.acquire()
+        concurrency_limiter.release(0.1)
+        concurrency_limiter.acquire()
+        concurrency_limiter.release(0.5)
+        self.assertEqual(concurrency_limiter.limit, 2.5)
+
+    def test_try_acquire(self):
+        concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+
+        self.assertTrue(concurrency_limiter.try_acquire())
+        self.assertFalse(concurrency_limiter.try_acquire())
+
+    def test_slot(self):
+        concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5)
+
+        with self.assertRaises(ValueError):
+            with concurrency_limiter.slot():
+                raise ValueError()
+
+        # Requests failing with an exception count as overloaded
+        self.assertTupleEqual((concurrency_limiter.limit, concurrency_limiter.in_flight), (5, 0))
+
+        async def use_async_slot():
+            async with concurrency_limiter.aslot() as slot:
+                slot.overloaded = True
+
+        async_to_sync(use_async_slot)()
+        self.assertTupleEqual((concurrency_limiter.limit, concurrency_limiter.in_flight), (2.5, 0))
+
+
+class ConcurrencySlotTestCase(SimpleTestCase):
+    def setUp(self):
+        concurrency._provider_vs_concurrency_limiter.clear()
+        self.addCleanup(concurrency._provider_vs_concurrency_limiter.clear)
+
+    def test_concurrency_slot_without_limiter(self):
+        self.assertIsNone(get_concurrency_limiter(EMAIL_PROVIDER_MAILJET))
+
+        with concurrency_slot(EMAIL_PROVIDER_MAILJET) as slot:
+            slot.overloaded = True
+
+        self.assertDictEqual(get_concurrency_stats(), {})
+
+    @override_settings(DJANGO_EMAIL_ADAPTIVE_CONCURRENCY={EMAIL_PROVIDER_MAILJET: {"initial_limit": 8}})
+    def test_concurrency_slot(self):
+        with mock.patch("django_email.concurrency.time.monotonic", side_effect=[0, 0.2]):
+            with concurrency_slot(EMAIL_PROVIDER_MAILJET):
+                pass
+
+        self.assertDictEqual(
+            get_concurrency_stats(),
+            {
+                EMAIL_PROVIDER_MAILJET: {
+                    "limit": 8, "in_flight": 0, "rtt_min": 0.2, "rtt_ewma": 0.2,
+                }
+            },
+        )
@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+
+class ImportTestCase(SimpleTestCase):
+    def test_modules_used_by_web_processes_do_not_import_provider_sdks(self):
+        # Run in a fresh interpreter as the test run itself imports the providers
+        script = (
+            "import json, sys, django; django.setup(); "
+            "import django_email.admin, django_email.services, django_email.tasks, django_email.views; "
+            "print(json.dumps(sorted(sys.modules)))"
+        )
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+
+        output = subprocess.run(
+            [sys.executable, "-c", script], env=env, check=True, stdout=subprocess.PIPE,
+        ).stdout
+        imported_modules = set(json.loads(output.decode("utf-8").splitlines()[-1]))
+
+        self.assertFalse(
+            imported_modules
+            & {"mailjet_rest", "httpx", "django_email.providers.mailjet", "django_email.providers.transport"}
+        )
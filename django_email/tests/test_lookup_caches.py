@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import lookup_caches
+from ..lookup_caches import CacheTrackerLookupCache, LocalTrackerLookupCache, get_tracker_lookup_cache
+from ..models import EmailActivityTracker
+from ..tests.factories import EmailActivityTrackerFactory, EmailLogFactory
+
+
+class LocalTrackerLookupCacheTestCase(SimpleTestCase):
+    def test_get_many(self):
+        tracker_lookup_cache = LocalTrackerLookupCache(max_size=2)
+        tracker_lookup_cache.set_many({"1": (1, 10), "2": (2, 20)})
+
+        self.assertDictEqual(tracker_lookup_cache.get_many(["1", "3"]), {"1": (1, 10)})
+
+        # The least recently used message id is evicted
+        tracker_lookup_cache.set_many({"3": (3, 30)})
+        self.assertDictEqual(tracker_lookup_cache.get_many(["1", "2", "3"]), {"1": (1, 10), "3": (3, 30)})
+
+        stats = tracker_lookup_cache.get_stats()
+        self.assertTupleEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (3, 2, 0.6))
+        self.assertIsNotNone(stats["average_lookup_ms"])
+
+        tracker_lookup_cache.clear()
+        self.assertDictEqual(tracker_lookup_cache.get_many(["1"]), {})
+
+
+class CacheTrackerLookupCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+
+    def test_get_many(self):
+        tracker_lookup_cache = CacheTrackerLookupCache()
+        tracker_lookup_cache.set_many({"1": (1, 10)})
+
+        # Found by every instance using the same Django cache
+        self.assertDictEqual(CacheTrackerLookupCache().get_many(["1", "2"]), {"1": (1, 10)})
+        self.assertEqual(tracker_lookup_cache.get_stats()["hit_ratio"], None)
+
+
+class GetTrackerLookupCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        lookup_caches._tracker_lookup_cache = None
+        self.addCleanup(setattr, lookup_caches, "_tracker_lookup_cache", None)
+
+    def test_get_tracker_lookup_cache_when_not_configured(self):
+        self.assertIsNone(get_tracker_lookup_cache())
+
+    @override_settings(
+        DJANGO_EMAIL_TRACKER_LOOKUP_CACHE={
+            "class": "django_email.lookup_caches.CacheTrackerLookupCache", "timeout": 60,
+        }
+    )
+    def test_get_tracker_lookup_cache(self):
+        tracker_lookup_cache = get_tracker_lookup_cache()
+
+        self.assertIsInstance(tracker_lookup_cache, CacheTrackerLookupCache)
+        self.assertEqual(tracker_lookup_cache.timeout, 60)
+        self.assertIs(get_tracker_lookup_cache(), tracker_lookup_cache)
+
+
+@override_settings(DJANGO_EMAIL_TRACKER_LOOKUP_CACHE={"max_size": 100})
+class TrackerLookupTestCase(TestCase):
+    def setUp(self):
+        lookup_caches._tracker_lookup_cache = None
+        self.addCleanup(setattr, lookup_caches, "_tracker_lookup_cache", None)
+
+    def test_get_ids_by_message_ids(self):
+        email_activity_tracker = EmailActivityTrackerFactory()
+        message_ids = [email_activity_tracker.message_id, "unknown"]
+        expected_message_id_vs_ids = {
+            email_activity_tracker.message_id: (email_activity_tracker.id, email_activity_tracker.email_log_id)
+        }
+
+        self.assertDictEqual(EmailActivityTracker.get_ids_by_message_ids(message_ids), expected_message_id_vs_ids)
+
+        # Only the message id which is not tracked is looked up in the database again
+        with self.assertNumQueries(1):
+            self.assertDictEqual(
+                EmailActivityTracker.get_ids_by_message_ids(message_ids), expected_message_id_vs_ids
+            )
+
+        with self.assertNumQueries(0):
+            EmailActivityTracker.get_ids_by_message_ids([email_activity_tracker.message_id])
+
+        self.assertEqual(get_tracker_lookup_cache().get_stats()["hits"], 2)
+
+    def test_track_recipients_warms_cache_on_commit(self):
+        recipients_data = [
+            {
+                "email_log": EmailLogFactory(),
+                "recipient_type": EmailActivityTracker.TO_RECIPIENT_TYPE,
+                "email_address": "noreply@example.com",
+                "message_id": "123456789",
+            }
+        ]
+
+        with mock.patch("django_email.models.transaction.on_commit") as mocked_on_commit:
+            email_activity_trackers = EmailActivityTracker.track_recipients(recipients_data)
+            self.assertDictEqual(get_tracker_lookup_cache().get_many(["123456789"]), {})
+
+            mocked_on_commit.call_args[0][0]()
+
+        with self.assertNumQueries(0):
+            self.assertDictEqual(
+                EmailActivityTracker.get_ids_by_message_ids(["123456789"]),
+                {"123456789": (email_activity_trackers[0].id, email_activity_trackers[0].email_log_id)},
+            )
@@ -3,12 +3,22 @@ from datetime import datetime
 from unittest import mock
 
 import pytz
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.test import TestCase
 from requests.models import Response
 from rest_framework import status
 
-from ..exceptions import EmailActivityTrackerNotFoundException
-from ..models import EmailActivityTracker, EmailLog, EventLog
+from ..exceptions import RateLimitExceededException
+from ..constants import EMAIL_PROVIDER_MAILJET
+from ..models import (
+    EmailActivityTracker,
+    EmailLog,
+    EngagementRollup,
+    EventLog,
+    PendingEvent,
+    SuppressedEmailAddress,
+)
 from ..providers.mailjet import MailjetEmailProvider
 from ..tests.factories import (
     EmailLogFactory,
@@ -65,6 +75,91 @@ class MailjetEmailProviderTestCase(TestCase):
             MailjetEmailProvider._create_email_data(self.email_log), data
         )
 
+    def test_create_bulk_email_data(self):
+        email_logs = [self.email_log, EmailLogFactory(cc_emails=None, bcc_emails=None)]
+
+        self.assertDictEqual(
+            MailjetEmailProvider._create_bulk_email_data(email_logs),
+            {
+                "Messages": [
+                    MailjetEmailProvider._create_message(email_log)
+                    for email_log in email_logs
+                ]
+            },
+        )
+
+    def test_parse_send_bulk_email_response_for_email_logs(self):
+        email_logs = [EmailLogFactory(), EmailLogFactory()]
+        error_message_response = {
+            "Status": "error",
+            "Errors": [
+                {
+                    "ErrorIdentifier": "1ab23cd4-e567-8901-2345-6789f0gh1i2j",
+                    "ErrorCode": "mj-0013",
+                    "StatusCode": 400,
+                    "ErrorMessage": '"invalid-email" is an invalid email address.',
+                    "ErrorRelatedTo": ["To[0].Email"],
+                }
+            ],
+        }
+        api_send_bulk_email_response = {
+            "Messages": [
+                {
+                    "Status": "success",
+                    "To": [
+                        {
+                            "Email": "passenger1@mailjet.com",
+                            "MessageUUID": "123",
+                            "MessageID": 456,
+                            "MessageHref": "https://api.mailjet.com/v3/message/456",
+                        },
+                    ],
+                    "Cc": [],
+                    "Bcc": [],
+                },
+                error_message_response,
+            ]
+        }
+
+        send_bulk_email_response = Response()
+        send_bulk_email_response._content = json.dumps(
+            api_send_bulk_email_response
+        ).encode("utf-8")
+        send_bulk_email_response.status_code = status.HTTP_400_BAD_REQUEST
+
+        self.assertListEqual(
+            MailjetEmailProvider.parse_send_bulk_email_response_for_email_logs(
+                send_bulk_email_response, email_logs
+            ),
+            [
+                (
+                    EmailLog.EMAIL_STATUS_SENT,
+                    [
+                        {
+                            "recipient_type": EmailActivityTracker.TO_RECIPIENT_TYPE,
+                            "email_address": "passenger1@mailjet.com",
+                            "message_id": str(456),
+                        }
+                    ],
+                ),
+                (EmailLog.EMAIL_STATUS_FAILED, {"error": error_message_response}),
+            ],
+        )
+
+        # Below is the test for the scenario when the request as a whole is rejected
+        api_send_bulk_email_error_response = {"ErrorMessage": "API key authentication/authorization failure"}
+        send_bulk_email_response._content = json.dumps(
+            api_send_bulk_email_error_response
+        ).encode("utf-8")
+        send_bulk_email_response.status_code = status.HTTP_401_UNAUTHORIZED
+
+        self.assertListEqual(
+            MailjetEmailProvider.parse_send_bulk_email_response_for_email_logs(
+                send_bulk_email_response, email_logs
+            ),
+            [(EmailLog.EMAIL_STATUS_FAILED, {"error": api_send_bulk_email_error_response})] * 2,
+        )
+
     def test_parse_sent_email_response_for_email_log(self):
         api_sent_email_response = {
             "Messages": [
@@ -383,16 +478,169 @@ class MailjetEmailProviderTestCase(TestCase):
 
         with mock.patch.object(
             MailjetEmailProvider, "_create_email_data"
-        ) as mocked_create_email_data, mock.patch(
-            "django_email.providers.mailjet.MailjetEmailProvider.sdk_client"
-        ) as mailjet_sdk_client:
+        ) as mocked_create_email_data, mock.patch.object(
+            MailjetEmailProvider, "_send"
+        ) as mocked_send:
             mocked_create_email_data.return_value = data
-            sdk_send_method = mailjet_sdk_client.send.create
 
             MailjetEmailProvider.send_email(self.email_log)
 
             mocked_create_email_data.assert_called_with(self.email_log)
-            sdk_send_method.assert_called_with(data=data)
+            mocked_send.assert_called_with(data)
+
+    def test_get_sdk_client(self):
+        with mock.patch.object(MailjetEmailProvider, "_sdk_client", None):
+            sdk_client = MailjetEmailProvider.get_sdk_client()
+
+            self.assertIs(MailjetEmailProvider.get_sdk_client(), sdk_client)
+            self.assertTupleEqual(
+                sdk_client.auth, (settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY)
+            )
+            self.assertEqual(sdk_client.config.version, "v3.1")
+
+    def test_send(self):
+        data = {"Messages": [{"Email": "test@example.com"}]}
+
+        with mock.patch(
+            "django_email.providers.mailjet.get_session"
+        ) as mocked_get_session:
+            session_post_method = mocked_get_session.return_value.post
+            session_post_method.return_value.status_code = status.HTTP_200_OK
+
+            MailjetEmailProvider._send(data)
+
+            url, headers = MailjetEmailProvider.get_sdk_client().config["send"]
+            mocked_get_session.assert_called_with(MailjetEmailProvider.provider)
+            session_post_method.assert_called_with(
+                url,
+                data=json.dumps(data),
+                headers=headers,
+                auth=MailjetEmailProvider.get_sdk_client().auth,
+                timeout=60,
+            )
+
+    def test_asend_email(self):
+        data = {"Email": "test@example.com"}
+
+        with mock.patch.object(
+            MailjetEmailProvider, "_create_email_data"
+        ) as mocked_create_email_data, mock.patch.object(
+            MailjetEmailProvider, "_get_async_client", new_callable=mock.AsyncMock
+        ) as mocked_get_async_client:
+            mocked_create_email_data.return_value = data
+            async_client_post_method = mock.AsyncMock()
+            async_client_post_method.return_value.status_code = status.HTTP_200_OK
+            mocked_get_async_client.return_value.post = async_client_post_method
+
+            async_to_sync(MailjetEmailProvider.asend_email)(self.email_log)
+
+            mocked_create_email_data.assert_called_with(self.email_log)
+            url, headers = MailjetEmailProvider.get_sdk_client().config["send"]
+            async_client_post_method.assert_awaited_with(
+                url, content=json.dumps(data), headers=headers
+            )
+
+    def test_async_client_closed_with_its_loop(self):
+        async def get_async_client():
+            async_client = await MailjetEmailProvider._get_async_client()
+            self.assertIs(await MailjetEmailProvider._get_async_client(), async_client)
+
+            return async_client
+
+        async_client = async_to_sync(get_async_client)()
+
+        # Every async_to_sync call runs a new loop, which closes its client when it is done
+        self.assertTrue(async_client.is_closed)
+        self.assertIsNot(async_to_sync(get_async_client)(), async_client)
+
+    def test_send_when_rate_limited(self):
+        rate_limited_response = Response()
+        rate_limited_response.status_code = status.HTTP_429_TOO_MANY_REQUESTS
+        rate_limited_response.headers["Retry-After"] = "2"
+
+        with mock.patch(
+            "django_email.providers.mailjet.get_session"
+        ) as mocked_get_session:
+            mocked_get_session.return_value.post.return_value = rate_limited_response
+
+            with self.assertRaises(RateLimitExceededException) as context:
+                MailjetEmailProvider._send({"Messages": []})
+
+            self.assertEqual(context.exception.retry_after, 2)
+
+    def test_send_bulk_email(self):
+        email_logs = [self.email_log, EmailLogFactory()]
+        data = {"Messages": [{"Email": "test@example.com"}]}
+
+        with mock.patch.object(
+            MailjetEmailProvider, "_create_bulk_email_data"
+        ) as mocked_create_bulk_email_data, mock.patch.object(
+            MailjetEmailProvider, "_send"
+        ) as mocked_send:
+            mocked_create_bulk_email_data.return_value = data
+
+            MailjetEmailProvider.send_bulk_email(email_logs)
+
+            mocked_create_bulk_email_data.assert_called_with(email_logs)
+            mocked_send.assert_called_with(data)
+
+    def test_handle_send_bulk_email_response(self):
+        sent_email_log = EmailLogFactory()
+        failed_email_log = EmailLogFactory()
+        response_from_provider = {"Messages": []}
+        error_info = {"error": "test error"}
+        # Below is the event which arrived before the response of the send request was handled
+        early_event_info = {"event": "sent", "time": 1433103519, "MessageID": 1234}
+        MailjetEmailProvider.handle_event_webhooks([early_event_info])
+
+        with mock.patch.object(
+            MailjetEmailProvider, "parse_send_bulk_email_response_for_email_logs"
+        ) as mocked_parse_send_bulk_email_response, mock.patch(
+            "django_email.providers.abstract.transaction.on_commit", side_effect=lambda callback: callback()
+        ):
+            mocked_parse_send_bulk_email_response.return_value = [
+                (
+                    EmailLog.EMAIL_STATUS_SENT,
+                    [
+                        {
+                            "recipient_type": EmailActivityTracker.TO_RECIPIENT_TYPE,
+                            "email_address": "to_email@example.com",
+                            "message_id": "1234",
+                        }
+                    ],
+                ),
+                (EmailLog.EMAIL_STATUS_FAILED, error_info),
+            ]
+
+            MailjetEmailProvider.handle_send_bulk_email_response(
+                response_from_provider, [sent_email_log, failed_email_log]
+            )
+
+            sent_email_log.refresh_from_db()
+            failed_email_log.refresh_from_db()
+
+            self.assertEqual(sent_email_log.dispatch_status, EmailLog.EMAIL_STATUS_SENT)
+            self.assertEqual(
+                EmailActivityTracker.get_by_message_id("1234").email_log, sent_email_log
+            )
+            self.assertTupleEqual(
+                (failed_email_log.dispatch_status, failed_email_log.error_info),
+                (EmailLog.EMAIL_STATUS_FAILED, error_info),
+            )
+            self.assertFalse(
+                EmailActivityTracker.objects.filter(email_log=failed_email_log).exists()
+            )
+            self.assertEqual(
+                EmailActivityTracker.get_by_message_id("1234").email_status,
+                EmailActivityTracker.SENT_EMAIL_STATUS_DELIVERED,
+            )
+            self.assertFalse(PendingEvent.objects.exists())
+
+            engagement_rollup = EngagementRollup.objects.get()
+            self.assertTupleEqual(
+                (engagement_rollup.from_email, engagement_rollup.sent_count, engagement_rollup.delivered_count),
+                (sent_email_log.from_email, 1, 1),
+            )
 
     def test_handle_send_email_response(self):
         response_from_provider = [{"To": {"Message_Id": "1234"}}]
@@ -450,46 +698,161 @@ class MailjetEmailProviderTestCase(TestCase):
 
     def test_handle_event_webhook(self):
         event_info = {"event": "sent", "MessageId": "12345"}
-        parsed_event_data = {"event": EventLog.EMAIL_DELIVERED_EVENT_TYPE}
+        parsed_event_data = {
+            "event_type": EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+            "event_at": pytz.UTC.localize(datetime(2015, 5, 31, 20, 18, 39)),
+        }
         event_data_for_model = {
             **parsed_event_data,
-            "email_activity_tracker": self.email_activity_tracker,
+            "email_activity_tracker_id": self.email_activity_tracker.id,
+            "dedup_key": EventLog.get_dedup_key(
+                EMAIL_PROVIDER_MAILJET, "12345", EventLog.EMAIL_DELIVERED_EVENT_TYPE, "2015-05-31T20:18:39+00:00", None
+            ),
         }
 
         with mock.patch.object(
             MailjetEmailProvider, "parse_event_webhook"
         ) as mocked_abstract_parse_event_webhook, mock.patch.object(
-            EmailActivityTracker, "get_by_message_id"
-        ) as mocked_get_by_message_id, mock.patch.object(
+            EmailActivityTracker, "get_ids_by_message_ids"
+        ) as mocked_get_ids_by_message_ids, mock.patch.object(
             EventLog, "add_new_event_log"
         ) as mocked_add_event_log, mock.patch.object(
-            EmailActivityTracker, "update_fields_on_event"
+            EmailActivityTracker, "update_fields_on_events"
         ) as mocked_email_activity_tracker_update_fields:
 
             mocked_abstract_parse_event_webhook.return_value = (
                 event_info["MessageId"],
                 parsed_event_data,
             )
-            mocked_get_by_message_id.return_value = self.email_activity_tracker
+            mocked_get_ids_by_message_ids.return_value = {
+                event_info["MessageId"]: (self.email_activity_tracker.id, self.email_activity_tracker.email_log_id)
+            }
             mocked_add_event_log.return_value = self.event_log
 
             MailjetEmailProvider.handle_event_webhook(event_info)
 
             mocked_abstract_parse_event_webhook.assert_called_with(event_info)
-            mocked_get_by_message_id.assert_called_with(event_info["MessageId"])
+            mocked_get_ids_by_message_ids.assert_called_with([event_info["MessageId"]])
             self.assertEqual(event_data_for_model, parsed_event_data)
             mocked_email_activity_tracker_update_fields.assert_called_with(
-                self.event_log.event_type
+                {self.event_log.email_activity_tracker_id: [self.event_log.event_type]}
+            )
+
+            # Below is the test for the scenario when the event is delivered again by the provider
+            mocked_add_event_log.return_value = None
+            mocked_email_activity_tracker_update_fields.reset_mock()
+
+            MailjetEmailProvider.handle_event_webhook(event_info)
+
+            mocked_email_activity_tracker_update_fields.assert_not_called()
+
+            # Below is the test for the scenario when no activity tracker is found in db and the
+            # event should be parked until the tracker is created
+            mocked_abstract_parse_event_webhook.return_value = (
+                event_info["MessageId"],
+                parsed_event_data,
+            )
+            mocked_get_ids_by_message_ids.return_value = {}
+            mocked_add_event_log.reset_mock()
+
+            MailjetEmailProvider.handle_event_webhook(event_info)
+
+            mocked_add_event_log.assert_not_called()
+            self.assertListEqual(
+                list(PendingEvent.objects.values_list("email_provider", "message_id", "event_info")),
+                [(EMAIL_PROVIDER_MAILJET, event_info["MessageId"], event_info)],
             )
 
-            # Below is the test for the scenario when no activity tracker is found in db and an
-            # exception should be raised in that case
-            with self.assertRaises(EmailActivityTrackerNotFoundException):
-                mocked_abstract_parse_event_webhook.return_value = (
-                    event_info["MessageId"],
-                    parsed_event_data,
-                )
-                mocked_get_by_message_id.return_value = None
-                mocked_add_event_log.return_value = self.event_log
-
-                MailjetEmailProvider.handle_event_webhook(event_info)
+    def test_handle_pending_events(self):
+        event_infos = [
+            {"event": "open", "time": 1433103520, "MessageID": 456},
+            {"event": "click", "time": 1433103522, "MessageID": 789},
+        ]
+        MailjetEmailProvider.handle_event_webhooks(event_infos)
+        email_activity_tracker = EmailActivityTrackerFactory(message_id="456")
+
+        self.assertEqual(MailjetEmailProvider.handle_pending_events(batch_size=1), 1)
+        email_activity_tracker.refresh_from_db()
+
+        self.assertEqual(email_activity_tracker.open_count, 1)
+        self.assertListEqual(list(PendingEvent.objects.values_list("message_id", flat=True)), ["789"])
+        self.assertEqual(MailjetEmailProvider.handle_pending_events(), 0)
+
+    def test_handle_event_webhooks(self):
+        email_activity_tracker = EmailActivityTrackerFactory(message_id="456")
+        event_infos = [
+            {"event": "open", "time": 1433103520, "MessageID": 456},
+            {"event": "sent", "time": 1433103519, "MessageID": 456},
+            {"event": "open", "time": 1433103521, "MessageID": 456},
+            {"event": "click", "time": 1433103522, "MessageID": 789},
+        ]
+
+        unmatched_event_infos = MailjetEmailProvider.handle_event_webhooks(event_infos)
+        email_activity_tracker.refresh_from_db()
+
+        self.assertListEqual(unmatched_event_infos, [event_infos[3]])
+        self.assertListEqual(
+            list(PendingEvent.objects.values_list("message_id", "event_info")), [("789", event_infos[3])]
+        )
+        self.assertEqual(
+            EventLog.objects.filter(email_activity_tracker=email_activity_tracker).count(), 3
+        )
+        self.assertTupleEqual(
+            (
+                email_activity_tracker.email_status,
+                email_activity_tracker.open_count,
+                email_activity_tracker.click_count,
+            ),
+            (EmailActivityTracker.SENT_EMAIL_STATUS_DELIVERED, 2, 0),
+        )
+
+    def test_handle_event_webhooks_with_unparsable_events(self):
+        email_activity_tracker = EmailActivityTrackerFactory(message_id="456")
+        event_infos = [
+            {"event": "blocked", "time": 1433103519, "MessageID": 456},
+            {"event": "open", "time": 1433103520, "MessageID": 456},
+            {"event": "unsub", "time": 1433103521, "MessageID": 456},
+            {"event": "open", "MessageID": 456},
+        ]
+
+        with self.assertLogs("django_email.providers.abstract", level="WARNING") as logs:
+            self.assertListEqual(MailjetEmailProvider.handle_event_webhooks(event_infos), [])
+            MailjetEmailProvider.handle_event_webhook(event_infos[0])
+
+        # Only the events which could not be parsed are skipped
+        self.assertEqual(len(logs.records), 4)
+        email_activity_tracker.refresh_from_db()
+        self.assertEqual(email_activity_tracker.open_count, 1)
+        self.assertEqual(EventLog.objects.filter(email_activity_tracker=email_activity_tracker).count(), 1)
+
+    def test_handle_event_webhook_suppresses_hard_bounced_recipient(self):
+        EmailActivityTrackerFactory(message_id="456", email_address="Bounced@example.com")
+
+        MailjetEmailProvider.handle_event_webhook(
+            {"event": "bounce", "time": 1433103520, "MessageID": 456, "hard_bounce": True}
+        )
+
+        self.assertListEqual(
+            list(SuppressedEmailAddress.objects.values_list("email_address", "reason")),
+            [("bounced@example.com", SuppressedEmailAddress.REASON_HARD_BOUNCED)],
+        )
+
+    def test_handle_event_webhooks_delivered_again(self):
+        email_activity_tracker = EmailActivityTrackerFactory(message_id="456")
+        event_infos = [
+            {"event": "open", "time": 1433103520, "MessageID": 456},
+            {"event": "click", "time": 1433103522, "MessageID": 456, "url": "https://example.com/a"},
+            {"event": "click", "time": 1433103522, "MessageID": 456, "url": "https://example.com/b"},
+        ]
+
+        # The first open is repeated within the same request and the whole request is delivered again
+        MailjetEmailProvider.handle_event_webhooks(event_infos + event_infos[:1])
+        MailjetEmailProvider.handle_event_webhook(event_infos[0])
+        MailjetEmailProvider.handle_event_webhooks(event_infos)
+        email_activity_tracker.refresh_from_db()
+
+        self.assertEqual(EventLog.objects.filter(email_activity_tracker=email_activity_tracker).count(), 3)
+        self.assertTupleEqual((email_activity_tracker.open_count, email_activity_tracker.click_count), (1, 2))
+
+        engagement_rollup = EngagementRollup.objects.get()
+        self.assertTupleEqual((engagement_rollup.opened_count, engagement_rollup.clicked_count), (1, 2))
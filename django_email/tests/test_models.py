@@ -1,17 +1,51 @@
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 
 import pytz
 from django.conf import settings
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 
 from ..constants import DEFAULT_EMAIL_PROVIDER
-from ..models import EmailLog, EmailActivityTracker, EventLog
+from ..models import (
+    EmailActivityCounterDelta,
+    EmailActivityTracker,
+    EmailIdempotencyKey,
+    EmailLog,
+    EmailRecipient,
+    EmailTemplate,
+    EngagementRollup,
+    EngagementRollupDelta,
+    EventLog,
+)
 from ..tests.factories import (
     EmailLogFactory,
     EmailActivityTrackerFactory,
+    EventLogFactory,
 )
 
 
+class EmailTemplateModelTestCase(TestCase):
+    def test_register(self):
+        email_template = EmailTemplate.register("welcome", "Hello {{ name }}")
+        self.assertEqual(email_template.version, 1)
+
+        self.assertEqual(EmailTemplate.register("welcome", "Hello {{ name }}").version, 1)
+
+        email_template = EmailTemplate.register("welcome", "Hi {{ name }}")
+        self.assertTupleEqual((email_template.version, email_template.body), (2, "Hi {{ name }}"))
+        self.assertEqual(EmailTemplate.get_by_name("welcome"), email_template)
+        self.assertIsNone(EmailTemplate.get_by_name("unknown"))
+
+    def test_render(self):
+        email_template = EmailTemplate.register("welcome", "Hello {{ name }}{% if vip %}, welcome back{% endif %}")
+
+        self.assertEqual(email_template.render({"name": "Tony", "vip": True}), "Hello Tony, welcome back")
+        self.assertEqual(email_template.render({"name": "<b>Tony</b>"}), "Hello &lt;b&gt;Tony&lt;/b&gt;")
+        self.assertEqual(email_template.render(), "Hello ")
+
+
 class EmailLogModelTestCase(TestCase):
     def test_create_log(self):
 
@@ -25,6 +59,7 @@ class EmailLogModelTestCase(TestCase):
         body = "Test body"
         template_id = "12345678"
         template_dynamic_data = {"name": "example_name"}
+        reply_to = "reply_to@example.com"
 
         email_log = EmailLog.create_log(
             email_provider,
@@ -37,6 +72,7 @@ class EmailLogModelTestCase(TestCase):
             body,
             template_id,
             template_dynamic_data,
+            reply_to,
         )
         self.assertTupleEqual(
             (
@@ -64,6 +100,156 @@ class EmailLogModelTestCase(TestCase):
                 EmailLog.EMAIL_STATUS_QUEUED,
             ),
         )
+        self.assertListEqual(
+            list(email_log.recipients.order_by("id").values_list("recipient_type", "email_address")),
+            [
+                (EmailRecipient.TO_RECIPIENT_TYPE, "to_email@example.com"),
+                (EmailRecipient.CC_RECIPIENT_TYPE, "cc_email@example.com"),
+                (EmailRecipient.BCC_RECIPIENT_TYPE, "bcc_email@example.com"),
+            ],
+        )
+
+    def test_create_logs(self):
+        logs_data = [
+            {
+                "email_provider": DEFAULT_EMAIL_PROVIDER,
+                "from_email": settings.DEFAULT_FROM_EMAIL,
+                "to_emails": [f"to_email_{index}@example.com"],
+                "subject": f"Test Email {index}",
+            }
+            for index in range(3)
+        ]
+
+        email_logs = EmailLog.create_logs(logs_data)
+
+        self.assertEqual(len(email_logs), 3)
+        self.assertTrue(all(email_log.pk for email_log in email_logs))
+        self.assertListEqual(
+            list(EmailLog.objects.order_by("id").values_list("subject", flat=True)),
+            [log_data["subject"] for log_data in logs_data],
+        )
+        self.assertListEqual(
+            list(EmailRecipient.objects.order_by("id").values_list("email_log_id", "email_address")),
+            [(email_log.id, email_log.to_emails[0]) for email_log in email_logs],
+        )
+
+    def test_get_by_recipient(self):
+        email_log = EmailLog.create_logs(
+            [
+                {
+                    "email_provider": DEFAULT_EMAIL_PROVIDER,
+                    "from_email": settings.DEFAULT_FROM_EMAIL,
+                    "to_emails": ["Tony.Stark@example.com"],
+                    "bcc_emails": ["pepper@example.com"],
+                    "subject": "Test Email",
+                }
+            ]
+        )[0]
+        other_email_log = EmailLog.create_logs(
+            [
+                {
+                    "email_provider": DEFAULT_EMAIL_PROVIDER,
+                    "from_email": settings.DEFAULT_FROM_EMAIL,
+                    "to_emails": ["tony.stark@example.com.au"],
+                    "subject": "Test Email",
+                }
+            ]
+        )[0]
+
+        self.assertListEqual(list(EmailLog.get_by_recipient("tony.stark@example.com")), [email_log])
+        self.assertListEqual(list(EmailLog.get_by_recipient("PEPPER@example.com")), [email_log])
+        self.assertListEqual(
+            list(EmailLog.get_by_recipient("tony", prefix=True).order_by("id")), [email_log, other_email_log]
+        )
+        self.assertListEqual(list(EmailLog.get_by_recipient("tony")), [])
+
+    def test_get_queued_for_dispatch(self):
+        queued_email_logs = [EmailLogFactory() for _ in range(3)]
+        EmailLogFactory(dispatch_status=EmailLog.EMAIL_STATUS_SENT)
+
+        self.assertListEqual(EmailLog.get_queued_for_dispatch(), queued_email_logs)
+        self.assertListEqual(EmailLog.get_queued_for_dispatch(limit=2), queued_email_logs[:2])
+        self.assertListEqual(
+            EmailLog.get_queued_for_dispatch(email_log_ids=[queued_email_logs[1].id]),
+            [queued_email_logs[1]],
+        )
+
+    def test_claim_for_dispatch(self):
+        email_logs = [EmailLogFactory() for _ in range(2)]
+
+        self.assertListEqual(EmailLog.claim_for_dispatch(), email_logs)
+        # Claimed already, although not locked anymore
+        self.assertListEqual(EmailLog.claim_for_dispatch(), [])
+
+        EmailLog.release_claims(email_logs[:1])
+        self.assertListEqual(EmailLog.claim_for_dispatch(), email_logs[:1])
+
+        EmailLog.release_claims(email_logs)
+        with override_settings(DJANGO_EMAIL_DISPATCH_CLAIM_TTL=-1):
+            self.assertListEqual(EmailLog.claim_for_dispatch(), email_logs)
+
+        # Expired claims are taken over
+        self.assertListEqual(EmailLog.claim_for_dispatch(), email_logs)
+
+    def test_render_bodies(self):
+        email_template = EmailTemplate.register("welcome", "Hello {{ name }}")
+        email_logs = [
+            EmailLogFactory(email_template=email_template, body=None, template_dynamic_data={"name": "Tony"}),
+            EmailLogFactory(email_template=email_template, body="Already rendered"),
+            EmailLogFactory(body=None),
+        ]
+
+        EmailLog.render_bodies(email_logs)
+
+        self.assertListEqual(
+            [email_log.body for email_log in email_logs], ["Hello Tony", "Already rendered", None]
+        )
+        email_logs[0].refresh_from_db()
+        self.assertEqual(email_logs[0].body, "Hello Tony")
+
+    def test_update_dispatch_statuses(self):
+        sent_email_log = EmailLogFactory()
+        failed_email_log = EmailLogFactory()
+
+        sent_email_log.dispatch_status = EmailLog.EMAIL_STATUS_SENT
+        failed_email_log.dispatch_status = EmailLog.EMAIL_STATUS_FAILED
+        failed_email_log.error_info = {"error": "test error"}
+
+        EmailLog.update_dispatch_statuses([sent_email_log, failed_email_log])
+        sent_email_log.refresh_from_db()
+        failed_email_log.refresh_from_db()
+
+        self.assertEqual(sent_email_log.dispatch_status, EmailLog.EMAIL_STATUS_SENT)
+        self.assertTupleEqual(
+            (failed_email_log.dispatch_status, failed_email_log.error_info),
+            (EmailLog.EMAIL_STATUS_FAILED, {"error": "test error"}),
+        )
+
+
+class EmailRecipientModelTestCase(TestCase):
+    def test_backfill(self):
+        email_logs = [
+            EmailLogFactory(to_emails=["To@example.com"], cc_emails=None, bcc_emails=["bcc@example.com"])
+            for _ in range(3)
+        ]
+        EmailRecipient.add_recipients(email_logs[:1])
+
+        added_count = EmailRecipient.backfill(email_logs[0].id, email_logs[1].id + 1)
+
+        self.assertEqual(added_count, 2)
+        self.assertListEqual(
+            list(
+                EmailRecipient.objects.order_by("id").values_list(
+                    "email_log_id", "recipient_type", "email_address"
+                )
+            ),
+            [
+                (email_logs[0].id, EmailRecipient.TO_RECIPIENT_TYPE, "to@example.com"),
+                (email_logs[0].id, EmailRecipient.BCC_RECIPIENT_TYPE, "bcc@example.com"),
+                (email_logs[1].id, EmailRecipient.TO_RECIPIENT_TYPE, "to@example.com"),
+                (email_logs[1].id, EmailRecipient.BCC_RECIPIENT_TYPE, "bcc@example.com"),
+            ],
+        )
 
 
 class EmailActivityTrackerModelTestCase(TestCase):
@@ -115,6 +301,28 @@ class EmailActivityTrackerModelTestCase(TestCase):
             ),
         )
 
+    def test_track_recipients(self):
+        recipients_data = [
+            {
+                "email_log": self.email_log,
+                "recipient_type": EmailActivityTracker.TO_RECIPIENT_TYPE,
+                "email_address": f"noreply_{index}@example.com",
+                "message_id": f"12345678{index}",
+            }
+            for index in range(3)
+        ]
+
+        EmailActivityTracker.track_recipients(recipients_data)
+
+        self.assertListEqual(
+            list(
+                EmailActivityTracker.objects.filter(email_log=self.email_log)
+                .order_by("message_id")
+                .values_list("message_id", flat=True)
+            ),
+            [recipient_data["message_id"] for recipient_data in recipients_data],
+        )
+
     def test_update_fields_on_open_event(self):
         old_open_count = self.email_activity_tracker.open_count
 
@@ -166,6 +374,166 @@ class EmailActivityTrackerModelTestCase(TestCase):
         )
 
 
+    def test_update_fields_on_spammed_event(self):
+        self.email_activity_tracker.update_fields_on_event(
+            EventLog.EMAIL_SPAMMED_EVENT_TYPE
+        )
+
+        self.assertEqual(
+            self.email_activity_tracker.email_status,
+            EmailActivityTracker.SENT_EMAIL_STATUS_SPAMMED,
+        )
+
+    def test_update_fields_on_events(self):
+        other_email_activity_tracker = EmailActivityTrackerFactory()
+
+        EmailActivityTracker.update_fields_on_events(
+            {
+                self.email_activity_tracker.id: [
+                    EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+                    EventLog.EMAIL_OPENED_EVENT_TYPE,
+                    EventLog.EMAIL_OPENED_EVENT_TYPE,
+                    EventLog.EMAIL_CLICKED_EVENT_TYPE,
+                ],
+                other_email_activity_tracker.id: [
+                    EventLog.EMAIL_SOFT_BOUNCED_EVENT_TYPE,
+                    EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE,
+                ],
+            }
+        )
+        self.email_activity_tracker.refresh_from_db()
+        other_email_activity_tracker.refresh_from_db()
+
+        self.assertTupleEqual(
+            (
+                self.email_activity_tracker.email_status,
+                self.email_activity_tracker.open_count,
+                self.email_activity_tracker.click_count,
+            ),
+            (EmailActivityTracker.SENT_EMAIL_STATUS_DELIVERED, 2, 1),
+        )
+        self.assertTupleEqual(
+            (
+                other_email_activity_tracker.email_status,
+                other_email_activity_tracker.open_count,
+                other_email_activity_tracker.click_count,
+            ),
+            (EmailActivityTracker.SENT_EMAIL_STATUS_HARD_BOUNCED, 0, 0),
+        )
+
+
+    @override_settings(DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS=True)
+    def test_update_fields_on_events_with_coalesced_counters(self):
+        EmailActivityTracker.update_fields_on_events(
+            {
+                self.email_activity_tracker.id: [
+                    EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+                    EventLog.EMAIL_OPENED_EVENT_TYPE,
+                ]
+            }
+        )
+        updated_at = EmailActivityTracker.objects.get(id=self.email_activity_tracker.id).updated_at
+        # Only the delta is inserted, the tracker is not updated
+        with self.assertNumQueries(1):
+            self.email_activity_tracker.update_fields_on_event(EventLog.EMAIL_OPENED_EVENT_TYPE)
+        self.email_activity_tracker.update_fields_on_event(EventLog.EMAIL_CLICKED_EVENT_TYPE)
+        self.email_activity_tracker.refresh_from_db()
+        self.assertEqual(self.email_activity_tracker.updated_at, updated_at)
+
+        # Status is updated right away whereas the counters are only buffered
+        self.assertTupleEqual(
+            (
+                self.email_activity_tracker.email_status,
+                self.email_activity_tracker.open_count,
+                self.email_activity_tracker.click_count,
+            ),
+            (EmailActivityTracker.SENT_EMAIL_STATUS_DELIVERED, 0, 0),
+        )
+        self.assertEqual(EmailActivityCounterDelta.objects.count(), 3)
+
+        self.assertEqual(EmailActivityTracker.flush_counter_deltas(), 3)
+        self.email_activity_tracker.refresh_from_db()
+
+        self.assertTupleEqual(
+            (self.email_activity_tracker.open_count, self.email_activity_tracker.click_count),
+            (2, 1),
+        )
+        self.assertFalse(EmailActivityCounterDelta.objects.exists())
+
+
+class EmailActivityCounterDeltaModelTestCase(TestCase):
+    def setUp(self):
+        self.email_activity_tracker = EmailActivityTrackerFactory()
+        self.other_email_activity_tracker = EmailActivityTrackerFactory()
+
+    def test_add_deltas(self):
+        EmailActivityCounterDelta.add_deltas(
+            {
+                self.email_activity_tracker.id: {"open_count": 2, "click_count": 1},
+                self.other_email_activity_tracker.id: {"open_count": 0, "click_count": 0},
+            }
+        )
+
+        self.assertListEqual(
+            list(
+                EmailActivityCounterDelta.objects.values_list(
+                    "email_activity_tracker_id", "open_count", "click_count"
+                )
+            ),
+            [(self.email_activity_tracker.id, 2, 1)],
+        )
+
+    def test_flush(self):
+        EmailActivityCounterDelta.add_deltas(
+            {self.email_activity_tracker.id: {"open_count": 1, "click_count": 0}}
+        )
+        EmailActivityCounterDelta.add_deltas(
+            {
+                self.email_activity_tracker.id: {"open_count": 2, "click_count": 1},
+                self.other_email_activity_tracker.id: {"open_count": 1, "click_count": 0},
+            }
+        )
+
+        self.assertEqual(EmailActivityCounterDelta.flush(batch_size=2), 2)
+        self.email_activity_tracker.refresh_from_db()
+        self.assertTupleEqual(
+            (self.email_activity_tracker.open_count, self.email_activity_tracker.click_count),
+            (3, 1),
+        )
+
+        self.assertEqual(EmailActivityCounterDelta.flush(batch_size=2), 1)
+        self.assertEqual(EmailActivityCounterDelta.flush(batch_size=2), 0)
+        self.other_email_activity_tracker.refresh_from_db()
+        self.assertEqual(self.other_email_activity_tracker.open_count, 1)
+
+
+class EmailIdempotencyKeyModelTestCase(TestCase):
+    def test_claim(self):
+        email_log = EmailLogFactory()
+
+        self.assertTrue(EmailIdempotencyKey.claim("order-42-shipped"))
+        self.assertIsNone(EmailIdempotencyKey.get_email_log("order-42-shipped"))
+
+        EmailIdempotencyKey.set_email_log("order-42-shipped", email_log)
+
+        self.assertFalse(EmailIdempotencyKey.claim("order-42-shipped"))
+        self.assertEqual(EmailIdempotencyKey.get_email_log("order-42-shipped"), email_log)
+        self.assertIsNone(EmailIdempotencyKey.get_email_log("order-43-shipped"))
+
+    def test_delete_expired(self):
+        for key in ("order-41-shipped", "order-42-shipped", "order-43-shipped"):
+            EmailIdempotencyKey.claim(key)
+        EmailIdempotencyKey.objects.filter(key="order-43-shipped").update(created_at=timezone.now())
+        EmailIdempotencyKey.objects.exclude(key="order-43-shipped").update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+
+        self.assertEqual(EmailIdempotencyKey.delete_expired(timedelta(days=7), batch_size=1), 2)
+        self.assertListEqual(
+            list(EmailIdempotencyKey.objects.values_list("key", flat=True)), ["order-43-shipped"]
+        )
+
+
 class EventLogModelTestCase(TestCase):
     def setUp(self):
         self.email_activity_tracker = EmailActivityTrackerFactory()
@@ -188,3 +556,205 @@ class EventLogModelTestCase(TestCase):
             (event_log.event_type, event_log.event_info),
             (event_data["event_type"], event_data["event_info"]),
         )
+
+    def test_add_new_event_logs(self):
+        events_data = [
+            {
+                "email_activity_tracker": self.email_activity_tracker,
+                "event_at": pytz.UTC.localize(datetime.now()),
+                "event_type": event_type,
+                "event_info": {"event": event_type},
+            }
+            for event_type in (EventLog.EMAIL_DELIVERED_EVENT_TYPE, EventLog.EMAIL_OPENED_EVENT_TYPE)
+        ]
+
+        EventLog.add_new_event_logs(events_data)
+
+        self.assertListEqual(
+            list(
+                EventLog.objects.filter(email_activity_tracker=self.email_activity_tracker)
+                .order_by("id")
+                .values_list("event_type", flat=True)
+            ),
+            [EventLog.EMAIL_DELIVERED_EVENT_TYPE, EventLog.EMAIL_OPENED_EVENT_TYPE],
+        )
+
+    def test_add_new_event_logs_skips_logged_events(self):
+        event_at = pytz.UTC.localize(datetime.now())
+        events_data = [
+            {
+                "email_activity_tracker": self.email_activity_tracker,
+                "event_at": event_at,
+                "event_type": EventLog.EMAIL_OPENED_EVENT_TYPE,
+                "event_info": {"event": "open", "index": index},
+            }
+            for index in range(3)
+        ]
+
+        event_log = EventLog.add_new_event_log(events_data[0])
+        self.assertIsNotNone(event_log.id)
+        self.assertIsNone(EventLog.add_new_event_log(events_data[0]))
+
+        event_logs = EventLog.add_new_event_logs(events_data + events_data[1:2])
+
+        self.assertListEqual([event_log.event_info["index"] for event_log in event_logs], [1, 2])
+        self.assertListEqual(
+            sorted(event_log.id for event_log in event_logs),
+            list(EventLog.objects.filter(event_info__index__gt=0).order_by("id").values_list("id", flat=True)),
+        )
+        self.assertEqual(EventLog.objects.count(), 3)
+
+
+class EngagementRollupModelTestCase(TestCase):
+    def setUp(self):
+        self.email_log = EmailLogFactory(template_id="order_shipped")
+        self.day = timezone.localdate(self.email_log.created_at)
+
+    def test_add_counts(self):
+        key = (DEFAULT_EMAIL_PROVIDER, "order_shipped", "noreply@example.com", self.day)
+
+        EngagementRollup.add_counts({key: {"sent_count": 2}})
+        EngagementRollup.add_counts({key: {"sent_count": 1, "opened_count": 3}})
+
+        engagement_rollup = EngagementRollup.objects.get()
+        self.assertTupleEqual(
+            (engagement_rollup.sent_count, engagement_rollup.opened_count, engagement_rollup.clicked_count),
+            (3, 3, 0),
+        )
+
+    def test_get_stats(self):
+        EngagementRollup.add_sent({self.email_log: 4})
+        EngagementRollup.add_events(
+            {
+                self.email_log.id: [
+                    EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+                    EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+                    EventLog.EMAIL_DELIVERED_EVENT_TYPE,
+                    EventLog.EMAIL_OPENED_EVENT_TYPE,
+                    EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE,
+                ]
+            }
+        )
+        other_email_log = EmailLogFactory(template_id="order_shipped")
+        EngagementRollup.add_sent({other_email_log: 4})
+
+        stats = EngagementRollup.get_stats(self.day, self.day, template_id="order_shipped")
+
+        self.assertEqual(len(stats), 1)
+        self.assertDictEqual(
+            {field: stats[0][field] for field in ("day", "sent_count", "delivery_rate", "open_rate", "bounce_rate")},
+            {"day": self.day, "sent_count": 8, "delivery_rate": 3 / 8, "open_rate": 1 / 8, "bounce_rate": 1 / 8},
+        )
+        self.assertListEqual(EngagementRollup.get_stats(self.day, self.day, template_id="other"), [])
+
+    def test_rebuild(self):
+        email_activity_trackers = [EmailActivityTrackerFactory(email_log=self.email_log) for _ in range(2)]
+        for event_type in (EventLog.EMAIL_DELIVERED_EVENT_TYPE, EventLog.EMAIL_OPENED_EVENT_TYPE):
+            EventLogFactory(
+                email_activity_tracker=email_activity_trackers[0], event_type=event_type, event_at=timezone.now()
+            )
+        EngagementRollup.add_sent({self.email_log: 5})
+
+        self.assertEqual(EngagementRollup.rebuild(self.day), 1)
+
+        engagement_rollup = EngagementRollup.objects.get()
+        self.assertTupleEqual(
+            (
+                engagement_rollup.template_id,
+                engagement_rollup.sent_count,
+                engagement_rollup.delivered_count,
+                engagement_rollup.opened_count,
+            ),
+            ("order_shipped", 2, 1, 1),
+        )
+
+    @override_settings(TIME_ZONE="UTC")
+    def test_day_in_default_time_zone(self):
+        email_log = EmailLogFactory(template_id="order_placed")
+        email_log.created_at = datetime(2024, 1, 1, 2, tzinfo=pytz.utc)
+        email_log.save()
+        EmailActivityTrackerFactory(email_log=email_log)
+
+        # The day is the same whichever time zone is active, e.g. for the user of the current request
+        with timezone.override(pytz.timezone("America/New_York")):
+            EngagementRollup.add_sent({email_log: 1})
+            self.assertEqual(EngagementRollup.objects.get(template_id="order_placed").day, datetime(2024, 1, 1).date())
+
+            self.assertEqual(EngagementRollup.rebuild(datetime(2024, 1, 1).date()), 1)
+            self.assertEqual(EngagementRollup.objects.get(template_id="order_placed").sent_count, 1)
+
+    def test_rebuild_day_without_email_logs(self):
+        day = self.day - timedelta(days=1)
+        key = (DEFAULT_EMAIL_PROVIDER, "order_shipped", "noreply@example.com", day)
+        EngagementRollup.add_counts({key: {"sent_count": 2}})
+
+        # The email logs of the day were archived, their counts are kept
+        self.assertEqual(EngagementRollup.rebuild(day), 0)
+        self.assertEqual(EngagementRollup.objects.get(day=day).sent_count, 2)
+
+    @override_settings(DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS=True)
+    def test_add_events_with_coalesced_counters(self):
+        EngagementRollup.add_sent({self.email_log: 2})
+        EngagementRollup.add_events({self.email_log.id: [EventLog.EMAIL_OPENED_EVENT_TYPE]})
+        EngagementRollup.add_events({self.email_log.id: [EventLog.EMAIL_OPENED_EVENT_TYPE]})
+
+        self.assertFalse(EngagementRollup.objects.exists())
+        self.assertEqual(EngagementRollupDelta.objects.count(), 3)
+
+        self.assertEqual(EmailActivityTracker.flush_counter_deltas(), 3)
+
+        engagement_rollup = EngagementRollup.objects.get()
+        self.assertTupleEqual((engagement_rollup.sent_count, engagement_rollup.opened_count), (2, 2))
+        self.assertFalse(EngagementRollupDelta.objects.exists())
+
+    @override_settings(DJANGO_EMAIL_COALESCE_ACTIVITY_COUNTERS=True)
+    def test_rebuild_counts_buffered_deltas(self):
+        EmailActivityTrackerFactory(email_log=self.email_log)
+        EngagementRollup.add_sent({self.email_log: 1})
+
+        EngagementRollup.rebuild(self.day)
+
+        self.assertFalse(EngagementRollupDelta.objects.exists())
+        self.assertEqual(EngagementRollup.objects.get().sent_count, 1)
+
+
+class EngagementRollupDayLockTestCase(TransactionTestCase):
+    def run_in_thread(self, function):
+        results = []
+
+        def target():
+            try:
+                results.append(function())
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "Blocked by the lock of another day")
+
+        return results[0]
+
+    def test_lock_days(self):
+        day = timezone.localdate()
+        other_day = day - timedelta(days=1)
+        EngagementRollupDelta.objects.create(
+            email_provider=DEFAULT_EMAIL_PROVIDER, from_email="noreply@example.com", day=day, sent_count=1
+        )
+
+        with transaction.atomic():
+            # As held by the rebuild of the day
+            EngagementRollup.lock_days([day], exclusive=True)
+
+            self.run_in_thread(
+                lambda: EngagementRollup.add_counts(
+                    {(DEFAULT_EMAIL_PROVIDER, "", "noreply@example.com", other_day): {"sent_count": 1}}
+                )
+            )
+            # The deltas of the day are left to the rebuild
+            self.assertEqual(self.run_in_thread(EngagementRollupDelta.flush), 0)
+
+        self.assertEqual(EngagementRollupDelta.flush(), 1)
+        self.assertListEqual(
+            list(EngagementRollup.objects.order_by("day").values_list("day", "sent_count")), [(other_day, 1), (day, 1)]
+        )
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+import pytz
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import partitioning
+from ..models import EmailLog, EventLog
+from ..tests.factories import EmailActivityTrackerFactory, EmailLogFactory, EventLogFactory
+
+
+class PartitioningTestCase(TestCase):
+    def test_get_month_start(self):
+        value = datetime(2020, 12, 15, 10, tzinfo=pytz.utc)
+
+        self.assertEqual(partitioning.get_month_start(value), datetime(2020, 12, 1, tzinfo=pytz.utc))
+        self.assertEqual(partitioning.get_month_start(value, months=1), datetime(2021, 1, 1, tzinfo=pytz.utc))
+        self.assertEqual(partitioning.get_month_start(value, months=-12), datetime(2019, 12, 1, tzinfo=pytz.utc))
+
+    def test_partition_event_logs(self):
+        email_activity_tracker = EmailActivityTrackerFactory()
+        old_event_log = EventLogFactory(
+            email_activity_tracker=email_activity_tracker, event_at=datetime(2020, 1, 1, tzinfo=pytz.utc)
+        )
+        table = EventLog._meta.db_table
+        current_month_start = partitioning.get_month_start(timezone.now())
+
+        partitioning.partition_table(EventLog)
+
+        self.assertTrue(partitioning.is_partitioned(EventLog))
+        self.assertListEqual(
+            partitioning.get_partitions(EventLog),
+            [(f"{table}_legacy", partitioning.get_month_start(timezone.now(), months=1))],
+        )
+
+        self.assertListEqual(
+            partitioning.create_partitions(EventLog, months_ahead=2),
+            [
+                f"{table}_p{partitioning.get_month_start(timezone.now(), months=months):%Y%m}"
+                for months in (1, 2)
+            ],
+        )
+        self.assertListEqual(partitioning.create_partitions(EventLog, months_ahead=2), [])
+
+        # New rows go to their partition and the existing ones are still there
+        new_event_log = EventLogFactory(
+            email_activity_tracker=email_activity_tracker, event_at=current_month_start + timedelta(days=40)
+        )
+        self.assertListEqual(
+            list(EventLog.objects.filter(email_activity_tracker=email_activity_tracker).order_by("event_at")),
+            [old_event_log, new_event_log],
+        )
+        self.assertGreater(new_event_log.id, old_event_log.id)
+
+        # Only the partitions which can hold the events of the tracker are scanned
+        new_email_activity_tracker = EmailActivityTrackerFactory(created_at=current_month_start + timedelta(days=35))
+        plan = new_email_activity_tracker.get_event_logs().explain()
+        self.assertNotIn(f"{table}_legacy", plan)
+        self.assertIn(f"{table}_p", plan)
+
+        self.assertListEqual(
+            partitioning.detach_partitions(EventLog, before=current_month_start + timedelta(days=1)), []
+        )
+        self.assertListEqual(
+            partitioning.detach_partitions(
+                EventLog, before=partitioning.get_month_start(timezone.now(), months=1), drop=True
+            ),
+            [f"{table}_legacy"],
+        )
+        self.assertListEqual(list(EventLog.objects.all()), [new_event_log])
+
+    def test_partition_email_logs(self):
+        email_activity_tracker = EmailActivityTrackerFactory()
+
+        partitioning.partition_table(EmailLog)
+        partitioning.create_partitions(EmailLog, months_ahead=1)
+
+        email_log = EmailLogFactory(created_at=timezone.now() + timedelta(days=35))
+        EmailActivityTrackerFactory(email_log=email_log)
+
+        self.assertListEqual(
+            list(EmailLog.objects.filter(emailactivitytracker__isnull=False).order_by("id")),
+            [email_activity_tracker.email_log, email_log],
+        )
+
+    def test_email_partitions_command(self):
+        stdout = StringIO()
+        call_command("email_partitions", "setup", "--months-ahead=1", stdout=stdout)
+        call_command("email_partitions", "setup", stdout=stdout)
+        call_command("email_partitions", "create", "--months-ahead=2", stdout=stdout)
+        call_command("email_partitions", "detach", "--retention-months=0", stdout=stdout)
+
+        table = EventLog._meta.db_table
+        self.assertListEqual(
+            stdout.getvalue().splitlines(),
+            [
+                f"Partitioned {table}, created "
+                f"{table}_p{partitioning.get_month_start(timezone.now(), months=1):%Y%m}",
+                f"{table} is already partitioned",
+                f"Created {table}_p{partitioning.get_month_start(timezone.now(), months=2):%Y%m} of {table}",
+                # The current month is never past the retention period
+                f"Detached no partitions of {table}",
+            ],
+        )
+        self.assertFalse(partitioning.is_partitioned(EmailLog))
+
+    def test_email_partitions_command_does_not_detach_email_logs(self):
+        call_command("email_partitions", "setup", "--model=emaillog", stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command("email_partitions", "detach", "--model=emaillog", "--retention-months=0", stdout=StringIO())
+
+        with self.assertRaises(ValueError):
+            partitioning.detach_partitions(EmailLog, before=timezone.now())
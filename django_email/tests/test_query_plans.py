@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..constants import EMAIL_PROVIDER_MAILJET
+from ..models import EmailLog, EmailRecipient, EventLog
+from ..tests.factories import EventLogFactory
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Fails if any of the hot queries can not be served by an index. Sequential scans are disabled for these tests
+    since the planner prefers them anyway for the few rows in a test database.
+    """
+
+    def setUp(self):
+        self.event_log = EventLogFactory()
+        self.since = timezone.now() - timedelta(days=1)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn(index_name, plan)
+
+    def test_email_logs_by_dispatch_status(self):
+        self.assertUsesIndex(
+            EmailLog.objects.filter(
+                dispatch_status=EmailLog.EMAIL_STATUS_FAILED, created_at__gte=self.since
+            ),
+            "emaillog_status_created_at",
+        )
+
+    def test_email_logs_by_template_id(self):
+        self.assertUsesIndex(
+            EmailLog.objects.filter(template_id="template_id", created_at__gte=self.since),
+            "emaillog_template_created_at",
+        )
+
+    def test_email_logs_by_email_provider(self):
+        self.assertUsesIndex(
+            EmailLog.objects.filter(email_provider=EMAIL_PROVIDER_MAILJET, created_at__gte=self.since),
+            "emaillog_provider_created_at",
+        )
+
+    def test_email_logs_by_from_email(self):
+        self.assertUsesIndex(
+            EmailLog.objects.filter(from_email="from@example.com", created_at__gte=self.since),
+            "emaillog_from_email_created_at",
+        )
+
+    def test_queued_email_logs(self):
+        self.assertUsesIndex(
+            EmailLog.objects.filter(dispatch_status=EmailLog.EMAIL_STATUS_QUEUED).order_by("id")[:50],
+            "emaillog_queued",
+        )
+
+    def test_email_logs_by_created_at(self):
+        self.assertNotIn(
+            "Seq Scan", EmailLog.objects.filter(created_at__gte=self.since).explain()
+        )
+
+    def test_event_logs_of_tracker(self):
+        self.assertUsesIndex(
+            EventLog.objects.filter(
+                email_activity_tracker=self.event_log.email_activity_tracker
+            ).order_by("-event_at"),
+            "eventlog_tracker_event_at",
+        )
+
+    def test_email_logs_by_recipient(self):
+        self.assertUsesIndex(
+            EmailRecipient.get_email_log_ids_queryset("user@example.com"), "emailrecipient_email_address"
+        )
+        self.assertUsesIndex(
+            EmailRecipient.get_email_log_ids_queryset("user@", prefix=True), "emailrecipient_email_address"
+        )
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import rate_limiters
+from ..constants import EMAIL_PROVIDER_MAILJET
+from ..exceptions import RateLimitExceededException
+from ..rate_limiters import CacheRateLimiter, LocalRateLimiter, get_rate_limiter
+
+
+class LocalRateLimiterTestCase(SimpleTestCase):
+    def test_try_acquire(self):
+        rate_limiter = LocalRateLimiter(rate=10, burst=2)
+
+        with mock.patch("django_email.rate_limiters.time.monotonic") as mocked_monotonic:
+            mocked_monotonic.return_value = 100
+
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+            self.assertAlmostEqual(rate_limiter.try_acquire("key"), 0.1)
+            # Buckets of different keys are independent of each other
+            self.assertEqual(rate_limiter.try_acquire("other_key"), 0)
+
+            mocked_monotonic.return_value = 100.2
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+
+    def test_acquire(self):
+        rate_limiter = LocalRateLimiter(rate=1, burst=1)
+        rate_limiter.acquire("key")
+
+        with self.assertRaises(RateLimitExceededException):
+            rate_limiter.acquire("key", max_wait=0.5)
+
+        with mock.patch("django_email.rate_limiters.time.sleep") as mocked_sleep:
+            with mock.patch.object(rate_limiter, "try_acquire", side_effect=[0.5, 0]):
+                rate_limiter.acquire("key", max_wait=1)
+
+            mocked_sleep.assert_called_once_with(0.5)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CacheRateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        CacheRateLimiter(rate=2).cache.clear()
+
+    def test_try_acquire(self):
+        rate_limiter = CacheRateLimiter(rate=2, burst=2)
+
+        with mock.patch("django_email.rate_limiters.time.time") as mocked_time:
+            mocked_time.return_value = 1000.9
+
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+            self.assertAlmostEqual(rate_limiter.try_acquire("key"), 0.5)
+
+            # Below is the test for the burst not being allowed again right after a second boundary
+            mocked_time.return_value = 1001
+            self.assertAlmostEqual(rate_limiter.try_acquire("key"), 0.4)
+
+            mocked_time.return_value = 1001.4
+            self.assertEqual(rate_limiter.try_acquire("key"), 0)
+
+        # Other instances, e.g. in other processes, share the bucket through the cache
+        with mock.patch("django_email.rate_limiters.time.time") as mocked_time:
+            mocked_time.return_value = 1001.9
+            self.assertEqual(CacheRateLimiter(rate=2, burst=2).try_acquire("key"), 0)
+            self.assertAlmostEqual(CacheRateLimiter(rate=2, burst=2).try_acquire("key"), 0.5)
+
+    def test_try_acquire_while_locked(self):
+        rate_limiter = CacheRateLimiter(rate=2, burst=2)
+        rate_limiter.cache.add(f"{rate_limiter.key_prefix}:key:lock", 1)
+
+        self.assertEqual(rate_limiter.try_acquire("key"), rate_limiter.lock_retry_interval)
+        self.assertEqual(rate_limiter.try_acquire("other_key"), 0)
+
+
+class GetRateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        rate_limiters._provider_vs_rate_limiter.clear()
+        self.addCleanup(rate_limiters._provider_vs_rate_limiter.clear)
+
+    def test_get_rate_limiter_without_rate_limit(self):
+        self.assertIsNone(get_rate_limiter(EMAIL_PROVIDER_MAILJET))
+
+    @override_settings(DJANGO_EMAIL_RATE_LIMITS={EMAIL_PROVIDER_MAILJET: {"rate": 5, "burst": 10}})
+    def test_get_rate_limiter(self):
+        rate_limiter = get_rate_limiter(EMAIL_PROVIDER_MAILJET)
+
+        self.assertIsInstance(rate_limiter, LocalRateLimiter)
+        self.assertTupleEqual((rate_limiter.rate, rate_limiter.burst), (5, 10))
+        self.assertIs(get_rate_limiter(EMAIL_PROVIDER_MAILJET), rate_limiter)
@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..constants import EMAIL_PROVIDER_MAILJET
+from ..providers.abstract import AbstractEmailProvider
+from ..providers.mailjet import MailjetEmailProvider
+from ..providers.registry import ProviderRegistry
+
+
+class TestEmailProvider(AbstractEmailProvider):
+    provider = "test_provider"
+
+
+class ProviderRegistryTestCase(SimpleTestCase):
+    def setUp(self):
+        self.provider_registry = ProviderRegistry()
+
+    def test_get_provider_class_for_builtin_provider(self):
+        self.provider_registry.load()
+
+        self.assertEqual(
+            self.provider_registry.get_provider_class(EMAIL_PROVIDER_MAILJET),
+            MailjetEmailProvider,
+        )
+
+        with self.assertRaises(KeyError):
+            self.provider_registry.get_provider_class(TestEmailProvider.provider)
+
+    @override_settings(
+        DJANGO_EMAIL_PROVIDERS=["django_email.tests.test_registry.TestEmailProvider"]
+    )
+    def test_get_provider_class_for_provider_from_settings(self):
+        self.provider_registry.load()
+
+        self.assertEqual(
+            self.provider_registry.get_provider_class(TestEmailProvider.provider),
+            TestEmailProvider,
+        )
+        self.assertEqual(
+            self.provider_registry.get_provider_class(EMAIL_PROVIDER_MAILJET),
+            MailjetEmailProvider,
+        )
+
+    def test_register(self):
+        self.provider_registry.register(TestEmailProvider)
+
+        self.assertEqual(
+            self.provider_registry.get_provider_class(TestEmailProvider.provider),
+            TestEmailProvider,
+        )
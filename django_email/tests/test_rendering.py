@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from ..rendering import CompiledTemplateCache
+
+
+class CompiledTemplateCacheTestCase(SimpleTestCase):
+    def test_get(self):
+        compiled_template_cache = CompiledTemplateCache(max_size=2)
+
+        compiled_template = compiled_template_cache.get(("welcome", 1), "Hello")
+        self.assertIs(compiled_template_cache.get(("welcome", 1), "Hello"), compiled_template)
+
+        # A new version of the template is compiled afresh
+        self.assertIsNot(compiled_template_cache.get(("welcome", 2), "Hi"), compiled_template)
+
+        # The least recently used template is evicted
+        compiled_template_cache.get(("reminder", 1), "Reminder")
+        self.assertIsNot(compiled_template_cache.get(("welcome", 1), "Hello"), compiled_template)
+
+        self.assertDictEqual(compiled_template_cache.get_stats(), {"size": 2, "hits": 1, "misses": 4})
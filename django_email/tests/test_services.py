@@ -1,10 +1,20 @@
+from datetime import date
 from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
 from django.conf import settings
 
 from ..constants import EMAIL_PROVIDER_MAILJET
-from ..models import EmailLog
+from ..exceptions import RateLimitExceededException, RecipientsSuppressedException
+from ..models import (
+    EmailIdempotencyKey,
+    EmailLog,
+    EmailTemplate,
+    EngagementRollup,
+    PendingEvent,
+    SuppressedEmailAddress,
+)
 from ..providers.mailjet import MailjetEmailProvider
 from ..services import EmailService
 from ..tests.factories import EmailLogFactory
@@ -73,10 +83,456 @@ class EmailServiceTestCase(TestCase):
                 body,
                 template_id,
                 template_dynamic_data,
+                None,
+                email_template=None,
             )
             mocked_mailjet_send_email.assert_called_with(email_log)
             mocked_handle_send_email_response.called_with(response, email_log)
 
+    def test_send_email_with_idempotency_key(self):
+        with mock.patch.object(
+            MailjetEmailProvider, "send_email"
+        ) as mocked_mailjet_send_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_email_response"
+        ):
+            email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", body="Test body", idempotency_key="order-42-shipped"
+            )
+            repeated_email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", body="Test body", idempotency_key="order-42-shipped"
+            )
+
+            self.assertEqual(repeated_email_log, email_log)
+            self.assertEqual(EmailLog.objects.count(), 1)
+            mocked_mailjet_send_email.assert_called_once_with(email_log)
+
+    def test_send_email_with_idempotency_key_after_failure(self):
+        with mock.patch.object(MailjetEmailProvider, "send_email", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                EmailService.send_email(
+                    ["to_email@example.com"], "Test Email", body="Test body", idempotency_key="order-42-shipped"
+                )
+
+        with mock.patch.object(
+            MailjetEmailProvider, "send_email"
+        ) as mocked_mailjet_send_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_email_response"
+        ):
+            # The email log left queued by the failed call is sent by the retry
+            email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", body="Test body", idempotency_key="order-42-shipped"
+            )
+
+            mocked_mailjet_send_email.assert_called_once_with(email_log)
+            self.assertEqual(EmailLog.objects.count(), 1)
+
+    def test_send_email_with_expired_idempotency_key(self):
+        email_log = EmailService.send_email(
+            ["to_email@example.com"], "Test Email", idempotency_key="order-42-shipped", async_dispatch=True
+        )
+
+        # The key is not deleted yet but has expired
+        with override_settings(DJANGO_EMAIL_IDEMPOTENCY_KEY_TTL=-1):
+            self.assertIsNone(EmailIdempotencyKey.get_email_log("order-42-shipped"))
+
+            repeated_email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", idempotency_key="order-42-shipped", async_dispatch=True
+            )
+
+        self.assertNotEqual(repeated_email_log, email_log)
+        self.assertEqual(EmailIdempotencyKey.get_email_log("order-42-shipped"), repeated_email_log)
+
+    def test_delete_expired_idempotency_keys(self):
+        EmailService.send_email(
+            ["to_email@example.com"], "Test Email", idempotency_key="order-42-shipped", async_dispatch=True
+        )
+
+        with override_settings(DJANGO_EMAIL_IDEMPOTENCY_KEY_TTL=-1):
+            self.assertEqual(EmailService.delete_expired_idempotency_keys(), 1)
+
+        self.assertFalse(EmailIdempotencyKey.objects.exists())
+
+    def test_send_email_already_dispatched(self):
+        email_log = EmailLogFactory(dispatch_status=EmailLog.EMAIL_STATUS_SENT)
+
+        with mock.patch.object(
+            EmailLog, "create_log"
+        ) as mocked_create_log, mock.patch.object(
+            MailjetEmailProvider, "send_email"
+        ) as mocked_mailjet_send_email:
+            # Below is the scenario when the email dispatcher has sent the email log before it could be locked
+            mocked_create_log.return_value = email_log
+
+            EmailService.send_email(["to_email@example.com"], "Test Email")
+
+            mocked_mailjet_send_email.assert_not_called()
+
+    def test_send_email_when_rate_limit_exceeded(self):
+        with mock.patch(
+            "django_email.services.transaction.on_commit", side_effect=lambda callback: callback()
+        ), mock.patch(
+            "django_email.tasks.dispatch_email_logs.apply_async"
+        ) as mocked_dispatch_email_logs, mock.patch.object(
+            MailjetEmailProvider, "send_email", side_effect=RateLimitExceededException(retry_after=5)
+        ), mock.patch.object(
+            MailjetEmailProvider, "handle_send_email_response"
+        ) as mocked_handle_send_email_response:
+            email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", email_provider=EMAIL_PROVIDER_MAILJET
+            )
+            email_log.refresh_from_db()
+
+            # The email is sent later instead of being marked as failed
+            self.assertEqual(email_log.dispatch_status, EmailLog.EMAIL_STATUS_QUEUED)
+            mocked_handle_send_email_response.assert_not_called()
+            mocked_dispatch_email_logs.assert_called_with(([email_log.id],), countdown=5)
+
+    def test_send_email_with_async_dispatch(self):
+        to_emails = ["to_email@example.com"]
+        subject = "Test Email"
+
+        with mock.patch(
+            "django_email.services.transaction.on_commit", side_effect=lambda callback: callback()
+        ), mock.patch(
+            "django_email.tasks.dispatch_email_logs.apply_async"
+        ) as mocked_dispatch_email_logs, mock.patch.object(
+            MailjetEmailProvider, "send_email"
+        ) as mocked_mailjet_send_email:
+            email_log = EmailService.send_email(
+                to_emails, subject, email_provider=EMAIL_PROVIDER_MAILJET, async_dispatch=True
+            )
+
+            self.assertEqual(email_log.dispatch_status, EmailLog.EMAIL_STATUS_QUEUED)
+            mocked_dispatch_email_logs.assert_called_with(([email_log.id],), countdown=None)
+            mocked_mailjet_send_email.assert_not_called()
+
+    def test_dispatch_email_logs(self):
+        queued_email_logs = [
+            EmailLogFactory(email_provider=EMAIL_PROVIDER_MAILJET) for _ in range(3)
+        ]
+        sent_email_log = EmailLogFactory(
+            email_provider=EMAIL_PROVIDER_MAILJET, dispatch_status=EmailLog.EMAIL_STATUS_SENT
+        )
+        response = {"Messages": []}
+
+        with mock.patch.object(
+            MailjetEmailProvider, "max_messages_per_request", 2
+        ), mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response"
+        ) as mocked_handle_send_bulk_email_response:
+            mocked_mailjet_send_bulk_email.return_value = response
+
+            dispatched_count = EmailService.dispatch_email_logs(
+                [email_log.id for email_log in queued_email_logs] + [sent_email_log.id]
+            )
+
+            self.assertEqual(dispatched_count, 3)
+            mocked_mailjet_send_bulk_email.assert_has_calls(
+                [mock.call(queued_email_logs[:2]), mock.call(queued_email_logs[2:])]
+            )
+            mocked_handle_send_bulk_email_response.assert_has_calls(
+                [
+                    mock.call(response, queued_email_logs[:2]),
+                    mock.call(response, queued_email_logs[2:]),
+                ]
+            )
+
+    def test_dispatch_email_logs_when_request_fails(self):
+        queued_email_logs = [EmailLogFactory(email_provider=EMAIL_PROVIDER_MAILJET) for _ in range(3)]
+
+        def mark_sent(response, email_logs):
+            EmailLog.objects.filter(id__in=[email_log.id for email_log in email_logs]).update(
+                dispatch_status=EmailLog.EMAIL_STATUS_SENT
+            )
+
+        with mock.patch.object(
+            MailjetEmailProvider, "max_messages_per_request", 2
+        ), mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email", side_effect=[{"Messages": []}, ConnectionError]
+        ), mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response", side_effect=mark_sent
+        ):
+            with self.assertRaises(ConnectionError):
+                EmailService.dispatch_email_logs(limit=100)
+
+        # The email logs sent by the first request stay sent, the others can be sent again right away
+        self.assertListEqual(
+            list(
+                EmailLog.objects.filter(id__in=[email_log.id for email_log in queued_email_logs])
+                .order_by("id")
+                .values_list("dispatch_status", "dispatch_claimed_until")
+            ),
+            [
+                (EmailLog.EMAIL_STATUS_SENT, mock.ANY),
+                (EmailLog.EMAIL_STATUS_SENT, mock.ANY),
+                (EmailLog.EMAIL_STATUS_QUEUED, None),
+            ],
+        )
+
+    def test_send_bulk_skips_claimed_email_logs(self):
+        messages = [
+            {"to_emails": [f"to_email_{index}@example.com"], "subject": f"Test Email {index}"}
+            for index in range(2)
+        ]
+        claim_for_dispatch = EmailLog.claim_for_dispatch
+
+        def claim_first_for_dispatcher(email_log_ids):
+            # The email dispatcher claims the first email log before send_bulk does
+            claim_for_dispatch(email_log_ids=email_log_ids[:1])
+            return claim_for_dispatch(email_log_ids=email_log_ids)
+
+        with mock.patch.object(
+            EmailLog, "claim_for_dispatch", side_effect=claim_first_for_dispatcher
+        ), mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response"
+        ):
+            email_logs = EmailService.send_bulk(messages, email_provider=EMAIL_PROVIDER_MAILJET)
+
+            mocked_mailjet_send_bulk_email.assert_called_once_with(email_logs[1:])
+
+    def test_asend_email_of_mailjet(self):
+        to_emails = ["to_email@example.com"]
+        subject = "Test Email"
+        response = {"MessageId": "123456"}
+
+        with mock.patch.object(
+            MailjetEmailProvider, "asend_email", new_callable=mock.AsyncMock
+        ) as mocked_mailjet_asend_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_email_response"
+        ) as mocked_handle_send_email_response:
+            mocked_mailjet_asend_email.return_value = response
+
+            email_log = async_to_sync(EmailService.asend_email)(
+                to_emails, subject, email_provider=EMAIL_PROVIDER_MAILJET
+            )
+
+            self.assertTupleEqual(
+                (email_log.to_emails, email_log.subject, email_log.dispatch_status),
+                (to_emails, subject, EmailLog.EMAIL_STATUS_QUEUED),
+            )
+            self.assertTrue(EmailLog.objects.filter(id=email_log.id).exists())
+            mocked_mailjet_asend_email.assert_awaited_with(email_log)
+            mocked_handle_send_email_response.assert_called_with(response, email_log)
+
+    def test_asend_email_when_rate_limit_exceeded(self):
+        with mock.patch(
+            "django_email.services.transaction.on_commit", side_effect=lambda callback: callback()
+        ), mock.patch(
+            "django_email.tasks.dispatch_email_logs.apply_async"
+        ) as mocked_dispatch_email_logs, mock.patch.object(
+            MailjetEmailProvider,
+            "athrottle",
+            new_callable=mock.AsyncMock,
+            side_effect=RateLimitExceededException(retry_after=5),
+        ), mock.patch.object(
+            MailjetEmailProvider, "asend_email", new_callable=mock.AsyncMock
+        ) as mocked_mailjet_asend_email:
+            email_log = async_to_sync(EmailService.asend_email)(
+                ["to_email@example.com"], "Test Email", email_provider=EMAIL_PROVIDER_MAILJET
+            )
+            email_log.refresh_from_db()
+
+            # The email is sent later, as by send_email, instead of the exception being raised
+            self.assertTupleEqual(
+                (email_log.dispatch_status, email_log.dispatch_claimed_until), (EmailLog.EMAIL_STATUS_QUEUED, None)
+            )
+            mocked_mailjet_asend_email.assert_not_awaited()
+            mocked_dispatch_email_logs.assert_called_with(([email_log.id],), countdown=5)
+
+    def test_send_bulk_with_empty_sender(self):
+        messages = [
+            {"to_emails": ["to_email@example.com"], "subject": "Test Email", "from_email": None, "from_name": ""},
+        ]
+
+        email_logs = EmailService.send_bulk(messages, EMAIL_PROVIDER_MAILJET, async_dispatch=True)
+
+        # The defaults are used, as by send_email
+        self.assertTupleEqual(
+            (email_logs[0].from_email, email_logs[0].from_name),
+            (settings.DEFAULT_FROM_EMAIL, settings.DEFAULT_FROM_NAME),
+        )
+
+    def test_send_bulk_with_idempotency_keys(self):
+        sent_email_log = EmailService.send_email(
+            ["to_email_0@example.com"], "Test Email 0", idempotency_key="order-0-shipped", async_dispatch=True
+        )
+        sent_email_log.update_fields(dispatch_status=EmailLog.EMAIL_STATUS_SENT)
+        messages = [
+            {"to_emails": ["to_email_0@example.com"], "subject": "Test Email 0", "idempotency_key": "order-0-shipped"},
+            {"to_emails": ["to_email_1@example.com"], "subject": "Test Email 1", "idempotency_key": "order-1-shipped"},
+            {"to_emails": ["to_email_2@example.com"], "subject": "Test Email 2"},
+        ]
+
+        with mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response"
+        ):
+            email_logs = EmailService.send_bulk(messages, email_provider=EMAIL_PROVIDER_MAILJET)
+
+            self.assertEqual(email_logs[0], sent_email_log)
+            self.assertListEqual(
+                [email_log.subject for email_log in email_logs], ["Test Email 0", "Test Email 1", "Test Email 2"]
+            )
+            self.assertEqual(EmailIdempotencyKey.get_email_log("order-1-shipped"), email_logs[1])
+            # The email log sent by the earlier call is not sent again
+            mocked_mailjet_send_bulk_email.assert_called_once_with(email_logs[1:])
+
+    def test_send_bulk_of_mailjet(self):
+        messages = [
+            {"to_emails": [f"to_email_{index}@example.com"], "subject": f"Test Email {index}"}
+            for index in range(3)
+        ]
+        response = {"Messages": []}
+
+        with mock.patch.object(
+            MailjetEmailProvider, "max_messages_per_request", 2
+        ), mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response"
+        ) as mocked_handle_send_bulk_email_response:
+            mocked_mailjet_send_bulk_email.return_value = response
+
+            email_logs = EmailService.send_bulk(messages, EMAIL_PROVIDER_MAILJET)
+
+            self.assertEqual(len(email_logs), 3)
+            self.assertTrue(
+                all(
+                    email_log.from_email == settings.DEFAULT_FROM_EMAIL
+                    and email_log.email_provider == EMAIL_PROVIDER_MAILJET
+                    for email_log in email_logs
+                )
+            )
+            mocked_mailjet_send_bulk_email.assert_has_calls(
+                [mock.call(email_logs[:2]), mock.call(email_logs[2:])]
+            )
+            mocked_handle_send_bulk_email_response.assert_has_calls(
+                [mock.call(response, email_logs[:2]), mock.call(response, email_logs[2:])]
+            )
+
+    @override_settings(DJANGO_EMAIL_SUPPRESSION_FILTER=None)
+    def test_send_email_to_suppressed_recipients(self):
+        SuppressedEmailAddress.suppress(["blocked@example.com", "cc_email@example.com"])
+
+        email_log = EmailService.send_email(
+            ["to_email@example.com", "Blocked@example.com"],
+            "Test Email",
+            cc_emails=["cc_email@example.com"],
+            body="test body",
+            async_dispatch=True,
+        )
+
+        self.assertTupleEqual((email_log.to_emails, email_log.cc_emails), (["to_email@example.com"], []))
+
+        with self.assertRaises(RecipientsSuppressedException) as context:
+            EmailService.send_email(["blocked@example.com"], "Test Email", body="test body", async_dispatch=True)
+
+        self.assertListEqual(context.exception.suppressed_email_addresses, ["blocked@example.com"])
+        self.assertEqual(EmailLog.objects.count(), 1)
+
+        with override_settings(DJANGO_EMAIL_SUPPRESS_RECIPIENTS=False):
+            email_log = EmailService.send_email(
+                ["blocked@example.com"], "Test Email", body="test body", async_dispatch=True
+            )
+
+        self.assertListEqual(email_log.to_emails, ["blocked@example.com"])
+
+    @override_settings(DJANGO_EMAIL_SUPPRESSION_FILTER=None)
+    def test_send_email_with_idempotency_key_to_recipient_suppressed_since(self):
+        email_log = EmailService.send_email(
+            ["to_email@example.com"], "Test Email", idempotency_key="order-42-shipped", async_dispatch=True
+        )
+        SuppressedEmailAddress.suppress(["to_email@example.com"], SuppressedEmailAddress.REASON_HARD_BOUNCED)
+
+        with self.assertNumQueries(1):
+            repeated_email_log = EmailService.send_email(
+                ["to_email@example.com"], "Test Email", idempotency_key="order-42-shipped", async_dispatch=True
+            )
+
+        self.assertEqual(repeated_email_log, email_log)
+
+        # Nothing is kept of a new key all of whose recipients are suppressed
+        with self.assertRaises(RecipientsSuppressedException):
+            EmailService.send_email(
+                ["to_email@example.com"], "Test Email", idempotency_key="order-43-shipped", async_dispatch=True
+            )
+
+        self.assertFalse(EmailIdempotencyKey.objects.filter(key="order-43-shipped").exists())
+
+    @override_settings(DJANGO_EMAIL_SUPPRESSION_FILTER=None)
+    def test_send_bulk_to_suppressed_recipients(self):
+        SuppressedEmailAddress.suppress(["blocked@example.com"])
+        messages = [
+            {"to_emails": [to_email], "subject": "Test Email"}
+            for to_email in ("to_email@example.com", "blocked@example.com")
+        ]
+
+        email_logs = EmailService.send_bulk(messages, EMAIL_PROVIDER_MAILJET, async_dispatch=True)
+
+        self.assertListEqual([email_log.to_emails for email_log in email_logs], [["to_email@example.com"]])
+
+    def test_send_bulk_with_email_template(self):
+        EmailTemplate.register("welcome", "Hello {{ name }}")
+        messages = [
+            {
+                "to_emails": [f"to_email_{index}@example.com"],
+                "subject": "Welcome",
+                "email_template": "welcome",
+                "template_dynamic_data": {"name": f"<User {index}>"},
+            }
+            for index in range(3)
+        ]
+
+        with mock.patch.object(
+            MailjetEmailProvider, "send_bulk_email"
+        ) as mocked_mailjet_send_bulk_email, mock.patch.object(
+            MailjetEmailProvider, "handle_send_bulk_email_response"
+        ):
+            email_logs = EmailService.send_bulk(messages, EMAIL_PROVIDER_MAILJET)
+
+            # Rendered right before being sent, with the dynamic data escaped
+            self.assertListEqual(
+                [email_log.body for email_log in mocked_mailjet_send_bulk_email.call_args[0][0]],
+                [f"Hello &lt;User {index}&gt;" for index in range(3)],
+            )
+            self.assertListEqual(
+                list(
+                    EmailLog.objects.filter(id__in=[email_log.id for email_log in email_logs])
+                    .order_by("id")
+                    .values_list("body", flat=True)
+                ),
+                [f"Hello &lt;User {index}&gt;" for index in range(3)],
+            )
+
+        with self.assertRaises(ValueError):
+            EmailService.send_email(["to_email@example.com"], "Welcome", email_template="unknown")
+
+    def test_get_email_logs_for_recipient(self):
+        email_logs = EmailLog.create_logs(
+            [
+                {
+                    "email_provider": EMAIL_PROVIDER_MAILJET,
+                    "from_email": settings.DEFAULT_FROM_EMAIL,
+                    "to_emails": [to_email],
+                    "subject": "Test Email",
+                }
+                for to_email in ["user@example.com", "user@example.org", "other@example.com"]
+            ]
+        )
+
+        self.assertListEqual(
+            list(EmailService.get_email_logs_for_recipient("user@example.com")), email_logs[:1]
+        )
+        self.assertListEqual(
+            list(EmailService.get_email_logs_for_recipient("user@", prefix=True)),
+            [email_logs[1], email_logs[0]],
+        )
+
     def test_handle_event_webhook_of_mailjet(self):
         event_info = {"event": "sent"}
 
@@ -91,3 +547,46 @@ class EmailServiceTestCase(TestCase):
 
             mocked_get_provider_class.assert_called_with(EMAIL_PROVIDER_MAILJET)
             mocked_mailjet_handle_event_webhook.assert_called_with(event_info)
+
+    def test_get_engagement_stats(self):
+        with mock.patch.object(EngagementRollup, "get_stats") as mocked_get_stats:
+            EmailService.get_engagement_stats(date(2024, 1, 1), date(2024, 1, 31), template_id="order_shipped")
+
+            mocked_get_stats.assert_called_once_with(
+                date(2024, 1, 1), date(2024, 1, 31), template_id="order_shipped"
+            )
+
+    def test_handle_pending_events(self):
+        PendingEvent.park(EMAIL_PROVIDER_MAILJET, [("456", {"event": "open", "time": 1433103520, "MessageID": 456})])
+
+        with mock.patch.object(
+            MailjetEmailProvider, "handle_pending_events", return_value=1
+        ) as mocked_mailjet_handle_pending_events:
+            self.assertEqual(EmailService.handle_pending_events(), 1)
+
+            mocked_mailjet_handle_pending_events.assert_called_once_with()
+            self.assertTrue(PendingEvent.objects.exists())
+
+            # Below is the scenario when the tracker of the event was never created
+            with override_settings(DJANGO_EMAIL_PENDING_EVENT_TTL=-1):
+                EmailService.handle_pending_events()
+
+            self.assertFalse(PendingEvent.objects.exists())
+
+    def test_handle_event_webhooks_of_mailjet(self):
+        event_infos = [{"event": "sent"}, {"event": "open"}]
+
+        with mock.patch.object(
+            EmailService, "_get_provider_class_for_provider"
+        ) as mocked_get_provider_class, mock.patch.object(
+            MailjetEmailProvider, "handle_event_webhooks"
+        ) as mocked_mailjet_handle_event_webhooks:
+            mocked_get_provider_class.return_value = MailjetEmailProvider
+            mocked_mailjet_handle_event_webhooks.return_value = []
+
+            self.assertListEqual(
+                EmailService.handle_event_webhooks(EMAIL_PROVIDER_MAILJET, event_infos), []
+            )
+
+            mocked_get_provider_class.assert_called_with(EMAIL_PROVIDER_MAILJET)
+            mocked_mailjet_handle_event_webhooks.assert_called_with(event_infos)
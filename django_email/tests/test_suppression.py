@@ -0,0 +1,128 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .. import suppression
+from ..models import EventLog, SuppressedEmailAddress
+from ..suppression import BloomFilter, SuppressionFilter, get_suppressed_email_addresses, get_suppression_filter
+from ..tests.factories import EmailActivityTrackerFactory
+
+
+class BloomFilterTestCase(SimpleTestCase):
+    def test_contains(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for index in range(1000):
+            bloom_filter.add(f"user{index}@example.com")
+
+        self.assertTrue(all(f"user{index}@example.com" in bloom_filter for index in range(1000)))
+
+        false_positive_count = sum(f"other{index}@example.com" in bloom_filter for index in range(10000))
+        self.assertLess(false_positive_count, 300)
+
+
+class SuppressedEmailAddressModelTestCase(TestCase):
+    def test_suppress(self):
+        SuppressedEmailAddress.suppress(
+            ["Foo@Example.com", "foo@example.com"], SuppressedEmailAddress.REASON_SPAMMED
+        )
+        SuppressedEmailAddress.objects.get().delete()
+
+        self.assertSetEqual(SuppressedEmailAddress.get_suppressed(["foo@example.com"]), set())
+
+        # Suppressed again once deleted, with the new reason
+        SuppressedEmailAddress.suppress(["foo@example.com"], SuppressedEmailAddress.REASON_HARD_BOUNCED)
+
+        self.assertListEqual(
+            list(SuppressedEmailAddress.objects.values_list("email_address", "reason")),
+            [("foo@example.com", SuppressedEmailAddress.REASON_HARD_BOUNCED)],
+        )
+
+    def test_add_for_events(self):
+        email_activity_trackers = [
+            EmailActivityTrackerFactory(email_address=f"user{index}@example.com") for index in range(3)
+        ]
+
+        SuppressedEmailAddress.add_for_events(
+            {
+                email_activity_trackers[0].id: [EventLog.EMAIL_HARD_BOUNCED_EVENT_TYPE],
+                email_activity_trackers[1].id: [
+                    EventLog.EMAIL_OPENED_EVENT_TYPE, EventLog.EMAIL_SPAMMED_EVENT_TYPE,
+                ],
+                email_activity_trackers[2].id: [EventLog.EMAIL_SOFT_BOUNCED_EVENT_TYPE],
+            }
+        )
+
+        self.assertListEqual(
+            list(SuppressedEmailAddress.objects.order_by("email_address").values_list("email_address", "reason")),
+            [
+                ("user0@example.com", SuppressedEmailAddress.REASON_HARD_BOUNCED),
+                ("user1@example.com", SuppressedEmailAddress.REASON_SPAMMED),
+            ],
+        )
+
+
+class SuppressionFilterTestCase(TestCase):
+    def test_get_suppressed(self):
+        SuppressedEmailAddress.suppress(["foo@example.com"])
+        suppression_filter = SuppressionFilter(refresh_interval=60, min_capacity=10)
+
+        self.assertSetEqual(
+            suppression_filter.get_suppressed(["Foo@example.com", "bar@example.com"]), {"foo@example.com"}
+        )
+
+        # Addresses suppressed since are only seen once the filter is refreshed
+        SuppressedEmailAddress.suppress(["bar@example.com"])
+        with self.assertNumQueries(0):
+            self.assertSetEqual(suppression_filter.get_suppressed(["bar@example.com", "baz@example.com"]), set())
+
+        with mock.patch("django_email.suppression.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertSetEqual(suppression_filter.get_suppressed(["bar@example.com"]), {"bar@example.com"})
+
+        # Still in the filter, but no longer suppressed according to the table
+        SuppressedEmailAddress.objects.filter(email_address="foo@example.com").delete()
+        self.assertSetEqual(suppression_filter.get_suppressed(["foo@example.com"]), set())
+
+    def test_refresh_counts_new_addresses_only(self):
+        suppression_filter = SuppressionFilter(refresh_interval=0, min_capacity=10)
+        suppression_filter.refresh()
+
+        SuppressedEmailAddress.suppress(["foo@example.com"])
+        for _ in range(3):
+            # Fetched again every time, as it changed within the overlap
+            suppression_filter.refresh()
+
+        self.assertEqual(suppression_filter._added_count, 1)
+
+    def test_refresh_rebuilds_full_filter(self):
+        suppression_filter = SuppressionFilter(refresh_interval=0, min_capacity=2)
+        suppression_filter.refresh()
+
+        SuppressedEmailAddress.suppress([f"user{index}@example.com" for index in range(5)])
+        suppression_filter.refresh()
+        self.assertEqual(suppression_filter._bloom_filter.capacity, 2)
+
+        suppression_filter.refresh()
+        self.assertEqual(suppression_filter._bloom_filter.capacity, 10)
+        self.assertSetEqual(suppression_filter.get_suppressed(["user4@example.com"]), {"user4@example.com"})
+
+
+class GetSuppressedEmailAddressesTestCase(TestCase):
+    def setUp(self):
+        suppression._suppression_filter = None
+        self.addCleanup(setattr, suppression, "_suppression_filter", None)
+
+        SuppressedEmailAddress.suppress(["foo@example.com"])
+
+    def test_get_suppressed_email_addresses(self):
+        self.assertIsInstance(get_suppression_filter(), SuppressionFilter)
+        self.assertSetEqual(
+            get_suppressed_email_addresses(["foo@example.com", "bar@example.com"]), {"foo@example.com"}
+        )
+
+    @override_settings(DJANGO_EMAIL_SUPPRESSION_FILTER=None)
+    def test_get_suppressed_email_addresses_from_table(self):
+        self.assertIsNone(get_suppression_filter())
+
+        with self.assertNumQueries(1):
+            self.assertSetEqual(get_suppressed_email_addresses(["foo@example.com"]), {"foo@example.com"})
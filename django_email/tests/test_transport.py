@@ -0,0 +1,58 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..providers import transport
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransportTestCase(SimpleTestCase):
+    def setUp(self):
+        transport._sessions.clear()
+        transport._sessions_pid = None
+
+    def test_get_session(self):
+        session = transport.get_session("test_provider")
+
+        self.assertIs(transport.get_session("test_provider"), session)
+        self.assertIsNot(transport.get_session("other_provider"), session)
+
+        # Below is the test for the scenario when the process has been forked after the session was created
+        with mock.patch("django_email.providers.transport.os.getpid") as mocked_getpid:
+            mocked_getpid.return_value = -1
+
+            self.assertIsNot(transport.get_session("test_provider"), session)
+
+    def test_get_pool_stats(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveRequestHandler)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        host, port = server.server_address
+        session = transport.get_session("test_provider")
+        # Do not route the requests to the local server through any proxy configured in the environment
+        session.trust_env = False
+        self.addCleanup(session.close)
+        for _ in range(3):
+            session.get(f"http://{host}:{port}/", timeout=5)
+
+        self.assertDictEqual(
+            transport.get_pool_stats(),
+            {"test_provider": {f"http://{host}:{port}": {"connections": 1, "requests": 3}}},
+        )
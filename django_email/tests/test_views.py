@@ -32,3 +32,23 @@ class EmailEventWebhookViewTestCase(APITestCase):
                 ('{"event":"sent"}', email_provider)
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_email_event_webhook_view_POST_with_batching(self):
+        email_provider = EMAIL_PROVIDER_MAILJET
+        event_webhook_url = reverse(
+            "email_event_webhook", kwargs={"email_provider": email_provider}
+        )
+
+        with mock.patch(
+            "django_email.batching._webhook_event_batcher", None
+        ), self.settings(
+            DJANGO_EMAIL_WEBHOOK_BATCHING={"max_events": 2, "max_wait": 0.01}
+        ), mock.patch('django_email.batching.handle_webhook.apply_async') as mocked_handle_event_webhook:
+            response = self.client.post(
+                event_webhook_url, [{"event": "open"}, {"event": "click"}], format="json"
+            )
+
+            mocked_handle_event_webhook.assert_called_with(
+                ('[{"event": "open"}, {"event": "click"}]', email_provider)
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
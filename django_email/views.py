@@ -1,7 +1,10 @@
+import json
+
 from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 
+from .batching import get_webhook_event_batcher
 from .tasks import handle_webhook
 
 
@@ -13,6 +16,22 @@ class EmailEventWebhookView(APIView):
     def post(self, request, email_provider):
         # Using request.body instead of request.data here because keys in the dict are not
         # preserved in original format in request.data
-        handle_webhook.apply_async((request.body.decode('utf-8'), email_provider))
+        request_body = request.body.decode('utf-8')
+
+        webhook_event_batcher = get_webhook_event_batcher()
+        if webhook_event_batcher is not None:
+            try:
+                event_info = json.loads(request_body)
+            except ValueError:
+                event_info = None
+
+            if isinstance(event_info, (dict, list)):
+                # Returns once the events are published along with the ones of concurrent requests
+                webhook_event_batcher.submit(
+                    email_provider, event_info if isinstance(event_info, list) else [event_info]
+                )
+                return HttpResponse(status=status.HTTP_200_OK)
+
+        handle_webhook.apply_async((request_body, email_provider))
 
         return HttpResponse(status=status.HTTP_200_OK)